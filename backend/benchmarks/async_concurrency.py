@@ -0,0 +1,144 @@
+"""Concurrency ceiling of the list endpoints: sync fallback vs the async engine.
+
+Each mode runs in its own subprocess, because DB_ASYNC is read when the
+database module is imported. A subprocess seeds a throwaway SQLite database,
+then drives a mix of /ewaste/filter pages and /ewaste/analytics through an
+in-process ASGI client at rising concurrency. For each level it reports
+throughput, p50/p99 latency and failed requests.
+
+    python -m benchmarks.async_concurrency --levels 16 64 256 --requests 2000
+
+Modes:
+  sync   DB_ASYNC=0: every query runs in the threadpool (40 threads by default,
+         change with --threadpool-tokens), as the old sync endpoints did
+  async  DB_ASYNC=1: AsyncSession over aiosqlite; skipped when it is not installed
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ITEMS = 20_000
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def seed(engine):
+    from sqlalchemy.orm import Session
+
+    from models.ewaste_model import EwasteItem
+    from models.user_model import User
+    from repositories.analytics_repository import CATEGORIES, rebuild_counters
+
+    rng = random.Random(3)
+    with Session(engine) as db:
+        db.add_all([User(name=f"u{i}", email=f"u{i}@example.com", password="x") for i in range(200)])
+        db.flush()
+        db.add_all([
+            EwasteItem(user_id=rng.randint(1, 200), category=rng.choice(CATEGORIES[:2]), product_name="bench",
+                       is_working=True, tag=rng.choice(["reuse", "resell", "recycle"]), price=rng.randint(1, 500))
+            for _ in range(ITEMS)
+        ])
+        db.commit()
+        rebuild_counters(db)
+
+
+async def drive(levels, requests, tokens):
+    import anyio.to_thread
+    import httpx
+
+    from main import app
+
+    anyio.to_thread.current_default_thread_limiter().total_tokens = tokens
+    rng = random.Random(5)
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        for level in levels:
+            latencies, failures = [], 0
+            remaining = iter(range(max(requests, level * 4)))
+
+            async def worker():
+                nonlocal failures
+                for i in remaining:
+                    url = ("/ewaste/analytics" if i % 5 == 0 else
+                           f"/ewaste/filter?tag=reuse&limit=50&after_id={rng.randint(0, ITEMS)}")
+                    started = time.perf_counter()
+                    try:
+                        resp = await client.get(url)
+                        ok = resp.status_code == 200
+                    except Exception:
+                        ok = False
+                    if ok:
+                        latencies.append((time.perf_counter() - started) * 1000)
+                    else:
+                        failures += 1
+
+            started = time.perf_counter()
+            await asyncio.gather(*[worker() for _ in range(level)])
+            elapsed = time.perf_counter() - started
+            results.append({
+                "level": level,
+                "rps": len(latencies) / elapsed,
+                "p50": statistics.median(latencies) if latencies else None,
+                "p99": percentile(latencies, 99) if latencies else None,
+                "failures": failures,
+            })
+    return results
+
+
+def child(args):
+    import database
+
+    if os.environ["DB_ASYNC"] == "1" and database.async_engine is None:
+        print(json.dumps({"skipped": True}))
+        return
+    from migrations import run_migrations
+
+    run_migrations(database.engine)
+    seed(database.engine)
+    results = asyncio.run(drive(args.levels, args.requests, args.threadpool_tokens))
+    if database.async_engine is not None:
+        asyncio.run(database.async_engine.dispose())
+    print(json.dumps({"results": results}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--levels", type=int, nargs="+", default=[16, 64, 256])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--threadpool-tokens", type=int, default=40)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child(args)
+
+    print(f"{ITEMS} items, {args.requests}+ requests per level, threadpool {args.threadpool_tokens} threads")
+    for mode, flag in (("sync", "0"), ("async", "1")):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            env = {**os.environ, "DB_ASYNC": flag, "DATABASE_URL": f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"}
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.async_concurrency", "--child", *sys.argv[1:]],
+                env=env, capture_output=True, text=True, check=True,
+            ).stdout
+        report = json.loads(out.strip().splitlines()[-1])
+        if report.get("skipped"):
+            print(f"{mode:5s} skipped: aiosqlite is not installed")
+            continue
+        for r in report["results"]:
+            print(f"{mode:5s} c={r['level']:<4d} {r['rps']:8.1f} req/s  p50 {r['p50']:8.2f} ms  "
+                  f"p99 {r['p99']:8.2f} ms  failed {r['failures']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Authenticated request rate with and without the token/profile caches.
+
+Logs in once, then drives GET /auth/me (bearer token verification plus a
+profile lookup) through an in-process ASGI client against a throwaway SQLite
+database. The uncached run verifies the JWT and queries the user on every
+request, as get_current_user did before the caches existed.
+
+    python -m benchmarks.auth_throughput --requests 5000 --concurrency 32
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+_tmpdir = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir.name, 'bench.db')}"
+
+import httpx  # noqa: E402
+
+import utils.auth_utils as auth_utils  # noqa: E402
+import utils.password_hashing as password_hashing  # noqa: E402
+import utils.token_cache as token_cache  # noqa: E402
+from benchmarks.login_latency import percentile  # noqa: E402
+from database import engine  # noqa: E402
+from main import app  # noqa: E402
+from migrations import run_migrations  # noqa: E402
+
+
+async def _login(client):
+    body = {"name": "bench", "email": "bench@example.com", "password": "benchmark"}
+    await client.post("/auth/register", json=body)
+    resp = await client.post("/auth/login", json=body)
+    return {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+
+async def run(client, headers, requests, concurrency):
+    remaining = iter(range(requests))
+    latencies = []
+
+    async def worker():
+        for _ in remaining:
+            started = time.perf_counter()
+            resp = await client.get("/auth/me", headers=headers)
+            assert resp.status_code == 200, resp.text
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return requests / (time.perf_counter() - started), latencies
+
+
+async def bench(requests, concurrency):
+    password_hashing.start("thread", 1)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        headers = await _login(client)
+        for name, entries in (("uncached", 0), ("cached", 10000)):
+            token_cache.token_cache.max_entries = entries
+            token_cache.user_profiles.max_entries = entries
+            token_cache.token_cache.clear()
+            token_cache.user_profiles.clear()
+            await run(client, headers, 100, concurrency)  # warm up
+            rate, latencies = await run(client, headers, requests, concurrency)
+            print(f"{name:9s} {rate:8.1f} req/s  p50 {statistics.median(latencies):6.2f} ms  "
+                  f"p99 {percentile(latencies, 99):6.2f} ms")
+    password_hashing.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    auth_utils.BCRYPT_ROUNDS = 4
+    # The app migrates in its lifespan, which ASGITransport does not run
+    run_migrations(engine)
+    print(f"GET /auth/me x {args.requests}, concurrency {args.concurrency}")
+    asyncio.run(bench(args.requests, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
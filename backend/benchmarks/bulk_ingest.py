@@ -0,0 +1,98 @@
+"""Registering N items: N sequential /ewaste/add calls vs /ewaste/bulk batches.
+
+Runs through an in-process ASGI client against a throwaway SQLite database
+and upload directory. A third of the items are non-working, so both paths
+also queue analysis jobs. The worker pool is not started, so only ingestion
+is measured.
+
+    python -m benchmarks.bulk_ingest --items 2000 --batch 500
+    python -m benchmarks.bulk_ingest --items 500 --images     # every item carries a photo
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+_tmpdir = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir.name, 'bench.db')}"
+os.environ.setdefault("UPLOAD_DIR", os.path.join(_tmpdir.name, "uploads"))
+# One client making every call: measure the endpoints, not the per-client rate limit
+os.environ.setdefault("UPLOAD_RATE_PER_MINUTE", "0")
+
+import httpx  # noqa: E402
+
+from database import SessionLocal, engine  # noqa: E402
+from main import app  # noqa: E402
+from migrations import run_migrations  # noqa: E402
+from models.user_model import User  # noqa: E402
+
+
+def _item(i, with_image):
+    working = i % 3 != 0
+    item = {"user_id": 1, "category": "consumer" if i % 2 else "utility", "product_name": f"Device {i}",
+            "is_working": working, "price": 50 if working else None}
+    if with_image:
+        item["image"] = f"photo{i}.jpg"
+    return item
+
+
+def _photo(i):
+    return os.urandom(32 * 1024) + str(i).encode()
+
+
+async def sequential(client, items, with_image):
+    for i, item in enumerate(items):
+        data = {k: str(v).lower() if isinstance(v, bool) else str(v) for k, v in item.items()
+                if v is not None and k != "image"}
+        files = {"image": (item["image"], _photo(i), "image/jpeg")} if with_image else None
+        resp = await client.post("/ewaste/add", data=data, files=files)
+        assert resp.status_code == 200, resp.text
+
+
+async def bulk(client, items, batch, with_image):
+    for start in range(0, len(items), batch):
+        chunk = items[start:start + batch]
+        if with_image:
+            files = [("images", (item["image"], _photo(start + i), "image/jpeg")) for i, item in enumerate(chunk)]
+            resp = await client.post("/ewaste/bulk", data={"items": json.dumps(chunk)}, files=files)
+        else:
+            resp = await client.post("/ewaste/bulk", content="\n".join(json.dumps(i) for i in chunk),
+                                     headers={"Content-Type": "application/x-ndjson"})
+        assert resp.status_code == 200 and resp.json()["failed"] == 0, resp.text
+
+
+async def bench(n, batch, with_image):
+    with SessionLocal() as db:
+        db.add(User(name="Partner", email="partner@example.com", password="x"))
+        db.commit()
+    items = [_item(i, with_image) for i in range(n)]
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+        started = time.perf_counter()
+        await sequential(client, items, with_image)
+        seq = time.perf_counter() - started
+
+        started = time.perf_counter()
+        await bulk(client, items, batch, with_image)
+        blk = time.perf_counter() - started
+    print(f"sequential /add   {n / seq:9.1f} items/s  {seq:7.2f}s")
+    print(f"/bulk x{batch:<5d}     {n / blk:9.1f} items/s  {blk:7.2f}s  ({seq / blk:.1f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--images", action="store_true")
+    args = parser.parse_args()
+    # The app migrates in its lifespan, which ASGITransport does not run
+    run_migrations(engine)
+    print(f"{args.items} items{' with photos' if args.images else ''}")
+    asyncio.run(bench(args.items, args.batch, args.images))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""Change feed vs polling: what keeping dashboards current costs per write.
+
+Seeds --items synthetic items (benchmarks.synthetic) into a throwaway SQLite
+database and starts `uvicorn --factory main:create_app` on it. Then, in each
+mode, it makes --writes item adds, one every --interval-ms, while
+--dashboards clients keep their copy of /ewaste/reusable and
+/ewaste/analytics current:
+
+  none  no dashboards: what the writes cost by themselves
+  poll  after every write each dashboard re-fetches both endpoints, as the
+        frontend's polling did (the best case for polling: no poll is wasted)
+  feed  each dashboard holds GET /ewaste/events open and applies the diffs
+
+For each mode it reports, per write, the SQL statements the server ran (read
+from /metrics), the bytes the dashboards received and how long it took until
+every dashboard had the write.
+
+    python -m benchmarks.change_feed --items 10000 --dashboards 50 --writes 30
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.gemini_mock import free_port
+
+
+def _statements(client: httpx.Client) -> float:
+    for line in client.get("/metrics").text.splitlines():
+        if line.startswith("db_statements_total "):
+            return float(line.split()[1])
+    return 0.0
+
+
+def _item_form(i: int) -> dict:
+    return {"user_id": "1", "category": "consumer", "product_name": f"Feed Phone {i}",
+            "is_working": "true", "price": "900"}
+
+
+async def _write(client: httpx.AsyncClient, i: int) -> int:
+    resp = await client.post("/ewaste/add", data=_item_form(i))
+    resp.raise_for_status()
+    return resp.json()["id"]
+
+
+async def run_none(client, args):
+    latencies = []
+    for i in range(args.writes):
+        started = time.perf_counter()
+        await _write(client, i)
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(args.interval_ms / 1000)
+    return latencies, 0
+
+
+async def run_poll(client, args):
+    latencies, received = [], 0
+
+    async def refresh():
+        reusable, analytics = await asyncio.gather(client.get("/ewaste/reusable"), client.get("/ewaste/analytics"))
+        return len(reusable.content) + len(analytics.content)
+
+    await asyncio.gather(*[refresh() for _ in range(args.dashboards)])  # initial load, not counted
+    for i in range(args.writes):
+        started = time.perf_counter()
+        await _write(client, i)
+        received += sum(await asyncio.gather(*[refresh() for _ in range(args.dashboards)]))
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(args.interval_ms / 1000)
+    return latencies, received
+
+
+async def run_feed(client, args):
+    arrivals: dict[int, list[float]] = {}
+    received = [0]
+    ready = asyncio.Semaphore(0)
+
+    async def dashboard():
+        async with client.stream("GET", "/ewaste/events") as resp:
+            event = None
+            async for line in resp.aiter_lines():
+                received[0] += len(line) + 1
+                if line.startswith("event: "):
+                    event = line[7:]
+                    if event == "ready":
+                        ready.release()
+                elif line.startswith("data: ") and event == "item.created":
+                    # Only the id is needed here; a dashboard would merge the row
+                    item_id = int(line.split('"id":', 1)[1].split(",", 1)[0])
+                    arrivals.setdefault(item_id, []).append(time.perf_counter())
+
+    tasks = [asyncio.create_task(dashboard()) for _ in range(args.dashboards)]
+    for _ in tasks:
+        await ready.acquire()
+    received[0] = 0
+    sent = {}
+    for i in range(args.writes):
+        started = time.perf_counter()
+        sent[await _write(client, i)] = started
+        await asyncio.sleep(args.interval_ms / 1000)
+    deadline = time.perf_counter() + 10
+    while time.perf_counter() < deadline and any(len(arrivals.get(i, [])) < args.dashboards for i in sent):
+        await asyncio.sleep(0.05)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    missing = sum(args.dashboards - len(arrivals.get(i, [])) for i in sent)
+    if missing:
+        print(f"  feed: {missing} deliveries missing after 10 s")
+    latencies = [max(arrivals[i]) - started for i, started in sent.items() if i in arrivals]
+    return latencies, received[0]
+
+
+MODES = {"none": run_none, "poll": run_poll, "feed": run_feed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=10_000)
+    parser.add_argument("--dashboards", type=int, default=50)
+    parser.add_argument("--writes", type=int, default=30)
+    parser.add_argument("--interval-ms", type=float, default=50)
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        os.environ.update({
+            "DATABASE_URL": f"sqlite:///{os.path.join(tmpdir, 'bench.db')}",
+            "UPLOAD_DIR": os.path.join(tmpdir, "uploads"),
+            # Every write comes from one client
+            "UPLOAD_RATE_PER_MINUTE": "0",
+        })
+        from benchmarks import synthetic
+        from database import make_engine
+        from migrations import run_migrations
+
+        engine = make_engine(os.environ["DATABASE_URL"])
+        run_migrations(engine)
+        synthetic.seed(engine, 1000, args.items, images=0)
+        engine.dispose()
+
+        port = free_port()
+        server = subprocess.Popen([sys.executable, "-m", "uvicorn", "--factory", "main:create_app",
+                                   "--port", str(port), "--log-level", "warning", "--no-access-log"])
+        base_url = f"http://127.0.0.1:{port}"
+        try:
+            with httpx.Client(base_url=base_url, timeout=60) as sync_client:
+                deadline = time.monotonic() + 60
+                while True:
+                    try:
+                        sync_client.get("/").raise_for_status()
+                        break
+                    except httpx.HTTPError:
+                        if server.poll() is not None or time.monotonic() > deadline:
+                            raise RuntimeError("uvicorn did not start")
+                        time.sleep(0.2)
+
+                print(f"{args.dashboards} dashboards, {args.writes} writes, {args.items} items")
+                print(f"{'mode':6s} {'SQL/write':>10s} {'KiB/write':>11s} {'p50 ms':>8s} {'max ms':>8s}")
+                for mode in args.modes:
+                    async def run():
+                        limits = httpx.Limits(max_connections=args.dashboards * 2 + 4)
+                        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+                            return await MODES[mode](client, args)
+
+                    before = _statements(sync_client)
+                    latencies, received = asyncio.run(run())
+                    statements = (_statements(sync_client) - before) / args.writes
+                    print(f"{mode:6s} {statements:10.1f} {received / args.writes / 1024:11.1f} "
+                          f"{statistics.median(latencies) * 1000:8.1f} {max(latencies) * 1000:8.1f}")
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Concurrent reads and writes against each database engine configuration.
+
+Writer threads add items the way /ewaste/add does (insert plus counter upsert,
+one transaction each). Reader threads page /ewaste/filter and read
+/ewaste/analytics totals at the same time. Each configuration gets a fresh
+database, and the run reports ops/s, p99 latency and how many operations
+failed with "database is locked".
+
+    python -m benchmarks.db_concurrency --seconds 10 --writers 4 --readers 16
+    python -m benchmarks.db_concurrency --postgres-url postgresql://user:pw@localhost/bench
+
+Configurations:
+  legacy    the old create_engine(url, check_same_thread=False): rollback journal
+  tuned     database.make_engine: WAL, synchronous=NORMAL, mmap, busy timeout, sized pool
+  postgres  make_engine on --postgres-url, when given (its tables are dropped first)
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.login_latency import percentile
+from database import Base, make_engine
+from migrations import run_migrations
+from models.ewaste_model import EwasteItem
+from models.user_model import User
+from repositories.analytics_repository import CATEGORIES, TAGS, analytics_summary, record_item_added
+from repositories.ewaste_repository import fetch_page, filtered_items_query
+
+SEED_ITEMS = 20_000
+
+
+def prepare(engine):
+    Base.metadata.drop_all(engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP TABLE IF EXISTS schema_migrations")
+    run_migrations(engine)
+    rng = random.Random(7)
+    with engine.begin() as conn:
+        conn.execute(insert(User.__table__), [
+            {"name": f"user{i}", "email": f"user{i}@example.com", "password": "x"} for i in range(100)
+        ])
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        for _ in range(SEED_ITEMS):
+            item = EwasteItem(user_id=rng.randint(1, 100), category=rng.choice(CATEGORIES),
+                              product_name="seed", is_working=True, tag=rng.choice(TAGS), price=10)
+            db.add(item)
+            record_item_added(db, item)
+        db.commit()
+    return Session
+
+
+def run(Session, seconds, writers, readers):
+    stop = time.monotonic() + seconds
+    results = {"write": [], "read": []}
+    locked = {"write": 0, "read": 0}
+    lock = threading.Lock()
+
+    def write_once(db, rng):
+        item = EwasteItem(user_id=rng.randint(1, 100), category=rng.choice(CATEGORIES),
+                          product_name="bench", is_working=False, tag=rng.choice(TAGS), price=5)
+        db.add(item)
+        record_item_added(db, item)
+        db.commit()
+
+    def read_once(db, rng):
+        fetch_page(db, filtered_items_query(rng.choice(TAGS), rng.choice(CATEGORIES)), 50, rng.randint(0, SEED_ITEMS))
+        analytics_summary(db)
+        db.rollback()
+
+    def loop(kind, op, seed):
+        rng = random.Random(seed)
+        while time.monotonic() < stop:
+            started = time.perf_counter()
+            with Session() as db:
+                try:
+                    op(db, rng)
+                except OperationalError as e:
+                    if "locked" not in str(e):
+                        raise
+                    with lock:
+                        locked[kind] += 1
+                    continue
+            with lock:
+                results[kind].append((time.perf_counter() - started) * 1000)
+
+    threads = [threading.Thread(target=loop, args=("write", write_once, i)) for i in range(writers)]
+    threads += [threading.Thread(target=loop, args=("read", read_once, 1000 + i)) for i in range(readers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, locked
+
+
+def report(name, results, locked, seconds):
+    for kind in ("write", "read"):
+        samples = results[kind]
+        if samples:
+            print(f"{name:9s} {kind:5s} {len(samples) / seconds:8.1f} ops/s  p50 {statistics.median(samples):7.2f} ms  "
+                  f"p99 {percentile(samples, 99):8.2f} ms  locked errors {locked[kind]}")
+        else:
+            print(f"{name:9s} {kind:5s} no successful operations, locked errors {locked[kind]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=16)
+    parser.add_argument("--postgres-url")
+    args = parser.parse_args()
+
+    print(f"{args.writers} writers, {args.readers} readers, {args.seconds:.0f}s each, {SEED_ITEMS} seeded items")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        configs = [
+            ("legacy", lambda: create_engine(f"sqlite:///{os.path.join(tmpdir, 'legacy.db')}",
+                                             connect_args={"check_same_thread": False})),
+            ("tuned", lambda: make_engine(f"sqlite:///{os.path.join(tmpdir, 'tuned.db')}")),
+        ]
+        if args.postgres_url:
+            configs.append(("postgres", lambda: make_engine(args.postgres_url)))
+        for name, factory in configs:
+            engine = factory()
+            Session = prepare(engine)
+            results, locked = run(Session, args.seconds, args.writers, args.readers)
+            report(name, results, locked, args.seconds)
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Local stand-in for the Gemini Vision endpoint.
+
+Answers POST /v1/vision/analyze after a configurable delay with a fixed
+component list, and counts requests and TCP connections so benchmarks can
+show pooling and coalescing at work without network access or an API key.
+
+    python -m benchmarks.gemini_mock --port 8765 --latency-ms 80
+"""
+
+import argparse
+import asyncio
+import contextlib
+import socket
+import threading
+import time
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+
+class MockGemini:
+    def __init__(self, latency_ms: float = 50.0):
+        self.latency = latency_ms / 1000
+        self.requests = 0
+        self.connections = set()
+        self.app = Starlette(routes=[Route("/v1/vision/analyze", self.analyze, methods=["POST"])])
+
+    async def analyze(self, request: Request):
+        self.requests += 1
+        client = request.scope.get("client")
+        if client:
+            self.connections.add(tuple(client))
+        await request.body()
+        await asyncio.sleep(self.latency)
+        return JSONResponse({
+            "components": [
+                {"name": "copper", "confidence": 0.82},
+                {"name": "lithium", "confidence": 0.64},
+            ],
+        })
+
+    def reset(self):
+        self.requests = 0
+        self.connections.clear()
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextlib.contextmanager
+def running_mock(latency_ms: float = 50.0, port: int | None = None):
+    """Run MockGemini on a background uvicorn thread; yields (mock, url)."""
+    mock = MockGemini(latency_ms)
+    port = port or free_port()
+    server = uvicorn.Server(uvicorn.Config(mock.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    try:
+        yield mock, f"http://127.0.0.1:{port}/v1/vision/analyze"
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local Gemini Vision stand-in")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    args = parser.parse_args()
+    uvicorn.run(MockGemini(args.latency_ms).app, host="127.0.0.1", port=args.port)
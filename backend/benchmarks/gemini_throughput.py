@@ -0,0 +1,103 @@
+"""Upstream analysis throughput: per-call clients vs the shared pooled client.
+
+Runs entirely against benchmarks.gemini_mock, so it needs no network or key.
+
+    python -m benchmarks.gemini_throughput --requests 200 --concurrency 16
+
+Scenarios:
+  per-call client    baseline: a new httpx.Client (new connection) per
+                     analysis, driven from a thread pool
+  pooled async       analyze_image_async over the shared keep-alive client,
+                     distinct images
+  pooled duplicates  analyze_image_async with every request for the same image,
+                     which coalesces into a handful of upstream calls
+The analysis cache is bypassed so every scenario exercises the upstream path.
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import utils.gemini_api as gemini_api
+from benchmarks.gemini_mock import running_mock
+
+
+class _NoCache:
+    def get(self, key, session_factory):
+        return None
+
+    def put(self, key, result, session_factory):
+        pass
+
+
+def _images(directory, count):
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"img{i}.jpg")
+        with open(path, "wb") as f:
+            f.write(os.urandom(64 * 1024))
+        paths.append(path)
+    return paths
+
+
+def _post_with_new_client(path):
+    import httpx
+
+    with httpx.Client(timeout=gemini_api.GEMINI_TIMEOUT_SECONDS) as client, open(path, "rb") as f:
+        files = {"file": (os.path.basename(path), f, "application/octet-stream")}
+        client.post(gemini_api.GEMINI_VISION_URL, headers=gemini_api._headers(), files=files).raise_for_status()
+
+
+def per_call(paths, concurrency):
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(_post_with_new_client, paths))
+
+
+async def pooled(paths, concurrency):
+    gemini_api.GEMINI_MAX_CONCURRENCY = concurrency
+    await gemini_api.open_client()
+    try:
+        await asyncio.gather(*[gemini_api.analyze_image_async(p, None, fallback=False) for p in paths])
+    finally:
+        await gemini_api.close_client()
+
+
+def report(name, mock, started, n):
+    elapsed = time.perf_counter() - started
+    print(f"{name:18s} {n / elapsed:8.1f} analyses/s  {elapsed:6.2f}s  "
+          f"upstream requests={mock.requests:4d}  connections={len(mock.connections)}")
+    mock.reset()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    gemini_api.analysis_cache = _NoCache()
+    gemini_api.GEMINI_API_KEY = "bench"
+    with running_mock(args.latency_ms) as (mock, url), tempfile.TemporaryDirectory() as tmpdir:
+        gemini_api.GEMINI_VISION_URL = url
+        paths = _images(tmpdir, args.requests)
+        print(f"{args.requests} analyses, concurrency {args.concurrency}, upstream latency {args.latency_ms:.0f} ms")
+
+        started = time.perf_counter()
+        per_call(paths, args.concurrency)
+        report("per-call client", mock, started, args.requests)
+
+        started = time.perf_counter()
+        asyncio.run(pooled(paths, args.concurrency))
+        report("pooled async", mock, started, args.requests)
+
+        started = time.perf_counter()
+        asyncio.run(pooled([paths[0]] * args.requests, args.concurrency))
+        report("pooled duplicates", mock, started, args.requests)
+
+
+if __name__ == "__main__":
+    main()
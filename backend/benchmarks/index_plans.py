@@ -0,0 +1,102 @@
+"""Query plans and timings for the hot ewaste_items filters, with and without indexes.
+
+Usage (from backend/):
+    python -m benchmarks.index_plans                 # 10^5 and 10^6 rows
+    python -m benchmarks.index_plans --rows 100000
+
+Each size gets a fresh SQLite file in a temp directory. The filter indexes are
+dropped, the table is seeded, every query is explained and timed, then the
+index migration is applied and the same queries are measured again.
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import create_engine, insert, text
+
+from migrations import run_migrations
+from migrations.versions import create_ewaste_indexes
+from models.ewaste_model import EwasteItem
+from models.user_model import User
+
+
+QUERIES = {
+    "filter tag+category": "SELECT id FROM ewaste_items WHERE tag = 'recycle' AND category = 'utility' ORDER BY id LIMIT 100",
+    "filter category": "SELECT id FROM ewaste_items WHERE category = 'utility' AND id > :after ORDER BY id LIMIT 100",
+    "user items": "SELECT id FROM ewaste_items WHERE user_id = :user_id ORDER BY id",
+    "reusable page": "SELECT id, price FROM ewaste_items WHERE tag = 'reuse' AND id > :after ORDER BY id LIMIT 100",
+}
+REPEAT = 20
+BATCH = 50_000
+
+
+def seed(engine, rows):
+    rng = random.Random(42)
+    users = max(1, rows // 20)
+    with engine.begin() as conn:
+        conn.execute(insert(User.__table__), [
+            {"name": f"u{i}", "email": f"u{i}@bench", "password": "x"} for i in range(users)
+        ])
+        for start in range(0, rows, BATCH):
+            batch = []
+            for _ in range(min(BATCH, rows - start)):
+                working = rng.random() < 0.4
+                batch.append({
+                    "user_id": rng.randint(1, users),
+                    "category": rng.choice(["consumer", "consumer", "utility"]),
+                    "product_name": "device",
+                    "is_working": working,
+                    "tag": "reuse" if working else "recycle",
+                    "price": rng.randint(100, 50_000) if working else None,
+                })
+            conn.execute(insert(EwasteItem.__table__), batch)
+    return users
+
+
+def measure(engine, params):
+    results = {}
+    with engine.connect() as conn:
+        for name, sql in QUERIES.items():
+            plan = conn.execute(text("EXPLAIN QUERY PLAN " + sql), params).fetchall()
+            started = time.perf_counter()
+            for _ in range(REPEAT):
+                conn.execute(text(sql), params).fetchall()
+            elapsed = (time.perf_counter() - started) / REPEAT * 1000
+            results[name] = (elapsed, " | ".join(row[-1] for row in plan))
+    return results
+
+
+def run(rows):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        engine = create_engine(f"sqlite:///{os.path.join(tmpdir, 'bench.db')}")
+        run_migrations(engine)
+        with engine.begin() as conn:
+            for index in EwasteItem.__table__.indexes:
+                index.drop(conn, checkfirst=True)
+        users = seed(engine, rows)
+        params = {"user_id": users // 2, "after": rows // 2}
+
+        before = measure(engine, params)
+        with engine.begin() as conn:
+            create_ewaste_indexes(conn)
+            conn.exec_driver_sql("ANALYZE")
+        after = measure(engine, params)
+        engine.dispose()
+
+    print(f"\n=== {rows:,} rows ===")
+    for name in QUERIES:
+        (t0, plan0), (t1, plan1) = before[name], after[name]
+        print(f"{name:22s} {t0:9.3f} ms -> {t1:7.3f} ms  ({t0 / max(t1, 1e-6):.0f}x)")
+        print(f"    before: {plan0}")
+        print(f"    after:  {plan1}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, action="append", help="row count (repeatable)")
+    args = parser.parse_args()
+    for n in args.rows or [10**5, 10**6]:
+        run(n)
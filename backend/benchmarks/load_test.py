@@ -0,0 +1,425 @@
+"""Load test of every endpoint against seeded synthetic data, with a regression gate.
+
+Seeds --users and --items (10^3..10^6) with benchmarks.synthetic into a
+throwaway SQLite database and upload directory. Gemini is replaced by
+benchmarks.gemini_mock on localhost. Then, for each mode, every endpoint is
+driven by --concurrency concurrent clients for --requests requests, one
+endpoint after another, followed by a mix of all the read endpoints.
+
+  asgi     in-process httpx.ASGITransport client in a subprocess, with the
+           app lifespan (analysis workers, bcrypt pool) running. Background
+           tasks finish before the response does, so upload latencies
+           include building the image variants.
+  uvicorn  a real `uvicorn --factory main:create_app` process driven over TCP
+
+Each mode starts from its own copy of the seeded database. For each endpoint
+the report has throughput, p50/p95/p99 latency and failed requests. It also
+has the peak RSS of the serving process (with the client included in asgi
+mode).
+
+    python -m benchmarks.load_test --users 1000 --items 100000 --output baseline.json
+    python -m benchmarks.load_test --users 1000 --items 100000 --baseline baseline.json
+
+With --baseline the run exits 1 if an endpoint regressed past --threshold
+(0.25 = 25%) compared with that file. An endpoint regresses when its p95 or
+per-request time grew by more than the threshold and by at least
+--min-delta-ms, or when it fails more requests. The serving process
+regresses when its peak RSS grew past the threshold. Only compare runs made
+with the same scale and on the same machine.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+SCALE_KEYS = ("users", "items", "images", "requests", "concurrency", "seed", "gemini_latency_ms")
+
+
+def percentile(samples, pct):
+    # Not benchmarks.login_latency's: importing that module points DATABASE_URL at its own database
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+@dataclass
+class Endpoint:
+    name: str
+    build: Callable  # (ctx, state, rng, i) -> kwargs for httpx.AsyncClient.request
+    after: Callable | None = None  # (state, response) on success
+    read: bool = False  # included in the mixed phase
+
+
+def _item_id(ctx, rng):
+    return rng.randint(ctx["first_item_id"], ctx["last_item_id"])
+
+
+def _owner(ctx, rng):
+    # Same skew as the seeded sellers
+    return min(int(rng.paretovariate(1.2)), ctx["users"])
+
+
+def _item_form(rng):
+    working = rng.random() < 0.55
+    form = {"user_id": "1", "category": rng.choice(["consumer", "utility"]), "product_name": "Load Test Laptop",
+            "is_working": str(working).lower()}
+    if working:
+        form["price"] = str(rng.randint(100, 20_000))
+    return form
+
+
+def _add_with_image(ctx, state, rng, i):
+    # Fresh bytes after the JPEG end marker: decodable, but never in the analysis cache
+    image = state["jpeg"] + rng.randbytes(16)
+    form = {**_item_form(rng), "is_working": "false"}
+    form.pop("price", None)
+    return {"method": "POST", "url": "/ewaste/add", "data": form,
+            "files": {"image": (f"load-{i}.jpg", image, "image/jpeg")}}
+
+
+def _bulk(ctx, state, rng, i):
+    items = []
+    for _ in range(50):
+        form = _item_form(rng)
+        items.append({"user_id": _owner(ctx, rng), "category": form["category"], "product_name": "Bulk Phone",
+                      "is_working": form["is_working"] == "true", "price": form.get("price") and int(form["price"])})
+    return {"method": "POST", "url": "/ewaste/bulk", "json": items}
+
+
+def _search(ctx, state, rng, i):
+    params = {"q": rng.choice(ctx["search_words"])}
+    if rng.random() < 0.3:
+        params["tag"] = rng.choice(["reuse", "recycle"])
+    if rng.random() < 0.25:
+        params["min_price"], params["max_price"] = 500, rng.choice([2000, 10_000])
+    return {"method": "GET", "url": "/ewaste/search", "params": params}
+
+
+def _nearby(ctx, state, rng, i):
+    lat, lon = rng.choice(ctx["cities"])
+    return {"method": "GET", "url": "/ewaste/nearby", "params": {
+        "lat": rng.gauss(lat, 0.05), "lon": rng.gauss(lon, 0.05), "radius_km": rng.choice([5, 25, 100]), "k": 20}}
+
+
+def _upload(method):
+    def build(ctx, state, rng, i):
+        return {"method": method, "url": f"/uploads/{rng.choice(ctx['image_keys'])}"}
+    return build
+
+
+def _remember(key):
+    def after(state, resp):
+        state[key].append(resp.json()["access_token" if key == "tokens" else "id"])
+    return after
+
+
+def _delete(ctx, state, rng, i):
+    # Items this run created, so the seeded data other endpoints read stays intact
+    item_id = state["created"].pop() if state["created"] else 0
+    return {"method": "DELETE", "url": f"/ewaste/{item_id}"}
+
+
+def _logout(ctx, state, rng, i):
+    # Each token can only be revoked once
+    token = state["tokens"].pop() if state["tokens"] else "missing"
+    return {"method": "POST", "url": "/auth/logout", "headers": {"Authorization": f"Bearer {token}"}}
+
+
+ENDPOINTS = [
+    Endpoint("GET /", lambda c, s, r, i: {"method": "GET", "url": "/"}, read=True),
+    Endpoint("GET /test-image", lambda c, s, r, i: {"method": "GET", "url": "/test-image"}),
+    Endpoint("POST /auth/register", lambda c, s, r, i: {"method": "POST", "url": "/auth/register", "json": {
+        "name": f"Load {i}", "email": f"load{i}@example.com", "password": c["password"]}}),
+    Endpoint("POST /auth/login", lambda c, s, r, i: {"method": "POST", "url": "/auth/login", "json": {
+        "email": f"user{r.randrange(c['users'])}@example.com", "password": c["password"]}}, _remember("tokens")),
+    Endpoint("GET /auth/me", lambda c, s, r, i: {"method": "GET", "url": "/auth/me", "headers": s["session"]},
+             read=True),
+    Endpoint("POST /auth/logout", _logout),
+    Endpoint("POST /ewaste/add", lambda c, s, r, i: {"method": "POST", "url": "/ewaste/add", "data": _item_form(r)},
+             _remember("created")),
+    Endpoint("POST /ewaste/add [image]", _add_with_image, _remember("created")),
+    Endpoint("POST /ewaste/bulk", _bulk),
+    Endpoint("GET /ewaste/user/{user_id}", lambda c, s, r, i: {
+        "method": "GET", "url": f"/ewaste/user/{_owner(c, r)}", "params": {"limit": 50}}, read=True),
+    Endpoint("GET /ewaste/all", lambda c, s, r, i: {
+        "method": "GET", "url": "/ewaste/all", "params": {"limit": 50, "after_id": _item_id(c, r)}}, read=True),
+    Endpoint("GET /ewaste/filter", lambda c, s, r, i: {"method": "GET", "url": "/ewaste/filter", "params": {
+        "tag": r.choice(["reuse", "recycle"]), "category": r.choice(["consumer", "utility"]), "limit": 50,
+        "after_id": _item_id(c, r)}}, read=True),
+    Endpoint("GET /ewaste/search", _search, read=True),
+    Endpoint("GET /ewaste/nearby", _nearby, read=True),
+    Endpoint("GET /ewaste/analytics", lambda c, s, r, i: {"method": "GET", "url": "/ewaste/analytics"}, read=True),
+    Endpoint("GET /ewaste/analytics?include_items", lambda c, s, r, i: {
+        "method": "GET", "url": "/ewaste/analytics", "params": {"include_items": "true", "items_limit": 100}},
+        read=True),
+    Endpoint("GET /ewaste/reusable", lambda c, s, r, i: {
+        "method": "GET", "url": "/ewaste/reusable", "params": {"limit": 100}}, read=True),
+    Endpoint("GET /ewaste/{item_id}/analysis", lambda c, s, r, i: {
+        "method": "GET", "url": f"/ewaste/{_item_id(c, r)}/analysis"}, read=True),
+    Endpoint("GET /ewaste/analysis/cache", lambda c, s, r, i: {"method": "GET", "url": "/ewaste/analysis/cache"}),
+    Endpoint("GET /uploads/{key}", _upload("GET"), read=True),
+    Endpoint("HEAD /uploads/{key}", _upload("HEAD")),
+    Endpoint("GET /metrics", lambda c, s, r, i: {"method": "GET", "url": "/metrics"}),
+    Endpoint("DELETE /ewaste/{item_id}", _delete),
+]
+READS = [e for e in ENDPOINTS if e.read]
+MIXED = Endpoint("mixed reads", lambda c, s, r, i: READS[i % len(READS)].build(c, s, r, i))
+
+
+async def run_endpoint(client, endpoint, ctx, state, requests, concurrency):
+    import httpx
+
+    rng = random.Random(endpoint.name)  # str seeds are stable across processes
+    latencies, errors = [], 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in remaining:
+            request = endpoint.build(ctx, state, rng, i)
+            started = time.perf_counter()
+            try:
+                resp = await client.request(**request)
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            if resp.status_code >= 400:
+                errors += 1
+                continue
+            latencies.append((time.perf_counter() - started) * 1000)
+            if endpoint.after:
+                endpoint.after(state, resp)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": requests,
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50": round(statistics.median(latencies), 2) if latencies else None,
+        "p95": round(percentile(latencies, 95), 2) if latencies else None,
+        "p99": round(percentile(latencies, 99), 2) if latencies else None,
+    }
+
+
+async def drive(client, ctx, requests, concurrency):
+    from benchmarks.synthetic import jpeg_bytes
+
+    state = {"tokens": [], "created": [], "jpeg": jpeg_bytes(random.Random(0))}
+    # Not timed; /auth/me uses it, since the logout phase revokes the tokens logins return
+    resp = await client.post("/auth/login", json={"email": "user0@example.com", "password": ctx["password"]})
+    state["session"] = {"Authorization": f"Bearer {resp.json().get('access_token')}"}
+    results = {}
+    for endpoint in ENDPOINTS + [MIXED]:
+        results[endpoint.name] = await run_endpoint(client, endpoint, ctx, state, requests, concurrency)
+    return results
+
+
+def child(args):
+    """asgi mode, in its own process so RSS and module state belong to this run only."""
+    import httpx
+
+    from main import app
+
+    with open(args.context) as f:
+        ctx = json.load(f)
+
+    async def run():
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://load", timeout=60) as client:
+                return await drive(client, ctx, args.requests, args.concurrency)
+
+    endpoints = asyncio.run(run())
+    peak_kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"endpoints": endpoints, "peak_rss_mb": round(peak_kib / 1024, 1)}))
+
+
+def run_asgi(args, context_path):
+    cmd = [sys.executable, "-m", "benchmarks.load_test", "--child", "--context", context_path,
+           "--requests", str(args.requests), "--concurrency", str(args.concurrency)]
+    out = subprocess.run(cmd, stdout=subprocess.PIPE, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def _peak_rss_mb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def run_uvicorn(args, ctx):
+    import httpx
+
+    from benchmarks.gemini_mock import free_port
+
+    port = free_port()
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "--factory", "main:create_app",
+                               "--port", str(port), "--log-level", "warning", "--no-access-log"])
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                httpx.get(base_url + "/", timeout=1).raise_for_status()
+                break
+            except httpx.HTTPError:
+                if server.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError("uvicorn did not start")
+                time.sleep(0.2)
+
+        async def run():
+            limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+            async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+                return await drive(client, ctx, args.requests, args.concurrency)
+
+        endpoints = asyncio.run(run())
+        return {"endpoints": endpoints, "peak_rss_mb": _peak_rss_mb(server.pid)}
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def compare(baseline: dict, current: dict, threshold: float, min_delta_ms: float) -> list[str]:
+    """Regressions of `current` against `baseline`, as readable lines; empty when there are none."""
+    regressions = []
+    concurrency = current["meta"]["concurrency"]
+    for mode, run in current["modes"].items():
+        base_run = baseline.get("modes", {}).get(mode)
+        if base_run is None:
+            continue
+        for name, cur in run["endpoints"].items():
+            base = base_run["endpoints"].get(name)
+            if base is None:
+                continue
+            label = f"{mode} {name}"
+            if cur["errors"] > base["errors"]:
+                regressions.append(f"{label}: {cur['errors']} failed requests, baseline {base['errors']}")
+            if cur["p95"] is not None and base["p95"] is not None:
+                if cur["p95"] > base["p95"] * (1 + threshold) and cur["p95"] - base["p95"] >= min_delta_ms:
+                    regressions.append(f"{label}: p95 {cur['p95']:.2f} ms, baseline {base['p95']:.2f} ms")
+            if base["rps"] and cur["rps"] < base["rps"] * (1 - threshold):
+                # Time per request at this concurrency, so sub-millisecond endpoints need a real slowdown
+                grown_ms = concurrency * 1000 * (1 / max(cur["rps"], 1e-9) - 1 / base["rps"])
+                if grown_ms >= min_delta_ms:
+                    regressions.append(f"{label}: {cur['rps']:.1f} req/s, baseline {base['rps']:.1f} req/s")
+        cur_rss, base_rss = run.get("peak_rss_mb"), base_run.get("peak_rss_mb")
+        if cur_rss and base_rss and cur_rss > base_rss * (1 + threshold):
+            regressions.append(f"{mode}: peak RSS {cur_rss:.0f} MiB, baseline {base_rss:.0f} MiB")
+    return regressions
+
+
+def print_run(mode, run):
+    print(f"\n{mode}  (peak RSS {run['peak_rss_mb']} MiB)")
+    for name, r in run["endpoints"].items():
+        if r["p50"] is None:
+            print(f"  {name:38s} all {r['errors']} requests failed")
+            continue
+        print(f"  {name:38s} {r['rps']:9.1f} req/s  p50 {r['p50']:8.2f}  p95 {r['p95']:8.2f}  "
+              f"p99 {r['p99']:8.2f} ms  failed {r['errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--items", type=int, default=10_000)
+    parser.add_argument("--images", type=int, default=24)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--requests", type=int, default=200, help="per endpoint")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--modes", nargs="+", choices=["asgi", "uvicorn"], default=["asgi", "uvicorn"])
+    parser.add_argument("--gemini-latency-ms", type=float, default=50)
+    parser.add_argument("--bcrypt-rounds", type=int, default=4, help="for seeded and registered users")
+    parser.add_argument("--output", help="write the results here as JSON; use it as a later --baseline")
+    parser.add_argument("--baseline", help="compare with this earlier --output and exit 1 on regressions")
+    parser.add_argument("--threshold", type=float, default=0.25)
+    parser.add_argument("--min-delta-ms", type=float, default=2.0)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--context", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child(args)
+
+    from benchmarks.gemini_mock import running_mock
+
+    report = {"meta": {
+        "users": args.users, "items": args.items, "images": args.images, "seed": args.seed,
+        "requests": args.requests, "concurrency": args.concurrency, "gemini_latency_ms": args.gemini_latency_ms,
+        "python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }, "modes": {}}
+
+    with tempfile.TemporaryDirectory() as tmpdir, running_mock(args.gemini_latency_ms) as (_, mock_url):
+        seeded = os.path.join(tmpdir, "seeded.db")
+        # Read by the app in every mode; set before anything imports it
+        os.environ.update({
+            "DATABASE_URL": f"sqlite:///{seeded}",
+            "UPLOAD_DIR": os.path.join(tmpdir, "uploads"),
+            "BCRYPT_ROUNDS": str(args.bcrypt_rounds),
+            "GEMINI_API_KEY": "load-test",
+            "GEMINI_VISION_URL": mock_url,
+            # This measures what endpoints cost; benchmarks.overload measures admission control
+            "UPLOAD_RATE_PER_MINUTE": "0",
+            "UPLOAD_MAX_CONCURRENCY": "0",
+            "ANALYSIS_MAX_BACKLOG": "0",
+        })
+        from benchmarks import synthetic
+        from database import make_engine
+        from migrations import run_migrations
+
+        engine = make_engine(os.environ["DATABASE_URL"])
+        run_migrations(engine)
+        ctx = synthetic.seed(engine, args.users, args.items, args.images, args.seed, args.bcrypt_rounds)
+        engine.dispose()
+        context_path = os.path.join(tmpdir, "context.json")
+        with open(context_path, "w") as f:
+            json.dump(ctx, f)
+        print(f"{args.requests} requests per endpoint at concurrency {args.concurrency}")
+
+        for mode in args.modes:
+            database = os.path.join(tmpdir, f"{mode}.db")
+            # Backup API rather than a file copy: it includes what is still in the WAL
+            with sqlite3.connect(seeded) as source, sqlite3.connect(database) as target:
+                source.backup(target)
+            os.environ["DATABASE_URL"] = f"sqlite:///{database}"
+            run = run_asgi(args, context_path) if mode == "asgi" else run_uvicorn(args, ctx)
+            report["modes"][mode] = run
+            print_run(mode, run)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nwrote {args.output}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        mismatched = [k for k in SCALE_KEYS if baseline["meta"].get(k) != report["meta"][k]]
+        if mismatched:
+            print(f"\nwarning: baseline was made with different {', '.join(mismatched)}")
+        regressions = compare(baseline, report, args.threshold, args.min_delta_ms)
+        print(f"\n{len(regressions)} regressions past {args.threshold:.0%} against {args.baseline}")
+        for line in regressions:
+            print(f"  {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Login latency under concurrent load, per bcrypt pool mode.
+
+Drives POST /auth/login through an in-process ASGI client against a throwaway
+SQLite database, at several concurrency levels. It reports login p50/p99, and
+the p99 of GET / sampled during the burst, to show whether hashing still
+starves unrelated requests.
+
+    python -m benchmarks.login_latency --rounds 12 --levels 1 8 32 64 --executor process thread
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+_tmpdir = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir.name, 'bench.db')}"
+
+import httpx  # noqa: E402
+
+import utils.auth_utils as auth_utils  # noqa: E402
+import utils.password_hashing as password_hashing  # noqa: E402
+from database import engine  # noqa: E402
+from main import app  # noqa: E402
+from migrations import run_migrations  # noqa: E402
+
+USERS = 64
+PASSWORD = "correct horse battery staple"
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def _timed(client, method, url, **kwargs):
+    started = time.perf_counter()
+    resp = await client.request(method, url, **kwargs)
+    assert resp.status_code == 200, resp.text
+    return (time.perf_counter() - started) * 1000
+
+
+async def run_level(client, concurrency, requests):
+    queue = asyncio.Queue()
+    for i in range(requests):
+        queue.put_nowait(i)
+    logins, probes = [], []
+
+    async def worker():
+        while not queue.empty():
+            i = queue.get_nowait()
+            body = {"email": f"user{i % USERS}@example.com", "password": PASSWORD}
+            logins.append(await _timed(client, "POST", "/auth/login", json=body))
+
+    async def probe():
+        while not queue.empty():
+            probes.append(await _timed(client, "GET", "/"))
+            await asyncio.sleep(0.01)
+
+    started = time.perf_counter()
+    await asyncio.gather(probe(), *[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+    return {
+        "throughput": requests / elapsed,
+        "p50": statistics.median(logins),
+        "p99": percentile(logins, 99),
+        "probe_p99": percentile(probes, 99) if probes else float("nan"),
+    }
+
+
+async def bench(executor, workers, levels, requests):
+    password_hashing.shutdown()
+    password_hashing.start(executor, workers)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for i in range(USERS):
+            resp = await client.post("/auth/register", json={"name": f"u{i}", "email": f"user{i}@example.com", "password": PASSWORD})
+            assert resp.status_code in (200, 400), resp.text
+        await run_level(client, 1, 4)  # warm the pool
+        for level in levels:
+            r = await run_level(client, level, max(requests, level * 4))
+            print(f"{executor:8s} c={level:<4d} {r['throughput']:7.1f} logins/s  p50 {r['p50']:8.1f} ms  "
+                  f"p99 {r['p99']:8.1f} ms  GET / p99 {r['probe_p99']:7.1f} ms")
+    password_hashing.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=auth_utils.BCRYPT_ROUNDS)
+    parser.add_argument("--workers", type=int, default=password_hashing.PASSWORD_HASH_WORKERS)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("--requests", type=int, default=128)
+    parser.add_argument("--executor", nargs="+", default=["process", "thread"], choices=["process", "thread"])
+    args = parser.parse_args()
+
+    auth_utils.BCRYPT_ROUNDS = args.rounds
+    # The app migrates in its lifespan, which ASGITransport does not run
+    run_migrations(engine)
+    print(f"bcrypt cost {args.rounds}, {args.workers} hashing workers, {args.requests} logins per level")
+    for executor in args.executor:
+        asyncio.run(bench(executor, args.workers, args.levels, args.requests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""/ewaste/nearby: the spatial index vs scanning every located item.
+
+Seeds --items synthetic items (85% located around ten Indian cities, see
+benchmarks.synthetic) into a throwaway SQLite database. It then times k
+nearest recyclable items for random points near those cities, per radius:
+
+  index  repositories.geo_repository.nearby_items (R*Tree, growing box)
+  scan   every located recyclable item read and ranked by haversine distance
+
+    python -m benchmarks.nearby --items 1000000 --queries 50
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from benchmarks import synthetic
+from database import make_engine
+from migrations import run_migrations
+from models.ewaste_model import EwasteItem
+from repositories.geo_repository import haversine_km, nearby_items
+
+
+def scan(db, lat, lon, radius_km, k):
+    rows = db.execute(select(EwasteItem.id, EwasteItem.latitude, EwasteItem.longitude).where(
+        EwasteItem.tag == "recycle", EwasteItem.latitude.is_not(None)))
+    hits = sorted((d, item_id) for item_id, a, b in rows if (d := haversine_km(lat, lon, a, b)) <= radius_km)
+    return [item_id for _, item_id in hits[:k]]
+
+
+def timed(fn, points):
+    samples = []
+    for point in points:
+        started = time.perf_counter()
+        fn(*point)
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), max(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=200_000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--scan-queries", type=int, default=5, help="the scan is slow; time fewer")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        engine = make_engine(f"sqlite:///{os.path.join(tmpdir, 'bench.db')}")
+        run_migrations(engine)
+        synthetic.seed(engine, 1000, args.items, images=0)
+        rng = random.Random(9)
+        points = []
+        for _ in range(args.queries):
+            _, lat, lon, _ = rng.choice(synthetic.CITIES)
+            points.append((rng.gauss(lat, 0.1), rng.gauss(lon, 0.1)))
+        print(f"{args.items} items, k={args.k}, median / max ms")
+        with Session(engine) as db:
+            for radius in (1, 5, 25, 100, 500):
+                index_ms = timed(lambda lat, lon: nearby_items(db, lat, lon, radius, args.k, "recycle"), points)
+                scan_ms = timed(lambda lat, lon: scan(db, lat, lon, radius, args.k), points[:args.scan_queries])
+                for lat, lon in points[:3]:
+                    got = [r["id"] for r in nearby_items(db, lat, lon, radius, args.k, "recycle")]
+                    assert got == scan(db, lat, lon, radius, args.k)
+                print(f"radius {radius:4d} km  index {index_ms[0]:8.2f} / {index_ms[1]:8.2f}  "
+                      f"scan {scan_ms[0]:8.1f} / {scan_ms[1]:8.1f}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""Uploads under overload: latency and shedding with and without admission control.
+
+Starts `uvicorn --factory main:create_app` on a throwaway SQLite database
+with --clients users (benchmarks.synthetic), with Gemini replaced by
+benchmarks.gemini_mock.
+Then photos are uploaded to /ewaste/add at --rate per second for --seconds,
+open loop: a new upload starts on schedule however many are still waiting.
+--abusive-share of them come from one signed-in client and the rest are
+spread over the other users; --broken-share are broken devices, which queue
+an analysis. Meanwhile one reader fetches /ewaste/reusable ten times a
+second, to show what everyone else sees.
+
+  off  no limits (UPLOAD_RATE_PER_MINUTE, UPLOAD_MAX_CONCURRENCY and
+       ANALYSIS_MAX_BACKLOG at 0): every upload is taken and waits its turn
+  on   the limits from --rate-per-minute, --burst, --max-concurrency,
+       --queue-seconds and --max-backlog
+
+For each mode and client it reports accepted uploads per second, their
+p50/p95/p99 latency (from when each upload was due), and how many got 429,
+503 or anything else. Then the p99 of the reads and the analysis jobs still
+queued or running at the end.
+
+    python -m benchmarks.overload --rate 30 --seconds 20
+    python -m benchmarks.overload --modes on --max-p99-ms 2000   # exit 1 above this
+
+It exits 1 when the accepted uploads' p99 in "on" mode is over --max-p99-ms.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import httpx
+
+from benchmarks.gemini_mock import free_port, running_mock
+from benchmarks.load_test import percentile
+
+
+def _limits(args, mode: str) -> dict:
+    if mode == "off":
+        return {"UPLOAD_RATE_PER_MINUTE": "0", "UPLOAD_MAX_CONCURRENCY": "0", "ANALYSIS_MAX_BACKLOG": "0"}
+    limits = {
+        "UPLOAD_RATE_PER_MINUTE": str(args.rate_per_minute),
+        "UPLOAD_BURST": str(args.burst),
+        "UPLOAD_QUEUE_SECONDS": str(args.queue_seconds),
+        "ANALYSIS_MAX_BACKLOG": str(args.max_backlog),
+    }
+    if args.max_concurrency is not None:
+        limits["UPLOAD_MAX_CONCURRENCY"] = str(args.max_concurrency)
+    return limits
+
+
+def _start_server(env: dict) -> tuple[subprocess.Popen, str]:
+    port = free_port()
+    # Its tracebacks ("database is locked" without limits) show up as "other" in the report
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "--factory", "main:create_app",
+                               "--port", str(port), "--log-level", "warning", "--no-access-log"],
+                              env=env, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while True:
+        try:
+            httpx.get(base_url + "/", timeout=1).raise_for_status()
+            return server, base_url
+        except httpx.HTTPError:
+            if server.poll() is not None or time.monotonic() > deadline:
+                server.terminate()
+                raise RuntimeError("uvicorn did not start")
+            time.sleep(0.2)
+
+
+def _upload(jpeg: bytes, rng: random.Random, broken_share: float, i: int) -> dict:
+    broken = rng.random() < broken_share
+    data = {"user_id": "1", "category": "consumer", "product_name": "Overload Phone",
+            "is_working": "false" if broken else "true"}
+    if not broken:
+        data["price"] = "900"
+    # Fresh bytes after the JPEG end marker, so no analysis comes from the cache
+    return {"data": data, "files": {"image": (f"overload-{i}.jpg", jpeg + rng.randbytes(16), "image/jpeg")}}
+
+
+async def _send(client, request, headers, due, stats, kind):
+    # Timed from when the request was due, so a backed-up client does not hide server delays
+    try:
+        resp = await client.post("/ewaste/add", headers=headers, **request)
+    except httpx.HTTPError:
+        stats[kind]["error"] += 1
+        return
+    stats[kind][resp.status_code] += 1
+    if resp.status_code == 200:
+        stats[kind + "_ms"].append((time.monotonic() - due) * 1000)
+
+
+async def _reader(client, deadline, stats):
+    while time.monotonic() < deadline:
+        started = time.monotonic()
+        try:
+            (await client.get("/ewaste/reusable", params={"limit": 20})).raise_for_status()
+            stats["reads"].append((time.monotonic() - started) * 1000)
+        except httpx.HTTPError:
+            stats["read_errors"] += 1
+        await asyncio.sleep(max(0.1 - (time.monotonic() - started), 0))
+
+
+async def drive(base_url: str, tokens: list[str], jpeg: bytes, args) -> dict:
+    """Open loop: uploads arrive at --rate per second whether or not earlier ones have finished."""
+    stats = {"polite": Counter(), "polite_ms": [], "abusive": Counter(), "abusive_ms": [],
+             "reads": [], "read_errors": 0}
+    rng = random.Random(args.seed)
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=256)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        started = time.monotonic()
+        reader = asyncio.create_task(_reader(client, started + args.seconds, stats))
+        tasks = []
+        for i in range(int(args.rate * args.seconds)):
+            due = started + i / args.rate
+            await asyncio.sleep(max(due - time.monotonic(), 0))
+            # The abusive client always uses the first token; everyone else spreads over the rest
+            abusive = rng.random() < args.abusive_share
+            token = tokens[0] if abusive else tokens[1 + i % (len(tokens) - 1)]
+            request = _upload(jpeg, rng, args.broken_share, i)
+            tasks.append(asyncio.create_task(_send(client, request, {"Authorization": f"Bearer {token}"}, due, stats,
+                                                   "abusive" if abusive else "polite")))
+        await asyncio.gather(reader, *tasks)
+    return stats
+
+
+def _backlog(database: str) -> int:
+    with sqlite3.connect(database) as db:
+        return db.execute("SELECT count(*) FROM analysis_jobs WHERE status IN ('queued', 'running')").fetchone()[0]
+
+
+def _ms(samples, pct) -> str:
+    return f"{percentile(samples, pct):9.0f}" if samples else f"{'-':>9s}"
+
+
+def _row(mode: str, kind: str, counts: Counter, latencies: list, seconds: float) -> str:
+    other = sum(n for code, n in counts.items() if code not in (200, 429, 503))
+    return (f"{mode:5s} {kind:8s} {sum(counts.values()):6d} {len(latencies) / seconds:7.1f} {_ms(latencies, 50)} "
+            f"{_ms(latencies, 95)} {_ms(latencies, 99)} {counts[429]:6d} {counts[503]:6d} {other:5d}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rate", type=float, default=30, help="uploads offered per second")
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--clients", type=int, default=200, help="users the uploads are spread over")
+    parser.add_argument("--abusive-share", type=float, default=0.3, help="uploads sent by one abusive client")
+    parser.add_argument("--broken-share", type=float, default=0.5, help="uploads that queue an analysis")
+    parser.add_argument("--gemini-latency-ms", type=float, default=200)
+    parser.add_argument("--rate-per-minute", type=float, default=60)
+    parser.add_argument("--burst", type=int, default=20)
+    parser.add_argument("--max-concurrency", type=int, help="default: the app's UPLOAD_MAX_CONCURRENCY")
+    parser.add_argument("--queue-seconds", type=float, default=0.5)
+    parser.add_argument("--max-backlog", type=int, default=500)
+    parser.add_argument("--modes", nargs="+", choices=["off", "on"], default=["off", "on"])
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--max-p99-ms", type=float, help="exit 1 when accepted uploads' p99 in 'on' mode is higher")
+    args = parser.parse_args()
+    if args.clients < 2:
+        parser.error("--clients must be at least 2")
+
+    with tempfile.TemporaryDirectory() as tmpdir, running_mock(args.gemini_latency_ms) as (_, mock_url):
+        seeded = os.path.join(tmpdir, "seeded.db")
+        os.environ.update({
+            "DATABASE_URL": f"sqlite:///{seeded}",
+            "UPLOAD_DIR": os.path.join(tmpdir, "uploads"),
+            "GEMINI_API_KEY": "overload-test",
+            "GEMINI_VISION_URL": mock_url,
+        })
+        from benchmarks import synthetic
+        from database import make_engine
+        from migrations import run_migrations
+        from utils.auth_utils import create_access_token
+
+        engine = make_engine(os.environ["DATABASE_URL"])
+        run_migrations(engine)
+        synthetic.seed(engine, args.clients, 0, images=0)
+        engine.dispose()
+        # Signed with the server's SECRET_KEY, so no logins (and no bcrypt) are needed
+        tokens = [create_access_token({"sub": f"user{i}@example.com", "user_id": i + 1}) for i in range(args.clients)]
+        jpeg = synthetic.jpeg_bytes(random.Random(args.seed))
+
+        print(f"{args.rate:g} uploads/s for {args.seconds:g} s, {args.abusive_share:.0%} from one client, "
+              f"the rest from {args.clients - 1}; Gemini at {args.gemini_latency_ms:g} ms")
+        print(f"{'mode':5s} {'client':8s} {'sent':>6s} {'ok/s':>7s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s} "
+              f"{'429':>6s} {'503':>6s} {'other':>5s}")
+        summary, failed = [], False
+        for mode in args.modes:
+            database = os.path.join(tmpdir, f"{mode}.db")
+            with sqlite3.connect(seeded) as source, sqlite3.connect(database) as target:
+                source.backup(target)
+            env = {**os.environ, "DATABASE_URL": f"sqlite:///{database}", **_limits(args, mode)}
+            server, base_url = _start_server(env)
+            try:
+                stats = asyncio.run(drive(base_url, tokens, jpeg, args))
+                backlog = _backlog(database)
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+            for kind in ("polite", "abusive"):
+                print(_row(mode, kind, stats[kind], stats[kind + "_ms"], args.seconds))
+            summary.append(f"{mode:5s} reads p99 {_ms(stats['reads'], 99).strip()} ms, "
+                           f"{stats['read_errors']} failed; analysis backlog at the end {backlog}")
+            accepted = stats["polite_ms"] + stats["abusive_ms"]
+            if mode == "on" and args.max_p99_ms is not None and accepted and percentile(accepted, 99) > args.max_p99_ms:
+                failed = True
+        print()
+        print("\n".join(summary))
+
+    if failed:
+        print(f"accepted uploads' p99 in 'on' mode is over --max-p99-ms {args.max_p99_ms:g}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Public read endpoints with and without the response cache.
+
+Seeds a throwaway SQLite database, then times sequential requests through an
+in-process ASGI client in three modes:
+
+  uncached     the in-process tier holds no entries, so every request builds its body
+  cached       repeats of the same URL, served from the in-process tier
+  revalidated  repeats that send the ETag back and get 304s
+
+    python -m benchmarks.response_cache --items 5000 --requests 300
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+
+_tmpdir = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir.name, 'bench.db')}"
+
+import httpx  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+
+from benchmarks.login_latency import percentile  # noqa: E402
+from database import SessionLocal  # noqa: E402
+from main import app  # noqa: E402
+from models.ewaste_model import EwasteItem  # noqa: E402
+from models.user_model import User  # noqa: E402
+from repositories.analytics_repository import rebuild_counters  # noqa: E402
+from utils.response_cache import response_cache  # noqa: E402
+
+URLS = ["/ewaste/analytics", "/ewaste/analytics?include_items=true", "/ewaste/reusable?limit=100", "/ewaste/reusable"]
+
+
+def seed(n):
+    rng = random.Random(5)
+    with SessionLocal() as db:
+        db.execute(insert(User), [{"name": f"u{i}", "email": f"u{i}@example.com", "password": "x", "phone": "555"}
+                                  for i in range(100)])
+        db.execute(insert(EwasteItem), [
+            {"user_id": rng.randint(1, 100), "category": rng.choice(["consumer", "utility"]), "product_name": f"Item {i}",
+             "is_working": True, "tag": rng.choice(["reuse", "recycle"]), "price": rng.randint(1, 900)}
+            for i in range(n)
+        ])
+        db.commit()
+        rebuild_counters(db)
+    response_cache.invalidate()
+
+
+async def run(client, url, requests, revalidate):
+    headers = {}
+    if revalidate:
+        headers["If-None-Match"] = (await client.get(url)).headers["etag"]
+    samples = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        resp = await client.get(url, headers=headers)
+        assert resp.status_code == (304 if revalidate else 200)
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+async def bench(requests):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for url in URLS:
+            line = f"{url:38s}"
+            for mode in ("uncached", "cached", "revalidated"):
+                response_cache._memory.max_entries = 0 if mode == "uncached" else 256
+                samples = await run(client, url, requests, mode == "revalidated")
+                line += f"  {mode} p50 {statistics.median(samples):7.2f} ms p95 {percentile(samples, 95):7.2f}"
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--requests", type=int, default=300)
+    args = parser.parse_args()
+    from migrations import run_migrations
+    from database import engine
+
+    run_migrations(engine)
+    seed(args.items)
+    print(f"{args.items} items, {args.requests} sequential requests per mode")
+    asyncio.run(bench(args.requests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Search latency: the ewaste_search index vs a LIKE scan of ewaste_items.
+
+Seeds a throwaway SQLite database with --items items, some of them with
+analysed components, through the same insert path /ewaste/bulk uses. It then
+times search_items (one page plus facets) for a few queries against the
+equivalent LIKE query on product_name, which is what clients had to do with
+/ewaste/all before.
+
+    python -m benchmarks.search --items 100000 --repeat 20
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.orm import Session
+
+from benchmarks.login_latency import percentile
+from database import make_engine
+from migrations import run_migrations
+from models.ewaste_model import EwasteItem
+from models.user_model import User
+from repositories.ingest_repository import insert_items
+from repositories.search_repository import reindex_items, search_items
+
+WORDS = ["laptop", "phone", "charger", "monitor", "fridge", "router", "printer", "tablet", "camera", "speaker",
+         "keyboard", "battery", "cable", "console", "microwave", "television", "drive", "headphones"]
+BRANDS = ["dell", "hp", "lenovo", "samsung", "lg", "sony", "apple", "asus", "acer", "philips"]
+COMPONENTS = ["copper", "plastic", "aluminium", "gold", "lithium", "glass", "steel", "circuit board"]
+QUERIES = ["laptop", "sam", "dell laptop", "lithium", "zzz"]
+
+
+def seed(engine, n):
+    rng = random.Random(11)
+    with Session(engine) as db:
+        db.execute(insert(User), [{"name": "seller", "email": "seller@example.com", "password": "x"}])
+        for start in range(0, n, 5000):
+            rows = []
+            for _ in range(min(5000, n - start)):
+                working = rng.random() < 0.6
+                rows.append({"user_id": 1, "category": rng.choice(["consumer", "utility"]),
+                             "product_name": f"{rng.choice(BRANDS).title()} {rng.choice(WORDS).title()}",
+                             "is_working": working, "tag": "reuse" if working else "recycle",
+                             "price": rng.randint(5, 2000) if working else None, "image_path": None,
+                             "analysis_status": None})
+            ids = insert_items(db, rows, {})
+            analysed = [i for i in ids if rng.random() < 0.3]
+            for item_id in analysed:
+                db.execute(update(EwasteItem).where(EwasteItem.id == item_id).values(gemini_analysis={
+                    "recyclable_components": [{"name": c} for c in rng.sample(COMPONENTS, 3)]}))
+            reindex_items(db, analysed)
+            db.commit()
+
+
+def time_it(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), percentile(samples, 95)
+
+
+def like_scan(db, q):
+    # One page plus the counts a client would need, without the index
+    cond = [EwasteItem.product_name.ilike(f"%{term}%") for term in q.split()]
+    db.execute(select(EwasteItem).where(*cond).order_by(EwasteItem.id).limit(20)).all()
+    db.execute(select(EwasteItem.tag, func.count()).where(*cond).group_by(EwasteItem.tag)).all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        engine = make_engine(f"sqlite:///{os.path.join(tmpdir, 'bench.db')}")
+        run_migrations(engine)
+        started = time.perf_counter()
+        seed(engine, args.items)
+        print(f"seeded {args.items} items in {time.perf_counter() - started:.1f}s")
+        with Session(engine) as db:
+            for q in QUERIES:
+                total = search_items(db, q)["total"]
+                idx = time_it(lambda: search_items(db, q), args.repeat)
+                scan = time_it(lambda: like_scan(db, q), args.repeat)
+                print(f"{q!r:15s} {total:7d} hits  index p50 {idx[0]:8.2f} ms p95 {idx[1]:8.2f} ms  "
+                      f"LIKE scan p50 {scan[0]:8.2f} ms p95 {scan[1]:8.2f} ms")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
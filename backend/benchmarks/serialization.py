@@ -0,0 +1,102 @@
+"""Encoding list responses: the old response_model path vs FastJSONResponse.
+
+Seeds --rows items (a third with an analysis result) in an in-memory SQLite
+database, then encodes the /ewaste/reusable query result with each pipeline.
+It reports the median time and the tracemalloc peak per 10k rows.
+
+  model     RowMapping -> dict -> EwasteWithUserOut validation -> jsonable_encoder -> json.dumps
+            (what FastAPI did with a response_model and the default JSONResponse)
+  stdlib    rows_as_dicts -> json.dumps (utils.serialization without orjson)
+  orjson    rows_as_dicts -> orjson (utils.serialization.dumps)
+
+    python -m benchmarks.serialization --rows 10000 --repeat 5
+"""
+
+import argparse
+import json
+import statistics
+import time
+import tracemalloc
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from database import make_engine
+from migrations import run_migrations
+from models.ewaste_model import EwasteItem
+from models.user_model import User
+from repositories.ewaste_repository import reusable_items_query
+from schemas.ewaste_schema import EwasteWithUserOut
+from utils import serialization
+from utils.serialization import rows_as_dicts
+
+ANALYSIS = {"source": "stub", "recyclable_components": [{"name": "copper", "confidence": 0.71},
+                                                        {"name": "plastic", "confidence": 0.52}],
+            "raw": None, "suggested_tag": "reuse"}
+
+
+def model_path(db, stmt):
+    rows = [dict(row) for row in db.execute(stmt).mappings()]
+    validated = TypeAdapter(list[EwasteWithUserOut]).validate_python(rows)
+    return json.dumps(jsonable_encoder(validated), ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def stdlib_path(db, stmt):
+    rows = rows_as_dicts(db.execute(stmt))
+    return json.dumps(rows, ensure_ascii=False, separators=(",", ":"), default=str).encode()
+
+
+def orjson_path(db, stmt):
+    return serialization.dumps(rows_as_dicts(db.execute(stmt)))
+
+
+def measure(fn, db, stmt, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = fn(db, stmt)
+        times.append(time.perf_counter() - started)
+    tracemalloc.start()
+    fn(db, stmt)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(times), peak, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    engine = make_engine("sqlite://")
+    run_migrations(engine)
+    with Session(engine) as db:
+        db.execute(insert(User), [{"name": f"user{i}", "email": f"u{i}@example.com", "password": "x", "phone": "98765"}
+                                  for i in range(100)])
+        db.execute(insert(EwasteItem), [
+            {"user_id": i % 100 + 1, "category": "consumer", "product_name": f"Device {i}", "is_working": True,
+             "tag": "reuse", "price": 100 + i, "image_path": f"/uploads/ab/cd/{i:064x}.jpg",
+             "gemini_analysis": ANALYSIS if i % 3 == 0 else None}
+            for i in range(args.rows)
+        ])
+        db.commit()
+
+        stmt = reusable_items_query()
+        per = 10_000 / args.rows
+        print(f"{args.rows} rows, per 10k rows:")
+        pipelines = [("model", model_path), ("stdlib", stdlib_path)]
+        if serialization.orjson is not None:
+            pipelines.append(("orjson", orjson_path))
+        baseline = None
+        for name, fn in pipelines:
+            seconds, peak, size = measure(fn, db, stmt, args.repeat)
+            baseline = baseline or seconds
+            print(f"{name:7s} {seconds * per * 1000:8.1f} ms  peak {peak * per / 2**20:7.1f} MiB  "
+                  f"body {size * per / 2**20:5.1f} MiB  ({baseline / seconds:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
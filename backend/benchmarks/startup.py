@@ -0,0 +1,161 @@
+"""Cold start: how long `import main` and the first request take, per module.
+
+Each run is a fresh interpreter against a throwaway SQLite database:
+
+  import     `python -X importtime -c "import main"`, parsed. Reports the
+             median total and the slowest top-level packages (cumulative
+             time of their outermost imports), and checks that the
+             libraries the app defers (DEFERRED) were not imported.
+  startup    import main, run the lifespan startup (migrations, analysis
+             workers) and serve GET / and POST /auth/login in process,
+             timing each step
+
+    python -m benchmarks.startup --runs 5
+    python -m benchmarks.startup --runs 5 --max-import-ms 1500   # exit 1 above this
+
+It exits 1 when `import main` loaded a deferred library.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+
+# Loaded on first use, never by importing the app
+DEFERRED = ("httpx", "jose", "bcrypt", "dotenv")
+# bcrypt.hashpw(b"pw", bcrypt.gensalt(4))
+PASSWORD_HASH = "$2b$04$UA/S3AcMfI.A7MJTYAFgkue2geXUEPcT6FDXU5YbsaUm3dGVQ03hy"
+
+
+def parse_importtime(stderr: str) -> list[tuple[str, int, int, int]]:
+    """(module, self us, cumulative us, nesting depth) for each line of -X importtime output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2  # 0 for the imports the command ran
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def by_package(rows) -> dict[str, int]:
+    """Cumulative us per top-level package, counting only its outermost imports."""
+    totals = defaultdict(int)
+    stack = []  # packages of the enclosing imports, innermost last
+    # Children come before their parent in the output, so walk it backwards
+    for name, _, cumulative_us, depth in reversed(rows):
+        del stack[depth:]
+        package = name.split(".")[0]
+        if package not in stack:
+            totals[package] += cumulative_us
+        stack.append(package)
+    return dict(totals)
+
+
+def _env(tmpdir: str) -> dict:
+    return {**os.environ, "DATABASE_URL": f"sqlite:///{os.path.join(tmpdir, 'startup.db')}",
+            "UPLOAD_DIR": os.path.join(tmpdir, "uploads")}
+
+
+def run_import(tmpdir: str) -> dict:
+    code = "import sys, json, main; print(json.dumps(sorted(m for m in sys.modules if '.' not in m)))"
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          env=_env(tmpdir), capture_output=True, text=True, check=True)
+    rows = parse_importtime(proc.stderr)
+    main_us = next(cumulative for name, _, cumulative, depth in rows if name == "main" and depth == 0)
+    loaded = set(json.loads(proc.stdout))
+    return {"main_ms": main_us / 1000, "packages": by_package(rows),
+            "deferred_loaded": [m for m in DEFERRED if m in loaded]}
+
+
+def child():
+    import asyncio
+    import time
+
+    steps = {}
+    started = time.perf_counter()
+    from main import app
+    steps["import main"] = (time.perf_counter() - started) * 1000
+
+    async def run():
+        import httpx
+
+        from database import SessionLocal
+        from models.user_model import User
+
+        started = time.perf_counter()
+        async with app.router.lifespan_context(app):
+            steps["lifespan startup"] = (time.perf_counter() - started) * 1000
+            with SessionLocal() as db:
+                # A precomputed cost-4 hash, so the login below is what loads bcrypt
+                db.add(User(name="Start", email="start@example.com", password=PASSWORD_HASH))
+                db.commit()
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://startup") as client:
+                for name, method, url, body in (
+                    ("first GET /", "GET", "/", None),
+                    ("first POST /auth/login", "POST", "/auth/login", {"email": "start@example.com", "password": "pw"}),
+                ):
+                    started = time.perf_counter()
+                    (await client.request(method, url, json=body)).raise_for_status()
+                    steps[name] = (time.perf_counter() - started) * 1000
+
+    asyncio.run(run())
+    print(json.dumps(steps))
+
+
+def run_startup(tmpdir: str) -> dict:
+    proc = subprocess.run([sys.executable, "-m", "benchmarks.startup", "--child"],
+                          env=_env(tmpdir), capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=12, help="packages to list")
+    parser.add_argument("--max-import-ms", type=float, help="exit 1 when the median import takes longer")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child()
+
+    imports, startups = [], []
+    for _ in range(args.runs):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            imports.append(run_import(tmpdir))
+        with tempfile.TemporaryDirectory() as tmpdir:
+            startups.append(run_startup(tmpdir))
+
+    median_ms = statistics.median(r["main_ms"] for r in imports)
+    print(f"import main: median {median_ms:.0f} ms over {args.runs} runs "
+          f"(min {min(r['main_ms'] for r in imports):.0f}, max {max(r['main_ms'] for r in imports):.0f})")
+    packages = defaultdict(list)
+    for run in imports:
+        for package, us in run["packages"].items():
+            packages[package].append(us / 1000)
+    print("\nslowest packages (median cumulative ms):")
+    ranked = sorted(packages.items(), key=lambda item: -statistics.median(item[1]))
+    for package, samples in [item for item in ranked if item[0] != "main"][:args.top]:
+        print(f"  {package:28s} {statistics.median(samples):8.1f}")
+
+    print("\nstartup steps (median ms):")
+    for step in startups[0]:
+        print(f"  {step:24s} {statistics.median(s[step] for s in startups):8.1f}")
+
+    loaded = sorted({m for run in imports for m in run["deferred_loaded"]})
+    print(f"\ndeferred libraries imported by `import main`: {', '.join(loaded) or 'none'}")
+    if args.max_import_ms is not None and median_ms > args.max_import_ms:
+        print(f"import main took {median_ms:.0f} ms, over --max-import-ms {args.max_import_ms:g}")
+        sys.exit(1)
+    if loaded:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""Deterministic synthetic data for load tests: users, items and image fixtures.
+
+`seed(engine, users, items)` fills a migrated database the way the API
+would have. Items come with counters, search and geo index entries,
+stored-file reference counts and finished analyses, so every endpoint has
+realistic data to read. It returns a JSON-able context the load driver uses
+to build requests: credentials, id ranges, image keys, search words and
+cities.
+
+Distributions (fixed seed, so runs are reproducible):
+- sellers: a few heavy sellers own most items (Pareto-distributed owner ids)
+- category: 70% consumer, 30% utility
+- working: 55%. Working items are tagged reuse with a price, the rest
+  recycle with no price, as /ewaste/add does
+- price (INR): log-normal around 1500, clipped to 50..150000, rounded to 10
+- images: 40% of items reference one of --images JPEG fixtures, written to
+  the configured storage (real JPEGs with WebP variants when Pillow is
+  installed, random bytes otherwise)
+- analysis: non-working items with an image already have a "done" analysis
+  with 1-4 components
+- location: 85% of items have one, around a city picked by population
+  weight (normal scatter, sigma about 8 km)
+- phone: 70% of users
+
+    UPLOAD_DIR=/tmp/synthetic-uploads python -m benchmarks.synthetic --users 1000 --items 100000 \
+        --database-url sqlite:////tmp/synthetic.db
+"""
+
+import argparse
+import io
+import math
+import random
+import time
+from collections import Counter
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from models.ewaste_model import EwasteItem
+from models.stored_file_model import StoredFile
+from models.user_model import User
+from repositories.analytics_repository import rebuild_counters
+from repositories.geo_repository import KM_PER_DEGREE, index_locations
+from repositories.search_repository import index_items
+from utils.auth_utils import hash_password
+from utils.image_derivatives import build_derivatives
+from utils.storage import get_storage, url_for
+
+PASSWORD = "synthetic-password"
+BATCH_SIZE = 5000
+
+BRANDS = ["Dell", "HP", "Lenovo", "Samsung", "LG", "Sony", "Apple", "Asus", "Acer", "Philips", "Xiaomi", "Bosch"]
+KINDS = {
+    "consumer": ["Laptop", "Phone", "Tablet", "Charger", "Headphones", "Camera", "Speaker", "Keyboard", "Monitor",
+                 "Console", "Router", "Smartwatch"],
+    "utility": ["Fridge", "Microwave", "Washing Machine", "Air Conditioner", "Water Heater", "Inverter", "Television",
+                "Printer", "Vacuum Cleaner", "Mixer"],
+}
+COMPONENTS = ["copper", "plastic", "aluminium", "gold", "lithium", "glass", "steel", "circuit board", "cobalt", "silver"]
+# (name, latitude, longitude, weight)
+CITIES = [
+    ("Delhi", 28.6139, 77.2090, 32), ("Mumbai", 19.0760, 72.8777, 21), ("Bengaluru", 12.9716, 77.5946, 13),
+    ("Kolkata", 22.5726, 88.3639, 15), ("Chennai", 13.0827, 80.2707, 11), ("Hyderabad", 17.3850, 78.4867, 10),
+    ("Pune", 18.5204, 73.8567, 7), ("Ahmedabad", 23.0225, 72.5714, 8), ("Jaipur", 26.9124, 75.7873, 4),
+    ("Lucknow", 26.8467, 80.9462, 4),
+]
+SEARCH_WORDS = ["laptop", "phone", "sam", "dell lap", "fridge", "copper", "lithium", "tele", "printer", "zzz"]
+
+
+def jpeg_bytes(rng: random.Random, index: int = 0) -> bytes:
+    """A random 800x600 JPEG (random bytes without Pillow)."""
+    try:
+        from PIL import Image, ImageDraw
+    except ImportError:
+        return rng.randbytes(40_000) + index.to_bytes(4, "big")
+    image = Image.new("RGB", (800, 600), tuple(rng.randrange(256) for _ in range(3)))
+    draw = ImageDraw.Draw(image)
+    for _ in range(40):
+        box = sorted(rng.randrange(800) for _ in range(2)), sorted(rng.randrange(600) for _ in range(2))
+        draw.rectangle((box[0][0], box[1][0], box[0][1], box[1][1]), fill=tuple(rng.randrange(256) for _ in range(3)))
+    out = io.BytesIO()
+    image.save(out, "JPEG", quality=85)
+    return out.getvalue()
+
+
+def make_images(count: int, rng: random.Random) -> list[dict]:
+    """Store `count` distinct JPEG fixtures (plus variants when possible); returns their paths and sizes."""
+    storage = get_storage()
+    images = []
+    for i in range(count):
+        stored = storage.save_stream(io.BytesIO(jpeg_bytes(rng, i)), ".jpg", 50 * 1024 * 1024)
+        image_path = url_for(stored.key)
+        variants = build_derivatives(image_path)
+        images.append({"key": stored.key, "size": stored.size, "image_path": image_path,
+                       "thumbnail_path": variants.get("thumbnail_path"), "display_path": variants.get("display_path")})
+    return images
+
+
+def _price(rng: random.Random) -> int:
+    return int(min(max(rng.lognormvariate(math.log(1500), 1.1), 50), 150_000) // 10 * 10)
+
+
+def _location(rng: random.Random) -> tuple[float | None, float | None]:
+    if rng.random() >= 0.85:
+        return None, None
+    _, lat, lon, _ = rng.choices(CITIES, weights=[c[3] for c in CITIES])[0]
+    spread = 8 / KM_PER_DEGREE
+    return round(rng.gauss(lat, spread), 6), round(rng.gauss(lon, spread), 6)
+
+
+def _analysis(rng: random.Random) -> dict:
+    return {"source": "gemini", "recyclable_components": [
+        {"name": name, "confidence": round(rng.uniform(0.4, 0.95), 2)}
+        for name in rng.sample(COMPONENTS, rng.randint(1, 4))
+    ], "raw": None}
+
+
+def seed(engine, users: int, items: int, images: int = 24, rng_seed: int = 1,
+         bcrypt_rounds: int = 4, log=print) -> dict:
+    rng = random.Random(rng_seed)
+    started = time.perf_counter()
+    fixtures = make_images(images, rng) if images else []
+    # One hash for everyone: bcrypt per user would dominate seeding
+    password_hash = hash_password(PASSWORD, rounds=bcrypt_rounds)
+    references = Counter()
+
+    with Session(engine) as db:
+        for start in range(0, users, BATCH_SIZE):
+            db.execute(insert(User), [
+                {"name": f"User {i}", "email": f"user{i}@example.com", "password": password_hash,
+                 "phone": f"98{i:08d}" if rng.random() < 0.7 else None, "address": None, "role": "user"}
+                for i in range(start, min(users, start + BATCH_SIZE))
+            ])
+        db.commit()
+
+        first_id = last_id = None
+        for start in range(0, items, BATCH_SIZE):
+            rows = []
+            for i in range(start, min(items, start + BATCH_SIZE)):
+                category = "consumer" if rng.random() < 0.7 else "utility"
+                working = rng.random() < 0.55
+                image = fixtures[rng.randrange(len(fixtures))] if fixtures and rng.random() < 0.4 else None
+                analysed = image is not None and not working
+                latitude, longitude = _location(rng)
+                rows.append({
+                    "user_id": min(int(rng.paretovariate(1.2)), users),
+                    "category": category,
+                    "product_name": f"{rng.choice(BRANDS)} {rng.choice(KINDS[category])}",
+                    "is_working": working,
+                    "tag": "reuse" if working else "recycle",
+                    "price": _price(rng) if working else None,
+                    "image_path": image and image["image_path"],
+                    "thumbnail_path": image and image["thumbnail_path"],
+                    "display_path": image and image["display_path"],
+                    "gemini_analysis": _analysis(rng) if analysed else None,
+                    "analysis_status": "done" if analysed else None,
+                    "latitude": latitude,
+                    "longitude": longitude,
+                })
+                if image:
+                    references[image["key"]] += 1
+            ids = sorted(db.execute(
+                insert(EwasteItem).returning(EwasteItem.id), rows, execution_options={"render_nulls": True}
+            ).scalars())
+            index_items(db, [{"id": item_id, **row} for item_id, row in zip(ids, rows)])
+            index_locations(db, [{"id": item_id, **row} for item_id, row in zip(ids, rows)])
+            db.commit()
+            first_id = ids[0] if first_id is None else first_id
+            last_id = ids[-1]
+            if log and (start // BATCH_SIZE) % 20 == 19:
+                log(f"  {start + len(rows)} items")
+
+        if references:
+            db.execute(insert(StoredFile), [
+                {"key": image["key"], "refcount": references[image["key"]], "size": image["size"]}
+                for image in fixtures if references[image["key"]]
+            ])
+            db.commit()
+        rebuild_counters(db)
+
+    if log:
+        log(f"seeded {users} users, {items} items, {len(fixtures)} images in {time.perf_counter() - started:.1f}s")
+    return {
+        "users": users,
+        "items": items,
+        "first_item_id": first_id,
+        "last_item_id": last_id,
+        "password": PASSWORD,
+        "image_keys": [image["key"] for image in fixtures],
+        "search_words": SEARCH_WORDS,
+        "cities": [[lat, lon] for _, lat, lon, _ in CITIES],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--items", type=int, default=10_000)
+    parser.add_argument("--images", type=int, default=24)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--database-url", required=True)
+    args = parser.parse_args()
+
+    from database import make_engine
+    from migrations import run_migrations
+
+    engine = make_engine(args.database_url)
+    run_migrations(engine)
+    seed(engine, args.users, args.items, args.images, args.seed)
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
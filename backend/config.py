@@ -0,0 +1,109 @@
+"""Application settings, read once from the environment and .env files.
+
+Every setting is a field of `Settings`; its environment variable is the field
+name in upper case (DATABASE_URL, BCRYPT_ROUNDS, ...). Values come from, in
+increasing priority: the defaults below, backend/.env, ./.env and the process
+environment. `settings` is built on first import and modules copy what they
+need into their own constants, so tests can still monkeypatch those.
+"""
+
+import os
+from functools import lru_cache
+
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class Settings(BaseSettings):
+    model_config = SettingsConfigDict(
+        env_file=(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env"), ".env"),
+        extra="ignore",
+    )
+
+    # Database (database.py)
+    database_url: str = "sqlite:///./ewaste.db"
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout: float = 30
+    db_pool_recycle: int = 1800
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+    sqlite_busy_timeout_ms: int = 5000
+    db_async: str = "auto"  # "auto", "1" (required) or "0" (sync threadpool)
+
+    # Auth (utils.auth_utils, utils.password_hashing, utils.token_cache)
+    secret_key: str = "supersecretkey_change_me"
+    access_token_expire_minutes: int = 60
+    bcrypt_rounds: int = 12
+    password_hash_executor: str = "process"
+    password_hash_workers: int = os.cpu_count() or 1
+    token_cache_entries: int = 10000
+    revocation_refresh_seconds: float = 30
+    user_profile_cache_entries: int = 10000
+    user_profile_ttl_seconds: float = 60
+
+    # Image analysis (utils.gemini_api, utils.analysis_cache, utils.analysis_worker)
+    gemini_api_key: str | None = None
+    gemini_vision_url: str = "https://api.gemini.example/v1/vision/analyze"
+    gemini_model_version: str = "v1"
+    gemini_timeout_seconds: float = 30
+    gemini_max_concurrency: int = 8
+    analysis_cache_memory_entries: int = 1024
+    analysis_cache_max_rows: int = 50000
+    analysis_cache_ttl_seconds: int = 30 * 24 * 3600
+    analysis_workers: int = 2
+    analysis_max_attempts: int = 5
+    analysis_retry_base_seconds: float = 2
+    analysis_retry_max_seconds: float = 300
+    analysis_lease_seconds: float = 120
+    analysis_poll_seconds: float = 1.0
+
+    # Uploads and storage (utils.storage, utils.image_handler, utils.image_derivatives, routers.uploads)
+    storage_backend: str = "local"
+    upload_dir: str | None = None  # default: utils.storage.DEFAULT_UPLOAD_DIR
+    s3_bucket: str | None = None
+    s3_prefix: str = "uploads"
+    s3_endpoint_url: str | None = None
+    max_upload_bytes: int = 20 * 1024 * 1024
+    thumbnail_size: int = 400
+    display_size: int = 1280
+    webp_quality: int = 80
+    upload_cache_max_age: int = 365 * 24 * 3600
+    uploads_pathsend: bool = False
+
+    # Endpoints (routers.ewaste, utils.response_cache, utils.events)
+    bulk_max_items: int = 1000
+    nearby_max_radius_km: float = 500
+    response_cache_backend: str = "local"
+    response_cache_redis_url: str = "redis://localhost:6379/0"
+    response_cache_entries: int = 256
+    response_cache_ttl_seconds: float = 300
+    response_cache_version_seconds: float = 1
+    events_buffer_size: int = 1000
+    events_buffer_bytes: int = 8 * 1024 * 1024
+    events_subscriber_queue: int = 1000
+    events_heartbeat_seconds: float = 15
+    events_stream_seconds: float = 300
+    events_resume_seconds: float = 60
+
+    # Admission control for uploads (utils.rate_limit)
+    rate_limit_backend: str = "local"
+    rate_limit_redis_url: str = "redis://localhost:6379/0"
+    rate_limit_entries: int = 100000
+    upload_rate_per_minute: float = 60  # per user or IP; 0 disables
+    upload_burst: int = 20
+    upload_max_concurrency: int = 2 * (os.cpu_count() or 1)  # per process; 0 disables
+    upload_queue_seconds: float = 0.5
+    analysis_max_backlog: int = 5000  # queued + running analysis jobs; 0 disables
+
+    # Monitoring (utils.metrics)
+    slow_request_ms: float = 0
+    slow_request_max_statements: int = 50
+
+
+@lru_cache
+def get_settings() -> Settings:
+    return Settings()
+
+
+settings = get_settings()
@@ -1,22 +1,178 @@
-from sqlalchemy import create_engine
+import importlib.util
+
+from sqlalchemy import JSON, create_engine, event
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-import os
-from dotenv import load_dotenv
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from starlette.concurrency import run_in_threadpool
+
+from config import settings
+
+
+DATABASE_URL = settings.database_url
+
+# Connection pool (file SQLite and server databases alike)
+DB_POOL_SIZE = settings.db_pool_size
+DB_MAX_OVERFLOW = settings.db_max_overflow
+DB_POOL_TIMEOUT = settings.db_pool_timeout
+# Reconnect before server/proxy idle timeouts silently drop the connection
+DB_POOL_RECYCLE = settings.db_pool_recycle
+
+# Per-connection SQLite settings. WAL lets readers run alongside a writer;
+# synchronous=NORMAL is durable across app crashes and only risks the last
+# transactions on power loss in WAL mode.
+SQLITE_JOURNAL_MODE = settings.sqlite_journal_mode
+SQLITE_SYNCHRONOUS = settings.sqlite_synchronous
+SQLITE_MMAP_SIZE = settings.sqlite_mmap_size
+SQLITE_BUSY_TIMEOUT_MS = settings.sqlite_busy_timeout_ms
+
+# Async engine for the routers: "auto" uses it when the dialect's async driver
+# is installed, "1" requires it, "0" keeps every request on the sync engine
+DB_ASYNC = settings.db_async
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+
+
+def _sqlite_pragmas(dbapi_conn, connection_record):
+    cursor = dbapi_conn.cursor()
+    try:
+        cursor.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA journal_mode = {SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous = {SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}")
+    finally:
+        cursor.close()
+
+
+def _engine_options(url) -> dict:
+    if url.get_backend_name() == "sqlite":
+        if not url.database or url.database == ":memory:":
+            # In-memory databases keep SQLAlchemy's single-connection pool
+            return {}
+        return {"pool_size": DB_POOL_SIZE, "max_overflow": DB_MAX_OVERFLOW, "pool_timeout": DB_POOL_TIMEOUT}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+
+
+def make_engine(url: str = DATABASE_URL, **kwargs) -> Engine:
+    """Engine for the given URL with settings suited to its dialect. kwargs override them."""
+    url = make_url(url)
+    options = _engine_options(url)
+    if url.get_backend_name() == "sqlite":
+        options["connect_args"] = {"check_same_thread": False}
+    options.update(kwargs)
+    engine = create_engine(url, **options)
+    if url.get_backend_name() == "sqlite":
+        event.listen(engine, "connect", _sqlite_pragmas)
+    return engine
+
 
+def make_async_engine(url: str = DATABASE_URL, **kwargs) -> AsyncEngine | None:
+    """Async counterpart of make_engine (aiosqlite / asyncpg).
 
-load_dotenv()
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./ewaste.db")
+    None when DB_ASYNC=0, or with DB_ASYNC=auto when the dialect has no async
+    driver installed; callers then stay on the sync engine.
+    """
+    if DB_ASYNC == "0":
+        return None
+    url = make_url(url)
+    backend = url.get_backend_name()
+    driver = ASYNC_DRIVERS.get(backend)
+    if driver is None or importlib.util.find_spec(driver) is None:
+        if DB_ASYNC == "1":
+            raise RuntimeError(f"DB_ASYNC=1 but no async driver is installed for {backend} (need {driver})")
+        return None
+    options = _engine_options(url)
+    if backend == "sqlite" and options:
+        # aiosqlite defaults to opening a connection (and a thread) per checkout
+        options["poolclass"] = AsyncAdaptedQueuePool
+    options.update(kwargs)
+    engine = create_async_engine(url.set(drivername=f"{backend}+{driver}"), **options)
+    if backend == "sqlite":
+        event.listen(engine.sync_engine, "connect", _sqlite_pragmas)
+    return engine
 
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+class AsyncDB:
+    """Database handle for async endpoints.
+
+    `await db.run(fn, *args)` calls fn(session, *args) with a sync Session, so
+    the repository functions serve both paths unchanged:
+    - async engine: fn runs via AsyncSession.run_sync and its I/O is awaited
+      on the event loop, so no thread is held per request
+    - sync fallback: fn runs in the threadpool, as the old sync endpoints did
+    sync_session_factory is for work that outlives the request (background tasks).
+    """
+
+    def __init__(self, session, sync_session_factory):
+        self.session = session
+        self.is_async = isinstance(session, AsyncSession)
+        self.sync_session_factory = sync_session_factory
+
+    async def run(self, fn, *args):
+        if self.is_async:
+            return await self.session.run_sync(fn, *args)
+        return await run_in_threadpool(fn, self.session, *args)
+
+    async def commit(self):
+        if self.is_async:
+            await self.session.commit()
+        else:
+            await run_in_threadpool(self.session.commit)
+
+    async def rollback(self):
+        if self.is_async:
+            await self.session.rollback()
+        else:
+            await run_in_threadpool(self.session.rollback)
+
+    async def close(self):
+        if self.is_async:
+            await self.session.close()
+        else:
+            self.session.close()
+
+
+def async_db_dependency(async_session_factory, sync_session_factory):
+    """A get_async_db-style dependency over the given session factories."""
+
+    async def get_async_db():
+        if async_session_factory is not None:
+            db = AsyncDB(async_session_factory(), sync_session_factory)
+        else:
+            db = AsyncDB(sync_session_factory(), sync_session_factory)
+        try:
+            yield db
+        finally:
+            await db.close()
+
+    return get_async_db
+
+
+engine = make_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+async_engine = make_async_engine(DATABASE_URL)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False) if async_engine is not None else None
 Base = declarative_base()
 
+# JSON documents: JSONB on PostgreSQL (indexable, binary), JSON text elsewhere
+PortableJSON = JSON().with_variant(JSONB(), "postgresql")
+
 
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+# Async endpoints: AsyncSession when available, else the sync session in the threadpool
+get_async_db = async_db_dependency(AsyncSessionLocal, SessionLocal)
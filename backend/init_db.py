@@ -1,12 +1,10 @@
 from database import engine
-from models.ewaste_model import Base as EwasteBase
-from models.user_model import Base as UserBase
+from migrations import run_migrations
 
 def init_db():
-    # Create all tables
-    UserBase.metadata.create_all(bind=engine)
-    EwasteBase.metadata.create_all(bind=engine)
+    # Create all tables and apply any pending schema migrations
+    return run_migrations(engine)
 
 if __name__ == "__main__":
-    init_db()
-    print("Database initialized successfully!")
\ No newline at end of file
+    applied = init_db()
+    print(f"Database initialized successfully! Applied migrations: {applied or 'none'}")
@@ -1,54 +1,102 @@
+"""API entry point.
+
+`create_app()` builds the application; serve it with
+`uvicorn main:create_app --factory`. `main.app` still works (for
+`uvicorn main:app` and `from main import app`), but is built on first
+access, so importing this module builds nothing. Building it only imports
+code: schema migrations and the analysis workers start in the lifespan, and
+the Gemini client, the bcrypt pool and the JWT and bcrypt libraries are
+loaded on first use. Settings come from config.settings.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
-from database import engine, Base
-import models.user_model
-import models.ewaste_model
-from routers import auth, ewaste
 from fastapi.middleware.cors import CORSMiddleware
-import os
-from fastapi.staticfiles import StaticFiles
-
-# Create DB tables
-Base.metadata.create_all(bind=engine)
-
-app = FastAPI(title="E-Waste Collection API")
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=[
-        "http://localhost:5173",  # Local development
-        "https://pyewaste.netlify.app",  # Production Netlify domain - update this
-        "https://your-netlify-subdomain.netlify.app"  # Temporary Netlify domain
-    ],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-
-# Register routers
-app.include_router(auth.router)
-app.include_router(ewaste.router)
-
-# Serve uploads statically
-uploads_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "uploads")
-if not os.path.exists(uploads_path):
-    os.makedirs(uploads_path, exist_ok=True)
-
-app.mount("/uploads", StaticFiles(directory=uploads_path), name="uploads")
-
-# Test route for image serving
-@app.get("/test-image")
-def test_image():
-    return """
-    <html>
-        <body>
-            <h1>Image Test</h1>
-            <img src="/uploads/test.jpg" alt="Test image" onerror="this.style.border='2px solid red'">
-            <p>If you see a red border, the image failed to load.</p>
-        </body>
-    </html>
-    """
-
-# Root route
-@app.get("/")
-def root():
-    return {"message": "E-Waste Collection API is running!"}
+from fastapi.responses import PlainTextResponse
+
+from database import async_engine, engine
+from migrations import run_migrations
+from utils.analysis_worker import worker_pool
+from utils import gemini_api, password_hashing
+from utils.metrics import REGISTRY, MetricsMiddleware
+from utils.rate_limit import AdmissionMiddleware
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Create / upgrade DB tables, then start the workers for queued image analysis
+    await asyncio.to_thread(run_migrations, engine)
+    await worker_pool.start()
+    try:
+        yield
+    finally:
+        password_hashing.shutdown()
+        await worker_pool.stop()
+        await gemini_api.close_client()
+        if async_engine is not None:
+            await async_engine.dispose()
+
+
+def create_app() -> FastAPI:
+    from routers import auth, ewaste, uploads
+
+    app = FastAPI(title="E-Waste Collection API", lifespan=lifespan)
+    # Innermost, so its 429s and 503s still get CORS headers and show up in the metrics
+    app.add_middleware(AdmissionMiddleware)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=[
+            "http://localhost:5173",  # Local development
+            "https://pyewaste.netlify.app",  # Production Netlify domain - update this
+            "https://your-netlify-subdomain.netlify.app"  # Temporary Netlify domain
+        ],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["Retry-After"],
+    )
+    # Outermost, so latency covers CORS handling and the whole response body
+    app.add_middleware(MetricsMiddleware)
+
+    # Register routers
+    app.include_router(auth.router)
+    app.include_router(ewaste.router)
+    # Uploaded images, read through the configured storage backend
+    app.include_router(uploads.router)
+
+    # Test route for image serving
+    @app.get("/test-image")
+    def test_image():
+        return """
+        <html>
+            <body>
+                <h1>Image Test</h1>
+                <img src="/uploads/test.jpg" alt="Test image" onerror="this.style.border='2px solid red'">
+                <p>If you see a red border, the image failed to load.</p>
+            </body>
+        </html>
+        """
+
+    # Prometheus scrape endpoint: request latency, SQL per request, Gemini calls, upload bytes
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+    # Root route
+    @app.get("/")
+    def root():
+        return {"message": "E-Waste Collection API is running!"}
+
+    return app
+
+
+
+def __getattr__(name):
+    # Module-level `app`, built (once) when first looked up rather than at import
+    if name == "app":
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
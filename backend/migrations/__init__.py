@@ -0,0 +1,50 @@
+"""Minimal versioned schema migrations.
+
+Each migration in `migrations.versions.MIGRATIONS` is a (version, name, func)
+tuple; `func` receives an open Connection inside a transaction. Applied
+versions are recorded in `schema_migrations`, so `run_migrations` only runs
+what a database is missing. Add new schema changes as a new version at the end
+of the list rather than editing an applied one.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, select
+from sqlalchemy.engine import Engine
+
+from migrations.versions import MIGRATIONS
+
+
+_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    _metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+def applied_versions(engine: Engine) -> set[int]:
+    with engine.connect() as conn:
+        schema_migrations.create(conn, checkfirst=True)
+        conn.commit()
+        return set(conn.scalars(select(schema_migrations.c.version)))
+
+
+def run_migrations(engine: Engine, target: int | None = None) -> list[int]:
+    """Apply pending migrations up to `target` (default: latest). Returns the versions applied."""
+    done = applied_versions(engine)
+    applied = []
+    for version, name, migrate in MIGRATIONS:
+        if version in done or (target is not None and version > target):
+            continue
+        with engine.begin() as conn:
+            migrate(conn)
+            conn.execute(
+                schema_migrations.insert().values(
+                    version=version, name=name, applied_at=datetime.utcnow()
+                )
+            )
+        applied.append(version)
+    return applied
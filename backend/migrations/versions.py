@@ -0,0 +1,97 @@
+from sqlalchemy import inspect
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from models.analysis_cache_model import AnalysisCacheEntry
+from models.analysis_job_model import AnalysisJob
+from models.ewaste_counter_model import EwasteCounter
+from models.ewaste_model import EwasteItem
+from models.item_component_model import ItemComponent
+from models.revoked_token_model import RevokedToken
+from models.stored_file_model import StoredFile
+from models.user_model import User
+from repositories.analytics_repository import ensure_counters
+from repositories.geo_repository import create_geo_index, reindex_locations
+from repositories.search_repository import create_search_index, reindex_items
+
+
+def add_column_if_missing(conn: Connection, table, column):
+    """ALTER TABLE ... ADD COLUMN unless the column already exists.
+
+    Fresh databases get every column from the baseline's CREATE TABLE, so later
+    column migrations have to tolerate the column being there already.
+    """
+    existing = {c["name"] for c in inspect(conn).get_columns(table.name)}
+    if column.name in existing:
+        return
+    column_type = column.type.compile(dialect=conn.dialect)
+    conn.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}')
+
+
+def _baseline(conn: Connection):
+    # Databases created by the old create_all() calls already have these
+    for table in (User.__table__, EwasteItem.__table__, EwasteCounter.__table__):
+        table.create(conn, checkfirst=True)
+
+
+def _backfill_counters(conn: Connection):
+    with Session(bind=conn) as db:
+        ensure_counters(db)
+
+
+def create_ewaste_indexes(conn: Connection):
+    for index in EwasteItem.__table__.indexes:
+        index.create(conn, checkfirst=True)
+
+
+def _analysis_jobs(conn: Connection):
+    add_column_if_missing(conn, EwasteItem.__table__, EwasteItem.__table__.c.analysis_status)
+    AnalysisJob.__table__.create(conn, checkfirst=True)
+
+
+def _analysis_cache(conn: Connection):
+    AnalysisCacheEntry.__table__.create(conn, checkfirst=True)
+
+
+def _image_variants(conn: Connection):
+    for name in ("thumbnail_path", "display_path"):
+        add_column_if_missing(conn, EwasteItem.__table__, EwasteItem.__table__.c[name])
+
+
+def _stored_files(conn: Connection):
+    StoredFile.__table__.create(conn, checkfirst=True)
+
+
+def _revoked_tokens(conn: Connection):
+    RevokedToken.__table__.create(conn, checkfirst=True)
+
+
+def _search_index(conn: Connection):
+    ItemComponent.__table__.create(conn, checkfirst=True)
+    create_search_index(conn)
+    with Session(bind=conn) as db:
+        reindex_items(db)
+        db.flush()
+
+
+def _item_locations(conn: Connection):
+    for name in ("latitude", "longitude"):
+        add_column_if_missing(conn, EwasteItem.__table__, EwasteItem.__table__.c[name])
+    create_geo_index(conn)
+    with Session(bind=conn) as db:
+        reindex_locations(db)
+        db.flush()
+
+
+MIGRATIONS = [
+    (1, "baseline tables", _baseline),
+    (2, "backfill ewaste_counters", _backfill_counters),
+    (3, "ewaste_items filter indexes", create_ewaste_indexes),
+    (4, "analysis_status and analysis_jobs queue", _analysis_jobs),
+    (5, "analysis_cache table", _analysis_cache),
+    (6, "thumbnail/display image variants", _image_variants),
+    (7, "stored_files reference counts", _stored_files),
+    (8, "revoked_tokens", _revoked_tokens),
+    (9, "search index and item components", _search_index),
+    (10, "item locations and geo index", _item_locations),
+]
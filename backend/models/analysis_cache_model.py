@@ -0,0 +1,15 @@
+from sqlalchemy import Column, DateTime, Index, String
+from database import Base, PortableJSON
+
+
+class AnalysisCacheEntry(Base):
+    """Persistent tier of the image analysis cache (see utils.analysis_cache)."""
+    __tablename__ = "analysis_cache"
+    __table_args__ = (
+        Index("ix_analysis_cache_last_used_at", "last_used_at"),
+    )
+    key = Column(String, primary_key=True)  # "<model version>:<sha256 of image bytes>"
+    result = Column(PortableJSON, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    last_used_at = Column(DateTime, nullable=False)
@@ -0,0 +1,21 @@
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, Text
+from database import Base
+
+
+class AnalysisJob(Base):
+    """Queued image analysis for an item, worked off by utils.analysis_worker."""
+    __tablename__ = "analysis_jobs"
+    __table_args__ = (
+        Index("ix_analysis_jobs_status_next_run_at", "status", "next_run_at"),
+    )
+    id = Column(Integer, primary_key=True)
+    item_id = Column(Integer, ForeignKey("ewaste_items.id"), nullable=False, index=True)
+    status = Column(String, nullable=False, default="queued")  # queued | running | done | failed
+    attempts = Column(Integer, nullable=False, default=0)
+    # When a queued job may next run; for a running job, when its lease expires
+    next_run_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
@@ -0,0 +1,12 @@
+from sqlalchemy import Column, Integer, String
+from database import Base
+
+
+class EwasteCounter(Base):
+    """Running totals per (tag, category), kept in step with ewaste_items on every write."""
+    __tablename__ = "ewaste_counters"
+    tag = Column(String, primary_key=True)  # "unknown" when the item has no tag
+    category = Column(String, primary_key=True)
+    item_count = Column(Integer, nullable=False, default=0)
+    working_count = Column(Integer, nullable=False, default=0)
+    price_total = Column(Integer, nullable=False, default=0)
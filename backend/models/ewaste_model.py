@@ -1,16 +1,40 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Text
-from sqlalchemy.dialects.sqlite import JSON
-from database import Base
+from sqlalchemy import Column, Integer, String, Boolean, Float, ForeignKey, Text, Index, text
+from sqlalchemy.orm import relationship
+from database import Base, PortableJSON
 
 
 class EwasteItem(Base):
     __tablename__ = "ewaste_items"
+    __table_args__ = (
+        # /ewaste/filter (tag and/or category), paged by id
+        Index("ix_ewaste_items_tag_category_id", "tag", "category", "id"),
+        Index("ix_ewaste_items_category_id", "category", "id"),
+        # /ewaste/user/{user_id}, paged by id
+        Index("ix_ewaste_items_user_id_id", "user_id", "id"),
+        # /ewaste/reusable: partial index where the dialect supports it
+        Index(
+            "ix_ewaste_items_reuse",
+            "id",
+            sqlite_where=text("tag = 'reuse'"),
+            postgresql_where=text("tag = 'reuse'"),
+        ),
+    )
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     category = Column(String, nullable=False) # consumer | utility
     product_name = Column(String, nullable=True)
     is_working = Column(Boolean, default=True)
     image_path = Column(String, nullable=True)
+    thumbnail_path = Column(String, nullable=True)  # WebP variants, see utils.image_derivatives
+    display_path = Column(String, nullable=True)
     tag = Column(String, nullable=True) # reuse | resell | recycle | unknown
-    gemini_analysis = Column(JSON, nullable=True)
-    price = Column(Integer, nullable=True)  # Price in INR for items marked for reuse
\ No newline at end of file
+    gemini_analysis = Column(PortableJSON, nullable=True)
+    price = Column(Integer, nullable=True)  # Price in INR for items marked for reuse
+    analysis_status = Column(String, nullable=True)  # None (not needed) | pending | done | failed
+    # Pickup location in WGS84 degrees; indexed for /ewaste/nearby, see repositories.geo_repository
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+
+    # lazy="raise" so a per-row owner lookup fails loudly instead of issuing N+1 queries;
+    # join through repositories.ewaste_repository instead
+    owner = relationship("User", lazy="raise")
@@ -0,0 +1,12 @@
+from sqlalchemy import Column, ForeignKey, Index, Integer, String
+from database import Base
+
+
+class ItemComponent(Base):
+    """A recyclable component named in an item's analysis, for /ewaste/search facets and filters."""
+    __tablename__ = "ewaste_item_components"
+    __table_args__ = (
+        Index("ix_ewaste_item_components_component_item_id", "component", "item_id"),
+    )
+    item_id = Column(Integer, ForeignKey("ewaste_items.id"), primary_key=True)
+    component = Column(String, primary_key=True)  # lower-cased name, e.g. "copper"
@@ -0,0 +1,9 @@
+from sqlalchemy import Column, DateTime, String
+from database import Base
+
+
+class RevokedToken(Base):
+    """An access token (by its jti claim) that must be refused until it would have expired."""
+    __tablename__ = "revoked_tokens"
+    jti = Column(String, primary_key=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
@@ -0,0 +1,13 @@
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, String
+from database import Base
+
+
+class StoredFile(Base):
+    """Reference count for a content-addressed upload (see utils.storage)."""
+    __tablename__ = "stored_files"
+    key = Column(String, primary_key=True)
+    refcount = Column(Integer, nullable=False, default=0)
+    size = Column(Integer, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
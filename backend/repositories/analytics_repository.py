@@ -0,0 +1,135 @@
+"""Aggregates for /ewaste/analytics.
+
+Counts live in the `ewaste_counters` summary table, one row per (tag, category).
+`add_ewaste` and `delete_item` adjust the matching row in the same transaction
+as the item write, so reading analytics costs O(groups) instead of O(rows).
+`rebuild_counters` recomputes the table with a single GROUP BY for databases
+that predate it or have drifted.
+"""
+
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from models.ewaste_counter_model import EwasteCounter
+from models.ewaste_model import EwasteItem
+
+
+TAGS = ["reuse", "resell", "recycle", "unknown"]
+CATEGORIES = ["consumer", "utility", "unknown"]
+
+
+def _deltas(item: EwasteItem, sign: int) -> dict:
+    return {
+        "item_count": sign,
+        "working_count": sign if item.is_working else 0,
+        "price_total": sign * (item.price or 0),
+    }
+
+
+def _apply(db: Session, item: EwasteItem, sign: int):
+    key = {"tag": item.tag or "unknown", "category": item.category or "unknown"}
+    _apply_deltas(db, key, _deltas(item, sign))
+
+
+def _apply_deltas(db: Session, key: dict, deltas: dict):
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        dialect_insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+        stmt = dialect_insert(EwasteCounter).values(**key, **deltas)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["tag", "category"],
+            set_={col: getattr(EwasteCounter, col) + stmt.excluded[col] for col in deltas},
+        )
+        db.execute(stmt)
+        return
+    updated = db.execute(
+        update(EwasteCounter)
+        .where(EwasteCounter.tag == key["tag"], EwasteCounter.category == key["category"])
+        .values({col: getattr(EwasteCounter, col) + delta for col, delta in deltas.items()})
+    )
+    if updated.rowcount == 0:
+        db.execute(insert(EwasteCounter).values(**key, **deltas))
+
+
+def record_item_added(db: Session, item: EwasteItem):
+    """Count a new item. Call before the commit that persists it."""
+    _apply(db, item, 1)
+
+
+def record_items_added(db: Session, items: list[dict]):
+    """Count a batch of new items (dicts of column values): one upsert per (tag, category)."""
+    groups: dict[tuple, dict] = {}
+    for item in items:
+        key = (item.get("tag") or "unknown", item.get("category") or "unknown")
+        deltas = groups.setdefault(key, {"item_count": 0, "working_count": 0, "price_total": 0})
+        deltas["item_count"] += 1
+        deltas["working_count"] += 1 if item.get("is_working") else 0
+        deltas["price_total"] += item.get("price") or 0
+    for (tag, category), deltas in groups.items():
+        _apply_deltas(db, {"tag": tag, "category": category}, deltas)
+
+
+def record_item_removed(db: Session, item: EwasteItem):
+    """Uncount a deleted item. Call before the commit that removes it."""
+    _apply(db, item, -1)
+
+
+def rebuild_counters(db: Session):
+    """Recompute every counter row from ewaste_items with one GROUP BY."""
+    tag = func.coalesce(EwasteItem.tag, "unknown")
+    category = func.coalesce(EwasteItem.category, "unknown")
+    grouped = select(
+        tag,
+        category,
+        func.count(EwasteItem.id),
+        func.sum(case((EwasteItem.is_working, 1), else_=0)),
+        func.coalesce(func.sum(EwasteItem.price), 0),
+    ).group_by(tag, category)
+    db.execute(delete(EwasteCounter))
+    db.execute(
+        insert(EwasteCounter).from_select(
+            ["tag", "category", "item_count", "working_count", "price_total"], grouped
+        )
+    )
+    db.commit()
+
+
+def ensure_counters(db: Session):
+    """Rebuild the counters if they disagree with the item table (e.g. first run after upgrade)."""
+    counted = db.scalar(select(func.coalesce(func.sum(EwasteCounter.item_count), 0)))
+    actual = db.scalar(select(func.count(EwasteItem.id)))
+    if counted != actual:
+        rebuild_counters(db)
+
+
+def analytics_summary(db: Session) -> dict:
+    """Totals by tag and by category plus per-category working/price breakdowns."""
+    rows = db.execute(select(EwasteCounter).where(EwasteCounter.item_count != 0)).scalars().all()
+
+    tag_counts = {t: 0 for t in TAGS}
+    category_counts = {c: 0 for c in CATEGORIES}
+    price_by_tag = {t: 0 for t in TAGS}
+    by_category_detail = {
+        c: {"working": 0, "not_working": 0, "price_total": 0} for c in CATEGORIES
+    }
+    total = 0
+    for row in rows:
+        total += row.item_count
+        tag_counts[row.tag] = tag_counts.get(row.tag, 0) + row.item_count
+        category_counts[row.category] = category_counts.get(row.category, 0) + row.item_count
+        price_by_tag[row.tag] = price_by_tag.get(row.tag, 0) + row.price_total
+        detail = by_category_detail.setdefault(
+            row.category, {"working": 0, "not_working": 0, "price_total": 0}
+        )
+        detail["working"] += row.working_count
+        detail["not_working"] += row.item_count - row.working_count
+        detail["price_total"] += row.price_total
+
+    return {
+        "total": total,
+        "by_tag": tag_counts,
+        "by_category": category_counts,
+        "price_by_tag": price_by_tag,
+        "by_category_detail": by_category_detail,
+    }
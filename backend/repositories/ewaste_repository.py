@@ -0,0 +1,166 @@
+"""Shared read queries for e-waste items.
+
+Every list endpoint used to load ORM objects and then look up the owner one row
+at a time. The helpers here select only the columns a response needs and join
+`users` in the same statement, so a request costs a constant number of queries
+no matter how many rows it returns.
+
+The `*_query` functions build statements; `fetch_page` runs one with keyset
+pagination on the primary key and `iter_rows` / `iter_rows_async` stream one
+from a server-side cursor for exports.
+"""
+
+from sqlalchemy import Select, func, select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import Session
+
+from models.ewaste_model import EwasteItem
+from models.user_model import User
+from utils.serialization import rows_as_dicts
+
+
+ITEM_COLUMNS = (
+    EwasteItem.id,
+    EwasteItem.user_id,
+    EwasteItem.category,
+    EwasteItem.product_name,
+    EwasteItem.is_working,
+    EwasteItem.image_path,
+    EwasteItem.thumbnail_path,
+    EwasteItem.display_path,
+    EwasteItem.tag,
+    EwasteItem.gemini_analysis,
+    EwasteItem.analysis_status,
+    EwasteItem.latitude,
+    EwasteItem.longitude,
+)
+
+STREAM_BATCH_SIZE = 500
+
+
+def items_with_owner_query() -> Select:
+    """All items with the owner's name and phone; items without an owner are skipped."""
+    return select(
+        *ITEM_COLUMNS,
+        EwasteItem.price,
+        User.name.label("user_name"),
+        User.phone.label("user_phone"),
+    ).join(EwasteItem.owner)
+
+
+def reusable_items_query() -> Select:
+    """Items tagged for reuse with price and owner contact details."""
+    return (
+        select(
+            *ITEM_COLUMNS,
+            EwasteItem.price,
+            User.name.label("user_name"),
+            User.phone.label("user_phone"),
+        )
+        .join(EwasteItem.owner)
+        .where(EwasteItem.tag == "reuse")
+    )
+
+
+def user_items_query(user_id: int) -> Select:
+    return select(*ITEM_COLUMNS, EwasteItem.price).where(EwasteItem.user_id == user_id)
+
+
+def filtered_items_query(tag: str | None = None, category: str | None = None) -> Select:
+    stmt = select(*ITEM_COLUMNS, EwasteItem.price)
+    if tag:
+        stmt = stmt.where(EwasteItem.tag == tag)
+    if category:
+        stmt = stmt.where(EwasteItem.category == category)
+    return stmt
+
+
+def analytics_items_query() -> Select:
+    """Items for the analytics view; missing owners come back as None."""
+    return select(
+        EwasteItem.id,
+        EwasteItem.user_id,
+        func.coalesce(EwasteItem.category, "unknown").label("category"),
+        func.coalesce(EwasteItem.product_name, "").label("product_name"),
+        EwasteItem.is_working,
+        EwasteItem.image_path,
+        func.coalesce(EwasteItem.tag, "unknown").label("tag"),
+        EwasteItem.gemini_analysis,
+        EwasteItem.price,
+        User.name.label("user_name"),
+    ).outerjoin(EwasteItem.owner)
+
+
+def changed_items(db: Session, item_ids: list[int]) -> list[dict]:
+    """Rows for the change feed: the /reusable shape for any tag; missing owners come back as None."""
+    if not item_ids:
+        return []
+    return rows_as_dicts(db.execute(
+        select(
+            *ITEM_COLUMNS,
+            EwasteItem.price,
+            User.name.label("user_name"),
+            User.phone.label("user_phone"),
+        )
+        .outerjoin(EwasteItem.owner)
+        .where(EwasteItem.id.in_(item_ids))
+        .order_by(EwasteItem.id)
+    ))
+
+
+def analysis_state(db: Session, item_id: int) -> dict | None:
+    row = db.execute(
+        select(
+            EwasteItem.id.label("item_id"),
+            EwasteItem.analysis_status,
+            EwasteItem.gemini_analysis,
+        ).where(EwasteItem.id == item_id)
+    ).mappings().first()
+    return dict(row) if row else None
+
+
+def _keyset(stmt: Select, after_id: int | None) -> Select:
+    stmt = stmt.order_by(EwasteItem.id)
+    if after_id is not None:
+        stmt = stmt.where(EwasteItem.id > after_id)
+    return stmt
+
+
+def fetch_page(db: Session, stmt: Select, limit: int | None = None, after_id: int | None = None) -> list[dict]:
+    """Rows with id > after_id in id order, at most `limit` of them (all when None)."""
+    stmt = _keyset(stmt, after_id)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return rows_as_dicts(db.execute(stmt))
+
+
+def _stream_query(stmt: Select, after_id: int | None) -> Select:
+    return _keyset(stmt, after_id).execution_options(stream_results=True, yield_per=STREAM_BATCH_SIZE)
+
+
+def iter_rows(db: Session, stmt: Select, after_id: int | None = None):
+    """Stream rows as dicts from a server-side cursor.
+
+    The generator runs after the endpoint has returned, so it uses its own
+    session on the request session's engine rather than the request session.
+    """
+    bind = db.get_bind()
+    stmt = _stream_query(stmt, after_id)
+
+    def generate():
+        with Session(bind=bind) as stream_db:
+            result = stream_db.execute(stmt)
+            keys = list(result.keys())
+            for row in result:
+                yield dict(zip(keys, row))
+
+    return generate()
+
+
+async def iter_rows_async(bind: AsyncEngine, stmt: Select, after_id: int | None = None):
+    """iter_rows for the async engine: an async generator with its own AsyncSession."""
+    async with AsyncSession(bind) as stream_db:
+        result = await stream_db.stream(_stream_query(stmt, after_id))
+        keys = list(result.keys())
+        async for row in result:
+            yield dict(zip(keys, row))
@@ -0,0 +1,173 @@
+"""Nearest-item queries for /ewaste/nearby.
+
+Items can carry a pickup location (latitude and longitude in WGS84 degrees,
+supplied by the client or geocoded offline). Lookups go through a spatial
+index whose shape depends on the dialect:
+
+- SQLite: `ewaste_geo`, an R*Tree virtual table of points keyed by item id
+- other dialects: a B-tree index on ewaste_items (latitude, longitude)
+
+`nearby_items` searches a bounding box that starts small and grows until it
+holds k items within its inscribed circle, or reaches the radius. The cost
+follows the number of items near the point, not the table size. Distances
+are great-circle (haversine) kilometres, computed in Python, so no dialect
+needs math functions.
+
+Like the search index, `ewaste_geo` is written in the same transaction as
+the item by every code path that adds or deletes one.
+"""
+
+import math
+
+from sqlalchemy import Float, Integer, and_, column, delete, insert, or_, select, table
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from models.ewaste_model import EwasteItem
+from repositories.ewaste_repository import ITEM_COLUMNS
+from utils.serialization import rows_as_dicts
+
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+# First search box; each miss grows it 4x (16x the area) up to the requested radius
+START_RADIUS_KM = 2.0
+GROWTH = 4.0
+
+_geo = table(
+    "ewaste_geo",
+    column("id", Integer),
+    column("min_lat", Float),
+    column("max_lat", Float),
+    column("min_lon", Float),
+    column("max_lon", Float),
+)
+
+
+def _dialect(db: Session) -> str:
+    return db.get_bind().dialect.name
+
+
+def create_geo_index(conn: Connection):
+    """Create the dialect's spatial index."""
+    if conn.dialect.name == "sqlite":
+        conn.exec_driver_sql(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS ewaste_geo USING rtree(id, min_lat, max_lat, min_lon, max_lon)"
+        )
+    else:
+        conn.exec_driver_sql(
+            "CREATE INDEX IF NOT EXISTS ix_ewaste_items_latitude_longitude ON ewaste_items (latitude, longitude)"
+        )
+
+
+def unindex_locations(db: Session, item_ids: list[int]):
+    """Drop the items from the spatial index. Call before deleting them, in the same transaction."""
+    if item_ids and _dialect(db) == "sqlite":
+        db.execute(delete(_geo).where(_geo.c.id.in_(item_ids)))
+
+
+def index_locations(db: Session, items: list[dict]):
+    """Index items given as dicts with id, latitude and longitude; those without a location are skipped."""
+    if _dialect(db) != "sqlite":
+        return  # the B-tree index follows the columns
+    points = [item for item in items if item.get("latitude") is not None and item.get("longitude") is not None]
+    if not points:
+        return
+    unindex_locations(db, [item["id"] for item in points])
+    db.execute(insert(_geo), [
+        {"id": p["id"], "min_lat": p["latitude"], "max_lat": p["latitude"],
+         "min_lon": p["longitude"], "max_lon": p["longitude"]}
+        for p in points
+    ])
+
+
+def reindex_locations(db: Session):
+    """Rebuild the spatial index from ewaste_items."""
+    if _dialect(db) != "sqlite":
+        return
+    db.execute(delete(_geo))
+    located = select(EwasteItem.id, EwasteItem.latitude, EwasteItem.latitude,
+                     EwasteItem.longitude, EwasteItem.longitude).where(
+        EwasteItem.latitude.is_not(None), EwasteItem.longitude.is_not(None))
+    db.execute(insert(_geo).from_select(["id", "min_lat", "max_lat", "min_lon", "max_lon"], located))
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(lat: float, lon: float, radius_km: float) -> tuple[float, float, list[tuple[float, float]]]:
+    """(min_lat, max_lat, longitude ranges) holding every point within radius_km of (lat, lon).
+
+    A box across the antimeridian comes back as two longitude ranges, and one
+    that reaches a pole covers every longitude.
+    """
+    dlat = radius_km / KM_PER_DEGREE
+    min_lat, max_lat = lat - dlat, lat + dlat
+    if min_lat <= -90 or max_lat >= 90:
+        return max(min_lat, -90.0), min(max_lat, 90.0), [(-180.0, 180.0)]
+    # Widest longitude offset of the circle, which is at a higher latitude than the centre
+    dlon = math.degrees(math.asin(min(1.0, math.sin(radius_km / EARTH_RADIUS_KM) / math.cos(math.radians(lat)))))
+    west, east = lon - dlon, lon + dlon
+    if west < -180:
+        return min_lat, max_lat, [(west + 360, 180.0), (-180.0, east)]
+    if east > 180:
+        return min_lat, max_lat, [(west, 180.0), (-180.0, east - 360)]
+    return min_lat, max_lat, [(west, east)]
+
+
+def _in_box(db: Session, lat: float, lon: float, radius_km: float, filters: list):
+    """(id, latitude, longitude) of the matching items inside the bounding box of the circle."""
+    min_lat, max_lat, lon_ranges = bounding_box(lat, lon, radius_km)
+    if _dialect(db) == "sqlite":
+        # Overlap tests: the R*Tree stores 32-bit floats, rounded outwards
+        box = select(_geo.c.id).where(
+            _geo.c.max_lat >= min_lat, _geo.c.min_lat <= max_lat,
+            or_(*[and_(_geo.c.max_lon >= west, _geo.c.min_lon <= east) for west, east in lon_ranges]),
+        ).cte("box").prefix_with("MATERIALIZED")
+        # Materialized so the R*Tree drives the join. As a plain join, the planner
+        # prefers the tag index and probes the R*Tree once per tagged item.
+        stmt = (select(EwasteItem.id, EwasteItem.latitude, EwasteItem.longitude)
+                .select_from(box).join(EwasteItem, EwasteItem.id == box.c.id))
+        return db.execute(stmt.where(*filters)).all()
+    box = and_(EwasteItem.latitude.between(min_lat, max_lat),
+               or_(*[EwasteItem.longitude.between(west, east) for west, east in lon_ranges]))
+    return db.execute(select(EwasteItem.id, EwasteItem.latitude, EwasteItem.longitude).where(box, *filters)).all()
+
+
+def nearby_items(
+    db: Session,
+    lat: float,
+    lon: float,
+    radius_km: float,
+    k: int = 20,
+    tag: str | None = None,
+    category: str | None = None,
+) -> list[dict]:
+    """The k items nearest to (lat, lon) within radius_km, nearest first, each with distance_km."""
+    filters = []
+    if tag:
+        filters.append(EwasteItem.tag == tag)
+    if category:
+        filters.append(EwasteItem.category == category)
+    search_km = min(radius_km, START_RADIUS_KM)
+    while True:
+        hits = []
+        for item_id, item_lat, item_lon in _in_box(db, lat, lon, search_km, filters):
+            distance = haversine_km(lat, lon, item_lat, item_lon)
+            if distance <= search_km:
+                hits.append((distance, item_id))
+        # hits holds every item within search_km, so once it has k of them they are the k nearest
+        if len(hits) >= k or search_km >= radius_km:
+            break
+        search_km = min(radius_km, search_km * GROWTH)
+    hits = sorted(hits)[:k]
+    if not hits:
+        return []
+    rows = {row["id"]: row for row in rows_as_dicts(db.execute(
+        select(*ITEM_COLUMNS, EwasteItem.price).where(EwasteItem.id.in_([item_id for _, item_id in hits]))
+    ))}
+    return [{**rows[item_id], "distance_km": round(distance, 3)} for distance, item_id in hits]
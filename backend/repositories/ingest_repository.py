@@ -0,0 +1,48 @@
+"""Batch writes for /ewaste/bulk.
+
+`insert_items` stores a validated batch the way `add_ewaste` stores one item
+(counters, search and geo indexes, upload references and analysis jobs in the same
+transaction), but with multi-row statements. The items go in as one
+executemany INSERT ... RETURNING, counters take one upsert per (tag, category),
+search entries one multi-row insert, each stored image takes one reference
+update, and analysis jobs are a single insert.
+"""
+
+from collections import Counter
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from models.ewaste_model import EwasteItem
+from repositories.analytics_repository import record_items_added
+from repositories.geo_repository import index_locations
+from repositories.search_repository import index_items
+from repositories.upload_repository import register_upload
+from utils.analysis_worker import PENDING, enqueue_analysis_batch
+from utils.storage import StoredObject
+
+
+def insert_items(db: Session, rows: list[dict], uploads: dict[str, StoredObject]) -> list[int]:
+    """Insert rows (dicts of EwasteItem columns); returns their ids in order. Does not commit.
+
+    uploads maps each image_path used by the rows to its stored object.
+    """
+    if not rows:
+        return []
+    for row in rows:
+        if not row["is_working"] and row.get("image_path"):
+            row["analysis_status"] = PENDING
+    # Sent as multi-row VALUES batches. Ids are assigned in VALUES order even though
+    # RETURNING may list them in any order, so sorting restores the row mapping.
+    # (sort_by_parameter_order would make SQLite fall back to one INSERT per row.)
+    # render_nulls keeps rows with different None columns in the same batch
+    result = db.execute(insert(EwasteItem).returning(EwasteItem.id), rows, execution_options={"render_nulls": True})
+    ids = sorted(result.scalars())
+    record_items_added(db, rows)
+    index_items(db, [{"id": item_id, "product_name": row.get("product_name")} for item_id, row in zip(ids, rows)])
+    index_locations(db, [{"id": item_id, **row} for item_id, row in zip(ids, rows)])
+    references = Counter(row["image_path"] for row in rows if row.get("image_path"))
+    for image_path, count in references.items():
+        register_upload(db, uploads[image_path], count)
+    enqueue_analysis_batch(db, [item_id for item_id, row in zip(ids, rows) if row.get("analysis_status") == PENDING])
+    return ids
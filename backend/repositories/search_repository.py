@@ -0,0 +1,232 @@
+"""Full-text and faceted search for /ewaste/search.
+
+The searchable text of an item is its product name plus the component names
+in `gemini_analysis["recyclable_components"]`. It lives in an index table
+called `ewaste_search`, whose shape depends on the dialect:
+
+- SQLite: an FTS5 virtual table keyed by rowid = item id, ranked with bm25
+- PostgreSQL: (item_id, tsvector) with a GIN index, ranked with ts_rank_cd
+
+Other dialects have no text index, and search falls back to LIKE on the
+product name. Component names are also stored one row each in
+`ewaste_item_components`, which backs the component facet and filter.
+
+Both tables are written like the analytics counters. Each code path that
+changes searchable fields (add, bulk, analysis results, delete) updates the
+index in the same transaction as the item.
+"""
+
+import re
+
+from sqlalchemy import Integer, String, and_, column, delete, func, insert, literal, literal_column, select, table, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from models.ewaste_model import EwasteItem
+from models.item_component_model import ItemComponent
+from repositories.ewaste_repository import ITEM_COLUMNS
+from utils.serialization import rows_as_dicts
+
+
+MAX_TERMS = 8
+REINDEX_BATCH_SIZE = 1000
+# bm25 column weights: a hit in the product name counts more than one in the components
+PRODUCT_NAME_WEIGHT = 4.0
+COMPONENTS_WEIGHT = 1.0
+
+_fts = table("ewaste_search", column("rowid", Integer), column("product_name", String), column("components", String))
+_tsv = table("ewaste_search", column("item_id", Integer), column("document"))
+
+
+def _dialect(db: Session) -> str:
+    return db.get_bind().dialect.name
+
+
+def create_search_index(conn: Connection):
+    """Create the dialect's `ewaste_search` table (a no-op where there is none)."""
+    if conn.dialect.name == "sqlite":
+        # prefix= keeps 2- and 3-character prefix queries on the index instead of a term scan
+        conn.exec_driver_sql(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS ewaste_search USING fts5("
+            "product_name, components, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+    elif conn.dialect.name == "postgresql":
+        conn.exec_driver_sql(
+            "CREATE TABLE IF NOT EXISTS ewaste_search ("
+            "item_id INTEGER PRIMARY KEY REFERENCES ewaste_items (id) ON DELETE CASCADE, "
+            "document TSVECTOR NOT NULL)"
+        )
+        conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_ewaste_search_document ON ewaste_search USING GIN (document)")
+
+
+def components_of(analysis) -> list[str]:
+    """Distinct lower-cased component names from an analysis result, in order."""
+    if not isinstance(analysis, dict):
+        return []
+    names = []
+    for component in analysis.get("recyclable_components") or []:
+        name = component.get("name") if isinstance(component, dict) else component
+        if isinstance(name, str) and name.strip() and name.strip().lower() not in names:
+            names.append(name.strip().lower())
+    return names
+
+
+def unindex_items(db: Session, item_ids: list[int]):
+    """Drop the items from the search tables. Call before deleting them, in the same transaction."""
+    if not item_ids:
+        return
+    db.execute(delete(ItemComponent).where(ItemComponent.item_id.in_(item_ids)))
+    dialect = _dialect(db)
+    if dialect == "sqlite":
+        db.execute(delete(_fts).where(_fts.c.rowid.in_(item_ids)))
+    elif dialect == "postgresql":
+        db.execute(delete(_tsv).where(_tsv.c.item_id.in_(item_ids)))
+
+
+def index_items(db: Session, items: list[dict]):
+    """(Re)index items given as dicts with id, product_name and gemini_analysis. Does not commit."""
+    if not items:
+        return
+    unindex_items(db, [item["id"] for item in items])
+    docs = [
+        {"id": item["id"], "product_name": item.get("product_name") or "",
+         "components": components_of(item.get("gemini_analysis"))}
+        for item in items
+    ]
+    component_rows = [{"item_id": d["id"], "component": name} for d in docs for name in d["components"]]
+    if component_rows:
+        db.execute(insert(ItemComponent), component_rows)
+    dialect = _dialect(db)
+    if dialect == "sqlite":
+        db.execute(insert(_fts), [
+            {"rowid": d["id"], "product_name": d["product_name"], "components": " ".join(d["components"])}
+            for d in docs
+        ])
+    elif dialect == "postgresql":
+        # The product name is weighted A and the components B, which ts_rank_cd scores accordingly
+        stmt = text(
+            "INSERT INTO ewaste_search (item_id, document) VALUES (:id, "
+            "setweight(to_tsvector('simple', :product_name), 'A') || setweight(to_tsvector('simple', :components), 'B'))"
+        )
+        db.execute(stmt, [
+            {"id": d["id"], "product_name": d["product_name"], "components": " ".join(d["components"])}
+            for d in docs
+        ])
+
+
+def index_item(db: Session, item: EwasteItem):
+    """index_items for one ORM item, flushing it first if it has no id yet."""
+    if item.id is None:
+        db.flush()
+    index_items(db, [{"id": item.id, "product_name": item.product_name, "gemini_analysis": item.gemini_analysis}])
+
+
+def reindex_items(db: Session, item_ids: list[int] | None = None):
+    """Rebuild index entries from ewaste_items, for the given ids or for every item."""
+    stmt = select(EwasteItem.id, EwasteItem.product_name, EwasteItem.gemini_analysis).order_by(EwasteItem.id)
+    if item_ids is not None:
+        unindex_items(db, item_ids)  # ids that no longer exist just drop out
+        stmt = stmt.where(EwasteItem.id.in_(item_ids))
+    after_id = 0
+    while True:
+        batch = [dict(row) for row in db.execute(
+            stmt.where(EwasteItem.id > after_id).limit(REINDEX_BATCH_SIZE)
+        ).mappings()]
+        if not batch:
+            return
+        index_items(db, batch)
+        after_id = batch[-1]["id"]
+
+
+def search_terms(q: str) -> list[str]:
+    """Lower-cased word tokens of the query. Punctuation is dropped, so nothing reaches the index syntax."""
+    return re.findall(r"\w+", q.lower())[:MAX_TERMS]
+
+
+def _matches(dialect: str, terms: list[str]):
+    """Subquery of (id, score) for items matching every term as a prefix; higher score ranks first."""
+    if dialect == "sqlite":
+        query = " ".join(f'"{term}"*' for term in terms)
+        fts = literal_column("ewaste_search")
+        return select(
+            _fts.c.rowid.label("id"),
+            (-func.bm25(fts, PRODUCT_NAME_WEIGHT, COMPONENTS_WEIGHT)).label("score"),
+        ).where(fts.op("MATCH")(query)).subquery("matches")
+    if dialect == "postgresql":
+        tsquery = func.to_tsquery("simple", " & ".join(f"{term}:*" for term in terms))
+        return select(
+            _tsv.c.item_id.label("id"),
+            func.ts_rank_cd(_tsv.c.document, tsquery).label("score"),
+        ).where(_tsv.c.document.op("@@")(tsquery)).subquery("matches")
+    return select(EwasteItem.id, literal(0.0).label("score")).where(
+        and_(*[EwasteItem.product_name.ilike(f"%{term}%") for term in terms])
+    ).subquery("matches")
+
+
+def search_items(
+    db: Session,
+    q: str,
+    tag: str | None = None,
+    category: str | None = None,
+    component: str | None = None,
+    min_price: int | None = None,
+    max_price: int | None = None,
+    limit: int = 20,
+    offset: int = 0,
+    facet_limit: int = 20,
+) -> dict:
+    """Ranked page of matching items, the total, and facet counts by tag, category and component.
+
+    Every query starts from the text index matches and reaches ewaste_items by
+    primary key, so its cost follows the number of matches, not the table size.
+    Each facet's counts ignore that facet's own filter, so a client can show the
+    alternatives to the current selection.
+    """
+    facets = {"tag": {}, "category": {}, "component": {}}
+    terms = search_terms(q)
+    if not terms:
+        return {"total": 0, "results": [], "facets": facets}
+    matches = _matches(_dialect(db), terms)
+    tag_col = func.coalesce(EwasteItem.tag, "unknown")
+    category_col = func.coalesce(EwasteItem.category, "unknown")
+
+    filters = {
+        "tag": tag_col == tag if tag else None,
+        "category": category_col == category if category else None,
+        "component": EwasteItem.id.in_(
+            select(ItemComponent.item_id).where(ItemComponent.component == component.lower())
+        ) if component else None,
+    }
+    price = [cond for cond in (
+        EwasteItem.price >= min_price if min_price is not None else None,
+        EwasteItem.price <= max_price if max_price is not None else None,
+    ) if cond is not None]
+
+    def where(skip=None):
+        return [cond for name, cond in filters.items() if cond is not None and name != skip] + price
+
+    def matched(*columns, skip=None):
+        return select(*columns).select_from(matches).join(EwasteItem, EwasteItem.id == matches.c.id).where(*where(skip))
+
+    results = rows_as_dicts(db.execute(
+        matched(*ITEM_COLUMNS, EwasteItem.price, matches.c.score)
+        .order_by(matches.c.score.desc(), EwasteItem.id)
+        .limit(limit)
+        .offset(offset)
+    ))
+    total = db.scalar(matched(func.count()))
+
+    for name, col in (("tag", tag_col), ("category", category_col)):
+        rows = db.execute(matched(col, func.count(), skip=name).group_by(col))
+        facets[name] = {value: count for value, count in rows}
+    ids = matched(EwasteItem.id, skip="component").subquery()
+    count = func.count().label("count")
+    rows = db.execute(
+        select(ItemComponent.component, count)
+        .join(ids, ids.c.id == ItemComponent.item_id)
+        .group_by(ItemComponent.component)
+        .order_by(count.desc(), ItemComponent.component)
+        .limit(facet_limit)
+    )
+    facets["component"] = {value: n for value, n in rows}
+    return {"total": total, "results": results, "facets": facets}
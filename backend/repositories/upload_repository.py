@@ -0,0 +1,53 @@
+"""Reference counting for content-addressed uploads.
+
+Several items can point at the same stored image. Each item that stores a
+key takes a reference in the same transaction as the item insert, and
+`delete_item` drops it; when the count reaches zero the caller deletes the
+blob before committing, while the decrement still holds its lock on the row.
+
+Storing a file happens before its reference is taken: save_image keeps an
+existing copy of the same content, which a delete may then remove. The
+uploader re-checks the file after register_upload (image_handler.restore_image);
+by then such a delete has committed, and later ones wait on the new reference.
+An upload whose item insert fails is dropped with `discard_upload`.
+Files uploaded before content addressing have no row here and are never
+collected.
+"""
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session
+
+from models.stored_file_model import StoredFile
+from utils.storage import StoredObject
+
+
+def register_upload(db: Session, stored: StoredObject, references: int = 1):
+    updated = db.execute(
+        update(StoredFile).where(StoredFile.key == stored.key).values(refcount=StoredFile.refcount + references)
+    )
+    if updated.rowcount == 0:
+        db.add(StoredFile(key=stored.key, refcount=references, size=stored.size))
+
+
+def release_upload(db: Session, key: str) -> bool:
+    """Drop one reference; True when that was the last one and the blob can go."""
+    db.execute(update(StoredFile).where(StoredFile.key == key).values(refcount=StoredFile.refcount - 1))
+    remaining = db.scalar(select(StoredFile.refcount).where(StoredFile.key == key))
+    if remaining is None or remaining > 0:
+        return False
+    db.execute(delete(StoredFile).where(StoredFile.key == key))
+    return True
+
+
+def discard_upload(db: Session, stored: StoredObject) -> bool:
+    """For a stored file whose item was not inserted: True when no item uses it and the blob can go.
+
+    Locks the key's row (creating it if needed) the way register_upload does,
+    so the caller deletes the blob before committing, as after release_upload.
+    """
+    register_upload(db, stored, 0)
+    db.flush()
+    if db.scalar(select(StoredFile.refcount).where(StoredFile.key == stored.key)):
+        return False
+    db.execute(delete(StoredFile).where(StoredFile.key == stored.key))
+    return True
@@ -1,34 +1,76 @@
+import logging
+
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
-from database import get_db
+from database import AsyncDB, get_async_db
 from models.user_model import User
 from schemas.user_schema import UserCreate, UserOut
-from utils.auth_utils import hash_password, verify_password, create_access_token
+from utils.auth_utils import create_access_token, get_current_profile, get_current_user, needs_rehash, remember_profile
+from utils.password_hashing import hash_password_async, verify_password_async
+from utils.token_cache import revocations
+
 
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 
+def _user_by_email(db: Session, email: str):
+    return db.query(User).filter(User.email == email).first()
+
+
+def _save(db: Session, user: User):
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
+
+# Async so the bcrypt work is awaited on the hashing pool (utils.password_hashing)
+# instead of holding one of the threads shared by every sync endpoint
 @router.post("/register", response_model=UserOut)
-def register(user: UserCreate, db: Session = Depends(get_db)):
-    existing = db.query(User).filter(User.email == user.email).first()
+async def register(user: UserCreate, db: AsyncDB = Depends(get_async_db)):
+    existing = await db.run(_user_by_email, user.email)
     if existing:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
-    hashed = hash_password(user.password)
+    hashed = await hash_password_async(user.password)
     db_user = User(name=user.name, email=user.email, password=hashed, address=user.address, phone=user.phone)
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-    return db_user
+    return await db.run(_save, db_user)
 
 
 @router.post("/login")
-def login(payload: dict, db: Session = Depends(get_db)):
+async def login(payload: dict, db: AsyncDB = Depends(get_async_db)):
     # payload: {"email":..., "password":...}
     email = payload.get("email")
     password = payload.get("password")
-    user = db.query(User).filter(User.email == email).first()
-    if not user or not verify_password(password, user.password):
+    user = await db.run(_user_by_email, email)
+    if not user or not password or not await verify_password_async(password, user.password):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
     token = create_access_token({"sub": user.email, "user_id": user.id, "role": user.role})
-    return {"access_token": token, "token_type": "bearer", "user": {"id": user.id, "email": user.email, "name": user.name}}
\ No newline at end of file
+    body = {"access_token": token, "token_type": "bearer", "user": {"id": user.id, "email": user.email, "name": user.name}}
+    # Warm the profile cache: the first authenticated request then needs no query
+    remember_profile(user)
+    if needs_rehash(user.password):
+        # BCRYPT_ROUNDS changed since this hash was made: upgrade it while we have the password
+        user.password = await hash_password_async(password)
+        await db.commit()
+    return body
+
+
+@router.get("/me", response_model=UserOut)
+def me(profile: dict = Depends(get_current_profile)):
+    return profile
+
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(payload: dict = Depends(get_current_user), db: AsyncDB = Depends(get_async_db)):
+    if not payload.get("jti"):
+        # Issued before tokens carried an id; it simply expires
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Token cannot be revoked")
+    try:
+        await db.run(revocations.revoke, payload["jti"], payload["exp"])
+    except SQLAlchemyError:
+        logger.exception("could not record the revocation of a token")
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Could not log out; try again",
+                            headers={"Retry-After": "1"})
@@ -1,30 +1,202 @@
-from fastapi import APIRouter, Depends, File, UploadFile, Form, HTTPException, Query
-from sqlalchemy.orm import Session, joinedload
-from database import get_db
+import asyncio
+import json
+from fastapi import APIRouter, BackgroundTasks, Depends, File, UploadFile, Form, HTTPException, Query, Request, Response
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from config import settings
+from database import AsyncDB, get_async_db
+from models.analysis_job_model import AnalysisJob
 from models.ewaste_model import EwasteItem
 from models.user_model import User
-from schemas.ewaste_schema import EwasteCreate, EwasteOut, EwasteWithUserOut
-from utils.image_handler import save_image
-from utils.gemini_api import analyze_image
+from repositories.analytics_repository import (
+    analytics_summary,
+    record_item_added,
+    record_item_removed,
+)
+from repositories.ewaste_repository import (
+    analytics_items_query,
+    analysis_state,
+    changed_items,
+    fetch_page,
+    filtered_items_query,
+    items_with_owner_query,
+    iter_rows,
+    iter_rows_async,
+    reusable_items_query,
+    user_items_query,
+)
+from repositories.geo_repository import index_locations, nearby_items, unindex_locations
+from repositories.ingest_repository import insert_items
+from repositories.search_repository import index_item, search_items, unindex_items
+from repositories.upload_repository import discard_upload, register_upload, release_upload
+from schemas.ewaste_schema import (
+    BulkResult,
+    EwasteBulkItem,
+    EwasteCreate,
+    EwasteOut,
+    EwasteWithUserOut,
+    NearbyItem,
+    SearchResult,
+)
+from utils.image_handler import restore_image, save_image
+from utils.image_derivatives import generate_item_derivatives
+from utils.storage import get_storage, key_from_path, url_for
+from utils.analysis_worker import ANALYSIS_POLL_SECONDS, PENDING, enqueue_analysis, worker_pool
+from utils.analysis_cache import analysis_cache
 from utils.auth_utils import get_current_user
+from utils.events import (
+    EVENT_TYPES,
+    EVENTS_HEARTBEAT_SECONDS,
+    EVENTS_STREAM_SECONDS,
+    event_bus,
+    event_stream_response,
+)
+from utils.rate_limit import BULK_ITEM_BYTES, analysis_backlog, upload_limiter
+from utils.response_cache import etag_matches, response_cache
+from utils.serialization import FastJSONResponse, dumps
+from utils.streaming import ndjson_response
 
 router = APIRouter(prefix="/ewaste", tags=["ewaste"])
 
+MAX_PAGE_SIZE = 1000
+BULK_MAX_ITEMS = settings.bulk_max_items
+NEARBY_MAX_RADIUS_KM = settings.nearby_max_radius_km
+
+
+class Pagination:
+    """Keyset pagination on the item id, plus opt-in NDJSON streaming for exports."""
+
+    def __init__(
+        self,
+        limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size; omit for every row"),
+        after_id: int | None = Query(None, description="Return items with id greater than this (cursor)"),
+        stream: bool = Query(False, description="Stream every row after the cursor as NDJSON"),
+    ):
+        self.limit = limit
+        self.after_id = after_id
+        self.stream = stream
+
+
+async def _fetch_page(db: AsyncDB, stmt, page: Pagination) -> tuple[list[dict], dict]:
+    """One page of rows, plus the X-Next-After-Id header when the page is full."""
+    rows = await db.run(fetch_page, stmt, page.limit, page.after_id)
+    headers = {}
+    if page.limit is not None and len(rows) == page.limit:
+        # Full page: hand the client the cursor for the next one
+        headers["X-Next-After-Id"] = str(rows[-1]["id"])
+    return rows, headers
+
+
+async def _list_response(db: AsyncDB, stmt, page: Pagination) -> Response:
+    if page.stream:
+        if db.is_async:
+            return ndjson_response(iter_rows_async(db.session.bind, stmt, after_id=page.after_id))
+        return ndjson_response(iter_rows(db.session, stmt, after_id=page.after_id))
+    # Rows already have exactly the response schema's fields, so they are encoded as they are
+    rows, headers = await _fetch_page(db, stmt, page)
+    return FastJSONResponse(rows, headers=headers)
+
+
+async def _cached_json(request: Request, endpoint: str, build) -> Response:
+    """Serve a JSON body from response_cache, or build it (an async () -> (bytes, headers)) and store it.
+
+    A matching If-None-Match gets a 304 straight from the version counter,
+    before any cache lookup or query.
+    """
+    key = response_cache.key(endpoint, request.query_params, await response_cache.version())
+    headers = {"ETag": response_cache.etag(key), "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        response_cache.stats["not_modified"] += 1
+        return Response(status_code=304, headers=headers)
+    entry = await response_cache.get(key)
+    if entry is None:
+        body, extra = await build()
+        await response_cache.put(key, body, extra)
+        entry = {"body": body, "headers": extra}
+    return Response(entry["body"], media_type="application/json", headers={**entry["headers"], **headers})
+
+
+def _feed_snapshot(db: Session, item_ids: list[int]) -> tuple[list[dict], dict]:
+    return changed_items(db, item_ids), analytics_summary(db)
+
+
+async def _publish_change(db: AsyncDB, event_type: str, item_ids: list[int]):
+    """Send a committed create or delete to /ewaste/events: the rows (or ids), then the new counters."""
+    if not event_bus.has_audience():
+        # No stream to send to or resume: skip the two queries
+        event_bus.skip()
+        return
+    if event_type == "item.deleted":
+        _, counters = await db.run(_feed_snapshot, [])
+        event_bus.publish(event_type, {"ids": item_ids})
+    else:
+        rows, counters = await db.run(_feed_snapshot, item_ids)
+        event_bus.publish(event_type, {"items": rows})
+    event_bus.publish("counters", counters)
+
+
+def _discard_uploads(session_factory, stored: list):
+    """Delete files stored for an insert that failed, unless other items use them."""
+    with session_factory() as db:
+        for obj in stored:
+            if discard_upload(db, obj):
+                get_storage().delete_with_variants(obj.key)
+        db.commit()
+
+
+async def _commit_insert(db: AsyncDB, insert, *args, files: list = ()):
+    """db.run(insert, *args) and commit; files are the (UploadFile, StoredObject) pairs it references.
+
+    Each file is checked once insert has taken its references (see
+    restore_image). If anything fails, the files are discarded with the
+    transaction instead of being left in storage with no reference.
+    """
+    try:
+        result = await db.run(insert, *args)
+        for file, stored in files:
+            await run_in_threadpool(restore_image, file, stored)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        if files:
+            await run_in_threadpool(_discard_uploads, db.sync_session_factory, [stored for _, stored in files])
+        raise
+    return result
+
+
+def _insert_item(db: Session, item: EwasteItem, stored) -> EwasteItem:
+    """Add the item with its counters, indexes, upload reference and analysis job. Does not commit."""
+    db.add(item)
+    record_item_added(db, item)
+    index_item(db, item)
+    index_locations(db, [{"id": item.id, "latitude": item.latitude, "longitude": item.longitude}])
+    if stored:
+        register_upload(db, stored)
+    if not item.is_working and item.image_path:
+        # Analysis runs in the background worker pool; poll /ewaste/{id}/analysis
+        enqueue_analysis(db, item)
+    db.flush()
+    return item
+
+
 @router.post("/add", response_model=EwasteOut)
-def add_ewaste(
+async def add_ewaste(
+    background_tasks: BackgroundTasks,
     user_id: int = Form(...),
     category: str = Form(...),
     product_name: str = Form(None),
     is_working: bool = Form(...),
     price: int = Form(None),
     image: UploadFile = File(None),
-    db: Session = Depends(get_db),
+    latitude: float = Form(None, ge=-90, le=90),
+    longitude: float = Form(None, ge=-180, le=180),
+    db: AsyncDB = Depends(get_async_db),
 ):
-    image_path = None
-    if image:
-        image_path = save_image(image)
+    if (latitude is None) != (longitude is None):
+        raise HTTPException(status_code=400, detail="Send latitude and longitude together")
     tag = None
-    analysis = None
     if is_working:
         # working devices: reuse or resell decision — default to reuse
         tag = "reuse"
@@ -33,8 +205,14 @@ def add_ewaste(
     else:
         tag = "recycle"
         price = None  # No price for non-working items
-        if image_path:
-            analysis = analyze_image(image_path)
+    # Validate before storing the image so a rejected request leaves no orphaned file
+    if image and not is_working:
+        await analysis_backlog.admit(db, 1, "/ewaste/add")
+    image_path = None
+    stored = None
+    if image:
+        stored = await run_in_threadpool(save_image, image)
+        image_path = url_for(stored.key)
     item = EwasteItem(
         user_id=user_id,
         category=category,
@@ -43,109 +221,269 @@ def add_ewaste(
         image_path=image_path,
         tag=tag,
         price=price,
-        gemini_analysis=analysis
+        latitude=latitude,
+        longitude=longitude,
     )
-    db.add(item)
-    db.commit()
-    db.refresh(item)
+    item = await _commit_insert(db, _insert_item, item, stored, files=[(image, stored)] if stored else [])
+    await db.run(Session.refresh, item)
+    await response_cache.invalidate_async()
+    await _publish_change(db, "item.created", [item.id])
+    if item.analysis_status == PENDING:
+        worker_pool.wake()
+    if image_path:
+        # Thumbnail/display WebP variants are written after the response goes out
+        background_tasks.add_task(
+            generate_item_derivatives, db.sync_session_factory, item.id, image_path
+        )
     return item
 
-@router.get("/user/{user_id}", response_model=list[EwasteOut])
-def get_user_items(user_id: int, db: Session = Depends(get_db)):
-    items = db.query(EwasteItem).filter(EwasteItem.user_id == user_id).all()
+
+class _BulkLineError:
+    """Placeholder for an NDJSON line that did not parse."""
+
+    def __init__(self, message: str):
+        self.message = message
+
+
+def _bulk_too_large() -> HTTPException:
+    return HTTPException(status_code=413, detail=f"At most {BULK_MAX_ITEMS} items of {BULK_ITEM_BYTES} bytes per request")
+
+
+async def _read_bulk_body(request: Request) -> str:
+    """A JSON or NDJSON bulk body, read until it is longer than BULK_MAX_ITEMS items could be (413)."""
+    limit = BULK_MAX_ITEMS * BULK_ITEM_BYTES
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > limit:
+        raise _bulk_too_large()
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > limit:
+            raise _bulk_too_large()
+    return body.decode("utf-8", errors="replace")
+
+
+def _parse_bulk_body(text: str) -> list:
+    """Items from a JSON array or NDJSON. A malformed NDJSON line becomes a per-row error."""
+    stripped = text.lstrip()
+    if stripped.startswith("["):
+        try:
+            items = json.loads(text)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid JSON: {e}")
+        return items
+    items = []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        try:
+            items.append(json.loads(line))
+        except ValueError as e:
+            items.append(_BulkLineError(str(e)))
     return items
 
+
+def _bulk_row(raw, images) -> tuple[dict | None, list[str]]:
+    """Validate one bulk item; returns (row of EwasteItem columns, errors)."""
+    if isinstance(raw, _BulkLineError):
+        return None, [f"invalid JSON: {raw.message}"]
+    try:
+        item = EwasteBulkItem.model_validate(raw)
+    except ValidationError as e:
+        return None, [f"{'.'.join(str(p) for p in err['loc']) or 'item'}: {err['msg']}" for err in e.errors()]
+    errors = []
+    # Same rules as /add: working items are for reuse and need a price, the rest are recycled
+    if item.is_working and not item.price:
+        errors.append("price: required for working items")
+    if item.image is not None and item.image not in images:
+        errors.append(f"image: no uploaded file named {item.image!r}")
+    if (item.latitude is None) != (item.longitude is None):
+        errors.append("latitude, longitude: send both or neither")
+    row = {
+        "user_id": item.user_id,
+        "category": item.category,
+        "product_name": item.product_name,
+        "is_working": item.is_working,
+        "tag": "reuse" if item.is_working else "recycle",
+        "price": item.price if item.is_working else None,
+        "image_path": item.image,  # replaced by the stored path once saved
+        "analysis_status": None,
+        "latitude": item.latitude,
+        "longitude": item.longitude,
+    }
+    return row, errors
+
+
+def _existing_user_ids(db: Session, user_ids: set[int]) -> set[int]:
+    return set(db.scalars(select(User.id).where(User.id.in_(user_ids))))
+
+
+@router.post("/bulk", response_model=BulkResult)
+async def bulk_add_ewaste(request: Request, background_tasks: BackgroundTasks, db: AsyncDB = Depends(get_async_db)):
+    """Register many items in one transaction.
+
+    Body: a JSON array or NDJSON of {user_id, category, product_name,
+    is_working, price, image}. Items can also be sent as multipart/form-data,
+    with the array or NDJSON in an `items` field and the photos as `images`
+    files, which items reference by filename in `image`. Valid rows are stored
+    and invalid ones reported; `results` has one entry per input row, in order.
+    """
+    images = {}
+    if request.headers.get("content-type", "").startswith("multipart/form-data"):
+        form = await request.form(max_files=BULK_MAX_ITEMS)
+        text = form.get("items")
+        if not isinstance(text, str):
+            raise HTTPException(status_code=400, detail="Multipart bulk uploads need an 'items' field")
+        if len(text) > BULK_MAX_ITEMS * BULK_ITEM_BYTES:
+            raise _bulk_too_large()
+        for upload in form.getlist("images"):
+            if upload.filename in images:
+                raise HTTPException(status_code=400, detail=f"Duplicate image filename {upload.filename!r}")
+            images[upload.filename] = upload
+        # AdmissionMiddleware took one token for the request; each further photo costs one more
+        await upload_limiter.charge(request.scope, len(images) - 1, "/ewaste/bulk")
+    else:
+        # Checked while it arrives, so an oversized batch is neither buffered nor parsed
+        text = await _read_bulk_body(request)
+
+    raw_items = _parse_bulk_body(text)
+    if not isinstance(raw_items, list):
+        raise HTTPException(status_code=400, detail="Expected a JSON array or NDJSON of items")
+    if len(raw_items) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_ITEMS} items per request")
+
+    checked = [_bulk_row(raw, images) for raw in raw_items]
+    user_ids = {row["user_id"] for row, errors in checked if row and not errors}
+    known_users = await db.run(_existing_user_ids, user_ids) if user_ids else set()
+    for row, errors in checked:
+        if row and not errors and row["user_id"] not in known_users:
+            errors.append(f"user_id: no user {row['user_id']}")
+    # Broken devices with a photo get analysed
+    analyses = sum(1 for row, errors in checked if row and not errors and row["image_path"] and not row["is_working"])
+    await analysis_backlog.admit(db, analyses, "/ewaste/bulk")
+
+    # Store only the photos that valid rows use, each once
+    stored = {}
+    for name in {row["image_path"] for row, errors in checked if row and not errors and row["image_path"]}:
+        try:
+            stored[name] = await run_in_threadpool(save_image, images[name])
+        except HTTPException as e:
+            stored[name] = e
+    uploads = {}
+    files = []
+    valid = []
+    for row, errors in checked:
+        if not row or errors:
+            continue
+        name = row["image_path"]
+        if name is not None:
+            if isinstance(stored[name], HTTPException):
+                errors.append(f"image: {stored[name].detail}")
+                continue
+            row["image_path"] = url_for(stored[name].key)
+            if row["image_path"] not in uploads:
+                files.append((images[name], stored[name]))
+            uploads[row["image_path"]] = stored[name]
+        valid.append(row)
+
+    ids = await _commit_insert(db, insert_items, valid, uploads, files=files) if valid else []
+    if ids:
+        await response_cache.invalidate_async()
+        await _publish_change(db, "item.created", ids)
+
+    results = []
+    created = iter(zip(ids, valid))
+    for index, (row, errors) in enumerate(checked):
+        if row is None or errors:
+            results.append({"index": index, "status": "error", "errors": errors})
+            continue
+        item_id, row = next(created)
+        results.append({"index": index, "status": "created", "id": item_id,
+                        "tag": row["tag"], "analysis_status": row["analysis_status"]})
+        if row["image_path"]:
+            background_tasks.add_task(generate_item_derivatives, db.sync_session_factory, item_id, row["image_path"])
+    if any(row["analysis_status"] == PENDING for row in valid):
+        worker_pool.wake()
+    return {"created": len(valid), "failed": len(results) - len(valid), "results": results}
+
+@router.get("/user/{user_id}", response_model=list[EwasteOut])
+async def get_user_items(
+    user_id: int,
+    page: Pagination = Depends(),
+    db: AsyncDB = Depends(get_async_db),
+):
+    return await _list_response(db, user_items_query(user_id), page)
+
 @router.get("/all", response_model=list[EwasteWithUserOut])
-def get_all_items(db: Session = Depends(get_db)):
-    items = db.query(EwasteItem).all()
-    result = []
-    for item in items:
-        user = db.query(User).filter(User.id == item.user_id).first()
-        if user:
-            item_dict = {
-                "id": item.id,
-                "user_id": item.user_id,
-                "category": item.category,
-                "product_name": item.product_name,
-                "is_working": item.is_working,
-                "image_path": item.image_path,
-                "tag": item.tag,
-                "gemini_analysis": item.gemini_analysis,
-                "user_name": user.name
-            }
-            result.append(item_dict)
-    return result
+async def get_all_items(page: Pagination = Depends(), db: AsyncDB = Depends(get_async_db)):
+    return await _list_response(db, items_with_owner_query(), page)
 
 
 @router.get("/filter", response_model=list[EwasteOut])
-def filter_items(
+async def filter_items(
     tag: str | None = Query(None, description="Filter by tag: reuse, resell, recycle"),
     category: str | None = Query(None, description="Filter by category: consumer, utility"),
-    db: Session = Depends(get_db),
+    page: Pagination = Depends(),
+    db: AsyncDB = Depends(get_async_db),
+):
+    return await _list_response(db, filtered_items_query(tag, category), page)
+
+
+@router.get("/search", response_model=SearchResult)
+async def search(
+    q: str = Query(..., min_length=1, max_length=200, description="Words to find in product names and components; each matches as a prefix"),
+    tag: str | None = Query(None, description="Only items with this tag"),
+    category: str | None = Query(None, description="Only items in this category"),
+    component: str | None = Query(None, description="Only items whose analysis lists this component"),
+    min_price: int | None = Query(None, ge=0),
+    max_price: int | None = Query(None, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=MAX_PAGE_SIZE),
+    facet_limit: int = Query(20, ge=1, le=100, description="Most common components to count"),
+    db: AsyncDB = Depends(get_async_db),
+):
+    """Ranked full-text search with facet counts by tag, category and component."""
+    return FastJSONResponse(await db.run(
+        search_items, q, tag, category, component, min_price, max_price, limit, offset, facet_limit
+    ))
+
+
+@router.get("/nearby", response_model=list[NearbyItem])
+async def nearby(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius_km: float = Query(10, gt=0, le=NEARBY_MAX_RADIUS_KM),
+    k: int = Query(20, ge=1, le=100, description="Most items to return"),
+    tag: str | None = Query("recycle", description="Only items with this tag; empty for any"),
+    category: str | None = Query(None, description="Only items in this category"),
+    db: AsyncDB = Depends(get_async_db),
 ):
-    query = db.query(EwasteItem)
-    if tag:
-        query = query.filter(EwasteItem.tag == tag)
-    if category:
-        query = query.filter(EwasteItem.category == category)
-    return query.all()
+    """The k items with a pickup location nearest to (lat, lon) within radius_km, nearest first."""
+    return FastJSONResponse(await db.run(nearby_items, lat, lon, radius_km, k, tag, category))
 
 
 @router.get("/analytics")
-def analytics(db: Session = Depends(get_db)):
+async def analytics(
+    request: Request,
+    include_items: bool = Query(False, description="Also return a page of items in all_items"),
+    items_limit: int = Query(100, ge=1, le=1000, description="Page size for all_items"),
+    items_after_id: int | None = Query(None, description="Return items with id greater than this"),
+    db: AsyncDB = Depends(get_async_db),
+):
     """Public endpoint for analytics - no authentication required"""
+
+    async def build():
+        # Counts come from the ewaste_counters summary table, not a table scan
+        summary = await db.run(analytics_summary)
+        summary["all_items"] = (
+            await db.run(fetch_page, analytics_items_query(), items_limit, items_after_id)
+            if include_items else []
+        )
+        return dumps(summary), {}
+
     try:
-        # Get all items
-        items = db.query(EwasteItem).all()
-
-        # Convert items to list of dicts
-        all_items = []
-        for item in items:
-            # Get user info if available
-            user = db.query(User).filter(User.id == item.user_id).first()
-            
-            # Handle potentially null fields
-            tag = item.tag if item.tag else "unknown"
-            category = item.category if item.category else "unknown"
-            
-            item_dict = {
-                "id": item.id,
-                "user_id": item.user_id,
-                "category": category,
-                "product_name": item.product_name or "",
-                "is_working": item.is_working,
-                "image_path": item.image_path,
-                "tag": tag,
-                "gemini_analysis": item.gemini_analysis,
-                "price": item.price if hasattr(item, 'price') else None,
-                "user_name": user.name if user else None
-            }
-            all_items.append(item_dict)
-
-        total = len(items)
-        
-        # counts by tag
-        tags = ["reuse", "resell", "recycle", "unknown"]
-        tag_counts = {t: 0 for t in tags}  # Initialize all counts to 0
-        for item in items:
-            item_tag = item.tag if item.tag else "unknown"
-            if item_tag in tag_counts:
-                tag_counts[item_tag] += 1
-        
-        # counts by category
-        categories = ["consumer", "utility", "unknown"]
-        category_counts = {c: 0 for c in categories}  # Initialize all counts to 0
-        for item in items:
-            item_category = item.category if item.category else "unknown"
-            if item_category in category_counts:
-                category_counts[item_category] += 1
-        
-        return {
-            "total": total,
-            "by_tag": tag_counts,
-            "by_category": category_counts,
-            "all_items": all_items
-        }
+        # Errors are not cached: build raises before anything is stored
+        return await _cached_json(request, "analytics", build)
     except Exception as e:
         return {
             "total": 0,
@@ -155,58 +493,96 @@ def analytics(db: Session = Depends(get_db)):
             "error": str(e)
         }
 
-    # counts by category
-    categories = ["consumer", "utility"]
-    category_counts = {}
-    for c in categories:
-        category_counts[c] = sum(1 for item in items if item.category == c)
-
-    return {
-        "total": total,
-        "by_tag": tag_counts,
-        "by_category": category_counts,
-        "all_items": all_items
-    }
-
-
 
 @router.get("/reusable", response_model=list[EwasteWithUserOut])
-def get_reusable_items(db: Session = Depends(get_db)):
+async def get_reusable_items(request: Request, page: Pagination = Depends(), db: AsyncDB = Depends(get_async_db)):
     """Get all items tagged for reuse with their prices and contact info"""
-    try:
-        print("Fetching reusable items...") # Debug log
-        items = db.query(EwasteItem).filter(EwasteItem.tag == "reuse").all()
-        print(f"Found {len(items)} items") # Debug log
-        result = []
-        for item in items:
-            user = db.query(User).filter(User.id == item.user_id).first()
-            if user:
-                item_dict = {
-                    "id": item.id,
-                    "user_id": item.user_id,
-                    "category": item.category,
-                    "product_name": item.product_name,
-                    "is_working": item.is_working,
-                    "image_path": item.image_path,
-                    "tag": item.tag,
-                    "gemini_analysis": item.gemini_analysis,
-                    "price": item.price,
-                    "user_name": user.name,
-                    "user_phone": user.phone
-                }
-                print(f"Item data: {item_dict}") # Debug log
-                result.append(item_dict)
-        return result
-    except Exception as e:
-        print(f"Error in get_reusable_items: {e}") # Debug log
-        raise
+    if page.stream:
+        return await _list_response(db, reusable_items_query(), page)
 
-@router.delete("/{item_id}")
-def delete_item(item_id: int, db: Session = Depends(get_db)):
-    """Delete an e-waste item by id. Returns 404 if not found."""
+    async def build():
+        rows, headers = await _fetch_page(db, reusable_items_query(), page)
+        # Keeps X-Next-After-Id with the cached body
+        return dumps(rows), headers
+
+    return await _cached_json(request, "reusable", build)
+
+@router.get("/events")
+async def events(
+    request: Request,
+    types: str | None = Query(None, description="Comma-separated event types to receive, e.g. counters"),
+    last_event_id: str | None = Query(None, description="Resume after this event id (the Last-Event-ID header wins)"),
+):
+    """Server-Sent Events: item diffs and updated counters as writes commit, instead of polling.
+
+    Event types: item.created, item.updated, item.deleted and counters, plus
+    ready when a stream starts and reset when the client should reload
+    /reusable and /analytics. See utils.events.
+    """
+    wanted = None
+    if types:
+        wanted = {t.strip() for t in types.split(",") if t.strip()}
+        unknown = wanted - EVENT_TYPES
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown event types: {', '.join(sorted(unknown))}")
+    resume_from = request.headers.get("last-event-id") or last_event_id
+    return event_stream_response(event_bus, resume_from, wanted, EVENTS_HEARTBEAT_SECONDS, EVENTS_STREAM_SECONDS)
+
+
+@router.get("/analysis/cache")
+def analysis_cache_stats():
+    """Hit/miss counters for the image analysis cache, for monitoring."""
+    return analysis_cache.snapshot()
+
+
+@router.get("/{item_id}/analysis")
+async def get_analysis(
+    item_id: int,
+    wait: float = Query(0, ge=0, le=60, description="Long-poll up to this many seconds while analysis is pending"),
+    db: AsyncDB = Depends(get_async_db),
+):
+    """Analysis status and result for an item."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + wait
+    while True:
+        state = await db.run(analysis_state, item_id)
+        if state is None:
+            raise HTTPException(status_code=404, detail="Item not found")
+        remaining = deadline - loop.time()
+        if state["analysis_status"] != PENDING or remaining <= 0:
+            return state
+        # Hand the connection back to the pool while waiting; the next poll checks one out again
+        await db.close()
+        await worker_pool.wait_for(item_id, min(remaining, ANALYSIS_POLL_SECONDS))
+
+def _delete_item(db: Session, item_id: int):
+    """Delete the item, uncommitted; returns (found, image key it released or None, whether that key is now unused)."""
     item = db.query(EwasteItem).filter(EwasteItem.id == item_id).first()
     if not item:
-        raise HTTPException(status_code=404, detail="Item not found")
+        return False, None, False
+    db.query(AnalysisJob).filter(AnalysisJob.item_id == item_id).delete()
+    unindex_items(db, [item_id])
+    unindex_locations(db, [item_id])
     db.delete(item)
-    db.commit()
+    record_item_removed(db, item)
+    image_key = key_from_path(item.image_path) if item.image_path else None
+    orphaned = release_upload(db, image_key) if image_key else False
+    return True, image_key, orphaned
+
+
+@router.delete("/{item_id}")
+async def delete_item(item_id: int, db: AsyncDB = Depends(get_async_db)):
+    """Delete an e-waste item by id. Returns 404 if not found."""
+    found, image_key, orphaned = await db.run(_delete_item, item_id)
+    if not found:
+        raise HTTPException(status_code=404, detail="Item not found")
+    if orphaned:
+        # Last item using this image is gone; drop the file and its variants before committing,
+        # while the refcount update still holds its lock. An upload of the same content that
+        # found the file before this delete stores it again (restore_image). If the delete
+        # fails, the transaction rolls back with it.
+        await run_in_threadpool(get_storage().delete_with_variants, image_key)
+    await db.commit()
+    await response_cache.invalidate_async()
+    await _publish_change(db, "item.deleted", [item_id])
     return {"detail": "deleted"}
\ No newline at end of file
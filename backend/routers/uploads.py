@@ -0,0 +1,113 @@
+"""Serving for stored uploads.
+
+Stored files never change once written (originals are named after their
+SHA-256, variants after the original), so responses carry a strong ETag and
+`Cache-Control: immutable`. Repeat views are answered from the browser cache,
+and revalidations with a matching If-None-Match get an empty 304.
+
+Single byte ranges (`Range: bytes=a-b`, honouring If-Range) are served as 206.
+Full local files go out as FileResponse. With UPLOADS_PATHSEND=1 and a server
+that offers the ASGI `http.response.pathsend` extension, they are handed to
+the server to send with sendfile instead of being read through Python.
+"""
+
+import mimetypes
+import os
+import re
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+
+from config import settings
+from utils.response_cache import etag_matches
+from utils.storage import content_hash, get_storage
+
+
+router = APIRouter(prefix="/uploads", tags=["uploads"])
+
+UPLOAD_CACHE_MAX_AGE = settings.upload_cache_max_age
+UPLOADS_PATHSEND = settings.uploads_pathsend
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class PathsendFileResponse(FileResponse):
+    """FileResponse that lets the server send the file itself when it can."""
+
+    async def __call__(self, scope, receive, send):
+        if "http.response.pathsend" not in scope.get("extensions", {}) or scope["method"] == "HEAD":
+            return await super().__call__(scope, receive, send)
+        if self.stat_result is None:
+            self.set_stat_headers(os.stat(self.path))
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        await send({"type": "http.response.pathsend", "path": os.path.abspath(self.path)})
+
+
+def _etag(storage, key: str) -> str:
+    digest = content_hash(key)
+    return f'"{digest}"' if digest else f'"{storage.version(key)}"'
+
+
+def _byte_range(header: str | None, size: int):
+    """(start, end) for a single satisfiable range, None to send everything, or "unsatisfiable"."""
+    if not header:
+        return None
+    match = _RANGE_RE.match(header.strip())
+    if not match or match.groups() == ("", ""):
+        # Multiple ranges or malformed: ignoring Range and sending 200 is allowed
+        return None
+    first, last = match.groups()
+    if first == "":
+        length = int(last)
+        if length == 0:
+            return "unsatisfiable"
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return "unsatisfiable"
+    return start, end
+
+
+@router.api_route("/{key:path}", methods=["GET", "HEAD"])
+def get_upload(key: str, request: Request):
+    """Serve a stored upload from whichever storage backend is configured."""
+    storage = get_storage()
+    try:
+        found = storage.exists(key)
+    except ValueError:
+        found = False
+    if not found:
+        raise HTTPException(status_code=404, detail="Not found")
+
+    etag = _etag(storage, key)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={UPLOAD_CACHE_MAX_AGE}, immutable",
+        "Accept-Ranges": "bytes",
+    }
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    media_type = mimetypes.guess_type(key)[0] or "application/octet-stream"
+    size = storage.size(key)
+    if_range = request.headers.get("if-range")
+    byte_range = None
+    if if_range is None or if_range.strip() == etag:
+        byte_range = _byte_range(request.headers.get("range"), size)
+    if byte_range == "unsatisfiable":
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+    if byte_range is not None:
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        headers["Content-Length"] = str(end - start + 1)
+        body = [] if request.method == "HEAD" else storage.iter_chunks(key, start, end)
+        return StreamingResponse(body, status_code=206, media_type=media_type, headers=headers)
+
+    path = storage.local_path(key)
+    if path:
+        response_class = PathsendFileResponse if UPLOADS_PATHSEND else FileResponse
+        return response_class(path, media_type=media_type, headers=headers)
+    headers["Content-Length"] = str(size)
+    body = [] if request.method == "HEAD" else storage.iter_chunks(key)
+    return StreamingResponse(body, media_type=media_type, headers=headers)
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, Any
 
 
@@ -10,6 +10,33 @@ class EwasteCreate(BaseModel):
     price: Optional[int] = None
 
 
+class EwasteBulkItem(BaseModel):
+    """One row of /ewaste/bulk; `image` names a file in the multipart `images` part."""
+    user_id: int
+    category: str
+    product_name: Optional[str] = None
+    is_working: bool
+    price: Optional[int] = None
+    image: Optional[str] = None
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
+
+
+class BulkRowResult(BaseModel):
+    index: int
+    status: str  # created | error
+    id: Optional[int] = None
+    tag: Optional[str] = None
+    analysis_status: Optional[str] = None
+    errors: Optional[list[str]] = None
+
+
+class BulkResult(BaseModel):
+    created: int
+    failed: int
+    results: list[BulkRowResult]
+
+
 class EwasteOut(BaseModel):
     id: int
     user_id: int
@@ -17,9 +44,14 @@ class EwasteOut(BaseModel):
     product_name: Optional[str]
     is_working: bool
     image_path: Optional[str]
+    thumbnail_path: Optional[str] = None
+    display_path: Optional[str] = None
     tag: Optional[str]
     gemini_analysis: Optional[Any]
     price: Optional[int] = None  # Make sure price is optional with None as default
+    analysis_status: Optional[str] = None  # pending | done | failed for items sent for analysis
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
 
     class Config:
         from_attributes = True
@@ -32,5 +64,19 @@ class EwasteWithUserOut(EwasteOut):
         from_attributes = True
 
 
+class SearchHit(EwasteOut):
+    score: float  # relevance, higher is better
+
+
+class NearbyItem(EwasteOut):
+    distance_km: float  # great-circle distance from the query point
+
+
+class SearchResult(BaseModel):
+    total: int
+    results: list[SearchHit]
+    facets: dict[str, dict[str, int]]  # tag / category / component -> value -> matching items
+
+
 class Config:
     orm_mode = True
\ No newline at end of file
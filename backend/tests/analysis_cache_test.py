@@ -0,0 +1,58 @@
+# Duplicate images must be answered from the analysis cache, not recomputed.
+import asyncio
+import io
+
+import httpx
+
+import utils.gemini_api as gemini_api
+from utils.analysis_cache import AnalysisCache
+from utils.storage import url_for
+
+
+def _store(storage, content):
+    return url_for(storage.save_stream(io.BytesIO(content), '.jpg', 1024).key)
+
+
+def test_duplicate_image_is_served_from_cache(test_db, local_storage, tmp_path, monkeypatch):
+    cache = AnalysisCache(memory_entries=1)
+    monkeypatch.setattr(gemini_api, 'analysis_cache', cache)
+    monkeypatch.setattr(gemini_api, 'GEMINI_API_KEY', 'test-key')
+    calls = []
+
+    def upstream(request):
+        calls.append(request)
+        return httpx.Response(200, json={'components': [{'name': 'copper', 'confidence': 0.8}]})
+
+    def analyze(image_path):
+        async def run():
+            gemini_api._client = httpx.AsyncClient(transport=httpx.MockTransport(upstream))
+            gemini_api._semaphore = asyncio.Semaphore(1)
+            try:
+                return await gemini_api.analyze_image_async(image_path, test_db.Session)
+            finally:
+                await gemini_api.close_client()
+
+        return asyncio.run(run())
+
+    first = _store(local_storage, b'photo-1')
+    other = _store(local_storage, b'photo-2')
+    # A pre-content-addressing upload with the same bytes is hashed on the fly
+    legacy = tmp_path / 'uploads' / '20250101_phone.jpg'
+    legacy.write_bytes(b'photo-1')
+    same = '/uploads/20250101_phone.jpg'
+
+    result = analyze(first)
+    assert analyze(same) == result
+    assert len(calls) == 1
+    assert cache.stats['memory_hits'] == 1
+
+    # A different image evicts the only LRU slot; the first is then found in the table
+    analyze(other)
+    assert analyze(first) == result
+    assert len(calls) == 2
+    assert cache.snapshot()['disk_hits'] == 1 and cache.stats['evictions'] >= 1
+
+    # Results are keyed by model version too
+    monkeypatch.setattr(gemini_api, 'analysis_version', lambda: 'gemini-v2')
+    analyze(first)
+    assert len(calls) == 3
@@ -0,0 +1,76 @@
+# Background analysis: uploads return immediately with a pending status, workers fill it in.
+import asyncio
+from datetime import datetime
+
+import utils.analysis_worker as analysis_worker
+from models.analysis_job_model import AnalysisJob
+
+
+def _upload_broken_item(add_item):
+    return add_item(product_name='Dead Phone', is_working=False, image=b'not really a jpeg').json()
+
+
+def test_item_is_analysed_in_background(client, add_item, test_db):
+    item = _upload_broken_item(add_item)
+    assert item['analysis_status'] == 'pending' and item['gemini_analysis'] is None
+
+    pool = analysis_worker.AnalysisWorkerPool(session_factory=test_db.Session, workers=1)
+    assert asyncio.run(pool.run_once()) is True
+    assert asyncio.run(pool.run_once()) is False
+
+    state = client.get(f"/ewaste/{item['id']}/analysis").json()
+    assert state['analysis_status'] == 'done'
+    assert state['gemini_analysis']['source'] == 'stub'
+
+
+def test_failed_analysis_retries_then_gives_up(client, add_item, test_db, monkeypatch):
+    async def boom(image_path, session_factory, fallback=True):
+        raise RuntimeError('upstream down')
+
+    monkeypatch.setattr(analysis_worker, 'analyze_image_async', boom)
+    monkeypatch.setattr(analysis_worker, 'ANALYSIS_MAX_ATTEMPTS', 2)
+    item = _upload_broken_item(add_item)
+    pool = analysis_worker.AnalysisWorkerPool(session_factory=test_db.Session, workers=1)
+
+    assert asyncio.run(pool.run_once()) is True
+    db = test_db.Session()
+    job = db.query(AnalysisJob).one()
+    assert job.status == 'queued' and job.attempts == 1 and job.next_run_at > datetime.utcnow()
+    # Not due again until the backoff elapses
+    assert asyncio.run(pool.run_once()) is False
+
+    job.next_run_at = datetime.utcnow()
+    db.commit()
+    assert asyncio.run(pool.run_once()) is True
+    db.refresh(job)
+    assert job.status == 'failed' and job.last_error == 'upstream down'
+    db.close()
+
+    state = client.get(f"/ewaste/{item['id']}/analysis", params={'wait': 0}).json()
+    assert state['analysis_status'] == 'failed'
+    assert state['gemini_analysis']['error'] == 'upstream down'
+
+
+def test_long_poll_returns_its_connection_while_waiting(client, add_item, test_db, monkeypatch):
+    item = _upload_broken_item(add_item)
+    engine = test_db.async_engine.sync_engine if test_db.async_engine is not None else test_db.engine
+    checked_out = []
+
+    async def wait_for(item_id, timeout):
+        checked_out.append(engine.pool.checkedout())
+        await asyncio.sleep(timeout)
+
+    monkeypatch.setattr(analysis_worker.worker_pool, 'wait_for', wait_for)
+    state = client.get(f"/ewaste/{item['id']}/analysis", params={'wait': 0.05}).json()
+    assert state['analysis_status'] == 'pending'
+    assert checked_out and set(checked_out) == {0}
+
+
+def test_waiters_are_forgotten_when_they_give_up():
+    pool = analysis_worker.AnalysisWorkerPool(workers=1)
+
+    async def scenario():
+        await asyncio.gather(pool.wait_for(7, 0.01), pool.wait_for(7, 0.02))
+
+    asyncio.run(scenario())
+    assert pool._waiters == {} and pool._waiting == {}
@@ -0,0 +1,26 @@
+# Analytics counters must stay in step with add/delete and match a full recount.
+from repositories.analytics_repository import analytics_summary, rebuild_counters
+
+
+def test_counters_follow_writes(client, add_item, test_db):
+    add_item()
+    add_item(category='utility', price=250)
+    broken = add_item(is_working=False).json()
+
+    body = client.get('/ewaste/analytics').json()
+    assert body['total'] == 3
+    assert body['by_tag']['reuse'] == 2 and body['by_tag']['recycle'] == 1
+    assert body['by_category'] == {'consumer': 2, 'utility': 1, 'unknown': 0}
+    assert body['price_by_tag']['reuse'] == 750
+    assert body['by_category_detail']['consumer'] == {'working': 1, 'not_working': 1, 'price_total': 500}
+    assert body['all_items'] == []
+
+    assert client.delete(f"/ewaste/{broken['id']}").status_code == 200
+    body = client.get('/ewaste/analytics?include_items=true&items_limit=1').json()
+    assert body['total'] == 2 and body['by_tag']['recycle'] == 0
+    assert len(body['all_items']) == 1
+
+    with test_db.Session() as db:
+        incremental = analytics_summary(db)
+        rebuild_counters(db)
+        assert analytics_summary(db) == incremental
@@ -0,0 +1,143 @@
+# Password hashing runs on a pool off the request path, with a configurable cost and rehash on login;
+# verified tokens and profiles are cached, and logout revokes a token everywhere.
+import asyncio
+import time
+
+import bcrypt
+import pytest
+from fastapi.testclient import TestClient
+
+import utils.auth_utils as auth_utils
+import utils.password_hashing as password_hashing
+import utils.token_cache as token_cache
+from main import app
+from models.user_model import User
+
+
+@pytest.fixture
+def hasher(monkeypatch):
+    monkeypatch.setattr(auth_utils, 'BCRYPT_ROUNDS', 4)
+    password_hashing.shutdown()
+    password_hashing.start('thread', 2)
+    yield
+    password_hashing.shutdown()
+
+
+@pytest.fixture
+def auth_caches(test_db, monkeypatch):
+    monkeypatch.setattr(token_cache.revocations, '_revoked', {})
+    monkeypatch.setattr(token_cache.revocations, '_loaded_at', None)
+    token_cache.token_cache.clear()
+    token_cache.user_profiles.clear()
+    yield
+    token_cache.token_cache.clear()
+    token_cache.user_profiles.clear()
+
+
+@pytest.fixture
+def client(test_db, hasher, auth_caches):
+    return TestClient(app)
+
+
+def _cost(hashed):
+    return int(hashed.split('$')[2])
+
+
+def _register(client):
+    return client.post('/auth/register', json={'name': 'Ada', 'email': 'ada@example.com', 'password': 'hunter22'})
+
+
+def test_register_and_login(client, test_db):
+    assert _register(client).status_code == 200
+    assert _register(client).status_code == 400
+
+    resp = client.post('/auth/login', json={'email': 'ada@example.com', 'password': 'hunter22'})
+    assert resp.status_code == 200
+    assert resp.json()['user']['email'] == 'ada@example.com'
+    with test_db.Session() as db:
+        assert _cost(db.query(User).one().password) == 4
+
+    for payload in ({'email': 'ada@example.com', 'password': 'wrong'}, {'email': 'nobody@example.com', 'password': 'x'}, {'email': 'ada@example.com'}):
+        assert client.post('/auth/login', json=payload).status_code == 401
+
+
+def test_login_rehashes_when_cost_changes(client, test_db, monkeypatch):
+    _register(client)
+    monkeypatch.setattr(auth_utils, 'BCRYPT_ROUNDS', 5)
+    assert client.post('/auth/login', json={'email': 'ada@example.com', 'password': 'hunter22'}).status_code == 200
+    with test_db.Session() as db:
+        stored = db.query(User).one().password
+    assert _cost(stored) == 5
+    assert bcrypt.checkpw(b'hunter22', stored.encode())
+
+    # A failed login never rewrites the hash
+    monkeypatch.setattr(auth_utils, 'BCRYPT_ROUNDS', 6)
+    assert client.post('/auth/login', json={'email': 'ada@example.com', 'password': 'nope'}).status_code == 401
+    with test_db.Session() as db:
+        assert db.query(User).one().password == stored
+
+
+def test_process_pool_hashes(monkeypatch):
+    monkeypatch.setattr(auth_utils, 'BCRYPT_ROUNDS', 4)
+    password_hashing.shutdown()
+    password_hashing.start('process', 1)
+    try:
+        hashed = asyncio.run(password_hashing.hash_password_async('secret'))
+        assert _cost(hashed) == 4
+        assert asyncio.run(password_hashing.verify_password_async('secret', hashed))
+        assert not asyncio.run(password_hashing.verify_password_async('other', hashed))
+    finally:
+        password_hashing.shutdown()
+
+
+def _login(client):
+    _register(client)
+    token = client.post('/auth/login', json={'email': 'ada@example.com', 'password': 'hunter22'}).json()['access_token']
+    return {'Authorization': f'Bearer {token}'}
+
+
+def test_verified_tokens_and_profiles_are_cached(client, test_db, monkeypatch):
+    headers = _login(client)
+    decodes = []
+    real_decode = auth_utils.decode_access_token
+    monkeypatch.setattr(auth_utils, 'decode_access_token', lambda t: decodes.append(t) or real_decode(t))
+
+    test_db.statements.clear()
+    for _ in range(3):
+        resp = client.get('/auth/me', headers=headers)
+        assert resp.status_code == 200
+        assert resp.json()['role'] == 'user'
+    assert len(decodes) == 1
+    # Login warmed the profile cache
+    assert not any('FROM users' in s for s in test_db.statements)
+
+    assert client.get('/auth/me', headers={'Authorization': 'Bearer not-a-token'}).status_code == 401
+    assert client.get('/auth/me').status_code == 403
+
+
+def test_cached_payload_expires_with_token():
+    cache = token_cache.ExpiringLRU(2)
+    cache.put('a', {'sub': 'a'}, time.time() + 0.05)
+    cache.put('b', {'sub': 'b'}, time.time() - 1)
+    assert cache.get('a') == {'sub': 'a'}
+    assert cache.get('b') is None
+    time.sleep(0.06)
+    assert cache.get('a') is None
+
+    for key in 'xyz':
+        cache.put(key, {}, time.time() + 60)
+    assert cache.get('x') is None and cache.get('z') == {}
+
+
+def test_logout_revokes_token_in_every_process(client, test_db):
+    headers = _login(client)
+    assert client.get('/auth/me', headers=headers).status_code == 200
+    assert client.post('/auth/logout', headers=headers).status_code == 204
+    assert client.get('/auth/me', headers=headers).status_code == 401
+
+    # Another process learns about the revocation from the table
+    other = token_cache.RevocationList()
+    jti = auth_utils.decode_access_token(headers['Authorization'].split()[1])['jti']
+    with test_db.Session() as db:
+        assert other.is_revoked(db, jti)
+        assert not other.is_revoked(db, 'some-other-jti')
@@ -0,0 +1,111 @@
+# /ewaste/bulk stores a whole batch in one transaction and reports every row.
+import asyncio
+import json
+
+import httpx
+from sqlalchemy import func, select
+
+from main import app
+from models.analysis_job_model import AnalysisJob
+from models.stored_file_model import StoredFile
+from repositories.analytics_repository import analytics_summary, rebuild_counters
+from utils.rate_limit import BULK_ITEM_BYTES
+
+
+ITEMS = [
+    {'user_id': 1, 'category': 'consumer', 'product_name': 'Phone', 'is_working': True, 'price': 100},
+    {'user_id': 1, 'category': 'utility', 'product_name': 'Fridge', 'is_working': False, 'price': 999},
+    {'user_id': 1, 'category': 'consumer', 'is_working': True},               # no price
+    {'user_id': 42, 'category': 'consumer', 'is_working': False},             # unknown user
+    {'category': 'consumer', 'is_working': False},                             # no user_id
+]
+
+
+def test_json_batch_inserts_valid_rows_in_one_statement(client, test_db):
+    test_db.statements.clear()
+    resp = client.post('/ewaste/bulk', json=ITEMS)
+    assert resp.status_code == 200, resp.text
+    body = resp.json()
+    assert (body['created'], body['failed']) == (2, 3)
+    assert [r['status'] for r in body['results']] == ['created', 'created', 'error', 'error', 'error']
+    assert body['results'][1]['tag'] == 'recycle'
+    assert body['results'][2]['errors'] == ['price: required for working items']
+    assert body['results'][3]['errors'] == ['user_id: no user 42']
+    assert body['results'][4]['errors'][0].startswith('user_id:')
+    assert sum(s.startswith('INSERT INTO ewaste_items') for s in test_db.statements) == 1
+
+    items = client.get('/ewaste/filter').json()
+    assert [i['id'] for i in items] == [r['id'] for r in body['results'][:2]]
+    assert items[1]['price'] is None  # non-working items carry no price
+
+    with test_db.Session() as db:
+        summary = analytics_summary(db)
+        rebuild_counters(db)
+        assert analytics_summary(db) == summary
+    assert summary['total'] == 2 and summary['price_by_tag']['reuse'] == 100
+
+
+def test_ndjson_reports_bad_lines(client):
+    lines = [json.dumps(ITEMS[0]), '{not json', json.dumps(ITEMS[1])]
+    resp = client.post('/ewaste/bulk', content='\n'.join(lines) + '\n',
+                       headers={'Content-Type': 'application/x-ndjson'})
+    body = resp.json()
+    assert [r['status'] for r in body['results']] == ['created', 'error', 'created']
+    assert body['results'][1]['errors'][0].startswith('invalid JSON')
+
+
+def test_multipart_batch_with_images_queues_analysis(client, test_db):
+    items = [
+        {'user_id': 1, 'category': 'consumer', 'is_working': False, 'image': 'a.jpg'},
+        {'user_id': 1, 'category': 'consumer', 'is_working': False, 'image': 'a.jpg'},
+        {'user_id': 1, 'category': 'consumer', 'is_working': True, 'price': 5, 'image': 'b.jpg'},
+        {'user_id': 1, 'category': 'consumer', 'is_working': False, 'image': 'missing.jpg'},
+    ]
+    files = [('images', ('a.jpg', b'first photo', 'image/jpeg')), ('images', ('b.jpg', b'second photo', 'image/jpeg'))]
+    resp = client.post('/ewaste/bulk', data={'items': json.dumps(items)}, files=files)
+    assert resp.status_code == 200, resp.text
+    results = resp.json()['results']
+    assert [r['analysis_status'] for r in results[:3]] == ['pending', 'pending', None]
+    assert results[3]['errors'] == ["image: no uploaded file named 'missing.jpg'"]
+
+    with test_db.Session() as db:
+        assert db.scalar(select(func.count(AnalysisJob.id))) == 2
+        refcounts = sorted(db.scalars(select(StoredFile.refcount)))
+    assert refcounts == [1, 2]
+
+
+def test_rejects_unparseable_or_oversized_batches(client, monkeypatch):
+    import routers.ewaste
+
+    assert client.post('/ewaste/bulk', content='[1, 2', headers={'Content-Type': 'application/json'}).status_code == 400
+    monkeypatch.setattr(routers.ewaste, 'BULK_MAX_ITEMS', 1)
+    assert client.post('/ewaste/bulk', json=ITEMS[:2]).status_code == 413
+
+
+def test_oversized_batch_is_refused_while_it_arrives(client, monkeypatch):
+    import routers.ewaste
+
+    monkeypatch.setattr(routers.ewaste, 'BULK_MAX_ITEMS', 2)
+    line = json.dumps(ITEMS[0]).encode() + b'\n'
+
+    async def scenario():
+        sent = []
+
+        async def ndjson():
+            # Endless unless the server stops reading
+            while len(sent) < 100_000:
+                sent.append(len(line))
+                yield line
+
+        headers = {'Content-Type': 'application/x-ndjson'}
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://test') as http:
+            declared = await http.post('/ewaste/bulk', content=ndjson(), headers={**headers, 'Content-Length': '10000000'})
+            declared_sent = sum(sent)
+            sent.clear()
+            streamed = await http.post('/ewaste/bulk', content=ndjson(), headers=headers)
+        return declared, declared_sent, streamed, sum(sent)
+
+    declared, declared_sent, streamed, streamed_sent = asyncio.run(scenario())
+    assert declared.status_code == 413 and declared_sent == 0
+    assert streamed.status_code == 413 and streamed_sent <= 2 * BULK_ITEM_BYTES + len(line)
+    assert client.get('/ewaste/analytics').json()['total'] == 0
@@ -0,0 +1,128 @@
+# Shared fixtures: each test gets its own throwaway SQLite database wired into the app
+import asyncio
+import os
+import tempfile
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///./ewaste_test.db')
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from database import async_db_dependency, engine, get_async_db, get_db, make_async_engine, make_engine
+from main import app
+from migrations import run_migrations
+from models.user_model import User
+from utils.auth_utils import create_access_token
+from utils.events import event_bus
+from utils.rate_limit import analysis_backlog, upload_limiter
+from utils.response_cache import response_cache
+from utils.token_cache import revocations
+
+
+# The app migrates in its lifespan, which TestClient(app) without `with` does not run.
+# Done at import rather than in a fixture: smoke_test.py calls the API while it is collected.
+run_migrations(engine)
+
+
+class TestDatabase:
+    def __init__(self, path):
+        self.engine = make_engine(f"sqlite:///{path}")
+        self.Session = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.statements = []
+        event.listen(self.engine, "before_cursor_execute", self._record)
+        # Async endpoints get an AsyncSession when aiosqlite is installed, else the sync fallback
+        self.async_engine = make_async_engine(f"sqlite:///{path}")
+        AsyncSession = None
+        if self.async_engine is not None:
+            event.listen(self.async_engine.sync_engine, "before_cursor_execute", self._record)
+            AsyncSession = async_sessionmaker(self.async_engine, autoflush=False)
+        self.get_async_db = async_db_dependency(AsyncSession, self.Session)
+        run_migrations(self.engine)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def get_db(self):
+        db = self.Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+
+@pytest.fixture
+def test_db():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        database = TestDatabase(os.path.join(tmpdir, 'test.db'))
+        app.dependency_overrides[get_db] = database.get_db
+        app.dependency_overrides[get_async_db] = database.get_async_db
+        # Cached responses, buffered events and rate-limit state belong to the previous test
+        response_cache.clear()
+        event_bus.clear()
+        upload_limiter.clear()
+        analysis_backlog.clear()
+        revocations.clear()
+        try:
+            yield database
+        finally:
+            app.dependency_overrides.pop(get_db, None)
+            app.dependency_overrides.pop(get_async_db, None)
+            database.engine.dispose()
+            if database.async_engine is not None:
+                asyncio.run(database.async_engine.dispose())
+
+
+@pytest.fixture
+def local_storage(tmp_path, monkeypatch):
+    """Point uploads at a temporary LocalStorage."""
+    import utils.storage
+
+    storage = utils.storage.LocalStorage(str(tmp_path / 'uploads'))
+    monkeypatch.setattr(utils.storage, '_storage', storage)
+    return storage
+
+
+@pytest.fixture
+def client(test_db, local_storage):
+    """TestClient for the app, with user 1 (Seller, seller@example.com, phone 555) in the database."""
+    with test_db.Session() as db:
+        db.add(User(name='Seller', email='seller@example.com', password='x', phone='555'))
+        db.commit()
+    return TestClient(app)
+
+
+@pytest.fixture
+def auth_client(client):
+    """Like `client`, but every request carries a bearer token for user 1."""
+    token = create_access_token({'sub': 'seller@example.com', 'user_id': 1})
+    return TestClient(app, headers={'Authorization': f'Bearer {token}'})
+
+
+ITEM_FORM = {'user_id': '1', 'category': 'consumer', 'product_name': 'Phone', 'is_working': 'true', 'price': '500'}
+
+
+@pytest.fixture
+def add_item(client):
+    """POST /ewaste/add: a working Phone for 500 from user 1, with form fields overridden by keyword.
+
+    A field set to None is left out, and a broken item (is_working=False) is
+    sent without a price unless one is given. `image` is the photo's bytes;
+    `via` another client to send it with. The response must have `status`
+    (None: any) and is returned.
+    """
+
+    def add(image=None, via=None, headers=None, status=200, **fields):
+        form = {**ITEM_FORM, **fields}
+        if form['is_working'] in (False, 'false') and 'price' not in fields:
+            del form['price']
+        form = {k: str(v).lower() if isinstance(v, bool) else str(v) for k, v in form.items() if v is not None}
+        files = {'image': ('item.jpg', image, 'image/jpeg')} if image is not None else None
+        resp = (via or client).post('/ewaste/add', data=form, files=files, headers=headers)
+        if status is not None:
+            assert resp.status_code == status, resp.text
+        return resp
+
+    return add
@@ -0,0 +1,83 @@
+# The engine factory tunes SQLite per connection (WAL, synchronous, mmap) and pools server databases;
+# routers run on an AsyncSession when an async driver is installed, else on the sync fallback.
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+import database
+from database import make_engine
+from main import app
+
+
+def test_sqlite_connections_get_pragmas(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == 'wal'
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert conn.execute(text("PRAGMA mmap_size")).scalar() == database.SQLITE_MMAP_SIZE
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == database.SQLITE_BUSY_TIMEOUT_MS
+    assert engine.pool.size() == database.DB_POOL_SIZE
+    engine.dispose()
+
+
+def test_readers_are_not_blocked_by_an_open_write(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE t (x INTEGER)"))
+        conn.execute(text("INSERT INTO t VALUES (1)"))
+
+    writing, done = threading.Event(), threading.Event()
+
+    def writer():
+        with engine.begin() as conn:
+            conn.execute(text("INSERT INTO t VALUES (2)"))
+            writing.set()
+            done.wait(5)
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    writing.wait(5)
+    try:
+        # With the rollback journal this read would wait for the writer's lock
+        with engine.connect() as conn:
+            assert conn.execute(text("SELECT count(*) FROM t")).scalar() == 1
+    finally:
+        done.set()
+        thread.join()
+    engine.dispose()
+
+
+def test_in_memory_sqlite_keeps_single_connection_pool():
+    engine = make_engine("sqlite://")
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT 1")).scalar() == 1
+    engine.dispose()
+
+
+def test_postgres_engine_is_pooled():
+    pytest.importorskip('psycopg2')
+    engine = make_engine("postgresql://user:pw@localhost/ewaste")
+    assert engine.pool.size() == database.DB_POOL_SIZE
+    assert engine.pool._recycle == database.DB_POOL_RECYCLE
+    assert engine.pool._pre_ping
+
+
+@pytest.mark.parametrize('mode', ['async', 'sync fallback'])
+def test_routers_work_on_either_session(test_db, mode):
+    if mode == 'async':
+        if test_db.async_engine is None:
+            pytest.skip('aiosqlite is not installed')
+    else:
+        app.dependency_overrides[database.get_async_db] = database.async_db_dependency(None, test_db.Session)
+    client = TestClient(app)
+
+    assert client.post('/auth/register', json={'name': 'A', 'email': 'a@example.com', 'password': 'pw'}).status_code == 200
+    form = {'user_id': '1', 'category': 'consumer', 'product_name': 'Phone', 'is_working': 'true', 'price': '10'}
+    item_id = client.post('/ewaste/add', data=form).json()['id']
+    assert [r['id'] for r in client.get('/ewaste/filter?tag=reuse').json()] == [item_id]
+    assert client.get('/ewaste/all?stream=true').text.count('\n') == 1
+    assert client.get('/ewaste/analytics').json()['total'] == 1
+    assert client.delete(f'/ewaste/{item_id}').status_code == 200
+    assert client.get('/ewaste/analytics').json()['total'] == 0
@@ -0,0 +1,166 @@
+# /ewaste/events: writes publish item diffs and counters; streams resume from Last-Event-ID or are told to reload.
+import asyncio
+import io
+import json
+import threading
+
+import pytest
+from PIL import Image
+
+import routers.ewaste as ewaste_router
+import utils.analysis_worker as analysis_worker
+import utils.image_derivatives as image_derivatives
+from utils.events import EventBus, event_bus
+
+
+@pytest.fixture
+def client(client, monkeypatch):
+    # Streams end quickly so TestClient gets the whole body
+    monkeypatch.setattr(ewaste_router, 'EVENTS_STREAM_SECONDS', 0.2)
+    return client
+
+
+def _jpeg():
+    buf = io.BytesIO()
+    Image.new('RGB', (64, 48), (20, 120, 40)).save(buf, 'JPEG')
+    return buf.getvalue()
+
+
+def _parse(body: str) -> list[dict]:
+    events = []
+    for block in body.split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines() if line and not line.startswith((':', 'retry')))
+        if fields:
+            events.append({'id': fields['id'], 'type': fields['event'], 'data': json.loads(fields['data'])})
+    return events
+
+
+def _stream(client, headers=None, **params) -> list[dict]:
+    resp = client.get('/ewaste/events', params=params, headers=headers or {})
+    assert resp.status_code == 200, resp.text
+    assert resp.headers['content-type'].startswith('text/event-stream')
+    return _parse(resp.text)
+
+
+def test_writes_publish_diffs_and_counters(client, add_item):
+    ready = _stream(client)
+    assert [e['type'] for e in ready] == ['ready']
+
+    phone = add_item(price=800).json()['id']
+    add_item(product_name='Radio', is_working=False)
+    assert client.delete(f'/ewaste/{phone}').status_code == 200
+
+    events = _stream(client, last_event_id=ready[0]['id'])
+    assert [e['type'] for e in events] == ['item.created', 'counters'] * 2 + ['item.deleted', 'counters']
+    item = events[0]['data']['items'][0]
+    assert item['product_name'] == 'Phone' and item['tag'] == 'reuse' and item['price'] == 800
+    assert item['user_name'] == 'Seller' and item['user_phone'] == '555'
+    assert events[4]['data'] == {'ids': [phone]}
+    assert [e['data']['total'] for e in events if e['type'] == 'counters'] == [1, 2, 1]
+    assert {**events[-1]['data'], 'all_items': []} == client.get('/ewaste/analytics').json()
+
+    # Resuming from the middle (header form, as EventSource sends it) replays only the rest
+    rest = _stream(client, headers={'Last-Event-ID': events[3]['id']})
+    assert [e['id'] for e in rest] == [e['id'] for e in events[4:]]
+    assert [e['type'] for e in _stream(client, types='counters', last_event_id=ready[0]['id'])] == ['counters'] * 3
+
+    resp = client.post('/ewaste/bulk', json=[
+        {'user_id': 1, 'category': 'utility', 'product_name': 'Fridge', 'is_working': False},
+        {'user_id': 1, 'category': 'utility', 'product_name': 'Heater', 'is_working': False},
+    ])
+    assert resp.status_code == 200
+    created = _stream(client, last_event_id=events[-1]['id'])
+    assert [r['product_name'] for r in created[0]['data']['items']] == ['Fridge', 'Heater']
+    assert created[1]['data']['total'] == 3
+
+
+def test_finished_analysis_publishes_the_updated_item(client, add_item, test_db):
+    start = _stream(client)[0]['id']
+    item_id = add_item(product_name='Dead Phone', is_working=False, image=b'not really a jpeg').json()['id']
+    pool = analysis_worker.AnalysisWorkerPool(session_factory=test_db.Session, workers=1)
+    assert asyncio.run(pool.run_once()) is True
+
+    updated = [e for e in _stream(client, last_event_id=start) if e['type'] == 'item.updated']
+    assert len(updated) == 1
+    row = updated[0]['data']['items'][0]
+    assert row['id'] == item_id and row['analysis_status'] == 'done' and row['gemini_analysis']['source'] == 'stub'
+
+
+def test_unknown_or_stale_ids_get_a_reset(client, add_item):
+    add_item()
+    assert [e['type'] for e in _stream(client, last_event_id='other.3')] == ['reset']
+    reset = _stream(client, last_event_id=f'{event_bus.epoch}.99')
+    assert reset[0]['data'] == {'reason': 'stale_id'} and reset[0]['id'] == event_bus.last_id
+    assert client.get('/ewaste/events', params={'types': 'counters,nope'}).status_code == 400
+
+
+def test_writes_skip_the_feed_queries_until_someone_listens(client, add_item, monkeypatch):
+    snapshots = []
+    real = ewaste_router._feed_snapshot
+    monkeypatch.setattr(ewaste_router, '_feed_snapshot', lambda *args: snapshots.append(args) or real(*args))
+    before = event_bus.last_id
+
+    add_item()
+    assert snapshots == []
+    # The skipped write leaves a gap, so an id from before it cannot be resumed
+    assert [e['type'] for e in _stream(client, last_event_id=before)] == ['reset']
+
+    # The stream just closed, and its client may reconnect and resume
+    add_item(product_name='Radio')
+    assert len(snapshots) == 1
+
+
+def test_background_updates_skip_the_row_query_until_someone_listens(client, add_item, test_db, monkeypatch):
+    queried = []
+
+    def counting(module):
+        real = module.changed_items
+        monkeypatch.setattr(module, 'changed_items', lambda db, ids: queried.append(module.__name__) or real(db, ids))
+
+    counting(analysis_worker)
+    counting(image_derivatives)
+    pool = analysis_worker.AnalysisWorkerPool(session_factory=test_db.Session, workers=1)
+
+    # Image variants (a background task of the upload) and the analysis both finish unheard
+    add_item(is_working=False, image=_jpeg())
+    assert asyncio.run(pool.run_once()) is True
+    assert queried == []
+
+    start = _stream(client)[0]['id']
+    add_item(is_working=False, image=_jpeg(), product_name='Radio')
+    assert asyncio.run(pool.run_once()) is True
+    assert sorted(queried) == ['utils.analysis_worker', 'utils.image_derivatives']
+    assert [e['type'] for e in _stream(client, last_event_id=start)].count('item.updated') == 2
+
+
+def test_bus_buffer_and_slow_subscribers():
+    async def run():
+        bus = EventBus(buffer_size=3, max_queued=2)
+        first = bus.last_id
+        for n in range(5):
+            bus.publish('counters', {'total': n})
+        # Only the last three are buffered
+        assert (await bus.subscribe(first).queue.get()).type == 'reset'
+        resumed = bus.subscribe(f'{bus.epoch}.3')
+        assert [resumed.queue.get_nowait().id for _ in range(2)] == [f'{bus.epoch}.4', f'{bus.epoch}.5']
+
+        # A subscriber more than max_queued behind is told to reload, not sent the backlog
+        slow = bus.subscribe(f'{bus.epoch}.5')
+        for n in range(3):
+            bus.publish('counters', {'total': n})
+        assert slow.queue.qsize() == 1 and slow.queue.get_nowait().type == 'reset'
+
+        # Publishes from other threads are numbered and delivered on the loop, in order
+        live = bus.subscribe(bus.last_id, {'item.deleted'})
+        threads = [threading.Thread(target=bus.publish, args=('item.deleted', {'ids': [i]})) for i in range(2)]
+        for thread in threads:
+            thread.start()
+            thread.join()
+        got = [await asyncio.wait_for(live.queue.get(), 1) for _ in range(2)]
+        assert [e.id for e in got] == [f'{bus.epoch}.9', f'{bus.epoch}.10']
+        assert [json.loads(e.message.split(b'data: ')[1])['ids'] for e in got] == [[0], [1]]
+        assert bus.subscriber_count() == 4
+        for subscription in (resumed, slow, live):
+            bus.unsubscribe(subscription)
+
+    asyncio.run(run())
@@ -0,0 +1,63 @@
+# Concurrent analyses of the same image share one upstream call through the pooled client.
+import asyncio
+import io
+
+import httpx
+
+import utils.gemini_api as gemini_api
+from utils.analysis_cache import AnalysisCache
+from utils.storage import url_for
+
+
+def test_concurrent_requests_for_same_image_are_coalesced(test_db, local_storage, monkeypatch):
+    calls = []
+
+    async def upstream(request):
+        calls.append(request)
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json={'components': [{'name': 'gold', 'confidence': 0.9}]})
+
+    monkeypatch.setattr(gemini_api, 'GEMINI_API_KEY', 'test-key')
+    monkeypatch.setattr(gemini_api, 'analysis_cache', AnalysisCache())
+    image = url_for(local_storage.save_stream(io.BytesIO(b'circuit board'), '.jpg', 1024).key)
+    other = url_for(local_storage.save_stream(io.BytesIO(b'something else'), '.jpg', 1024).key)
+
+    async def run():
+        gemini_api._client = httpx.AsyncClient(transport=httpx.MockTransport(upstream))
+        gemini_api._semaphore = asyncio.Semaphore(2)
+        try:
+            return await asyncio.gather(
+                *[gemini_api.analyze_image_async(image, test_db.Session) for _ in range(5)],
+                gemini_api.analyze_image_async(other, test_db.Session),
+            )
+        finally:
+            await gemini_api.close_client()
+
+    results = asyncio.run(run())
+    assert len(calls) == 2
+    assert all(r['source'] == 'gemini' and r['recyclable_components'][0]['name'] == 'gold' for r in results)
+    assert calls[0].headers['Authorization'] == 'Bearer test-key'
+    assert not gemini_api._inflight
+
+
+def test_waiters_fail_instead_of_hanging_when_the_leader_is_cancelled(monkeypatch):
+    started = asyncio.Event()
+
+    async def upstream(filename, content):
+        started.set()
+        await asyncio.sleep(10)
+
+    monkeypatch.setattr(gemini_api, '_call_upstream', upstream)
+
+    async def run():
+        leader = asyncio.create_task(gemini_api._coalesced('k', 'a.jpg', b'a'))
+        await started.wait()
+        waiter = asyncio.create_task(gemini_api._coalesced('k', 'a.jpg', b'a'))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await asyncio.wait_for(asyncio.gather(leader, waiter, return_exceptions=True), 1)
+
+    leader, waiter = asyncio.run(run())
+    assert isinstance(leader, asyncio.CancelledError)
+    assert isinstance(waiter, RuntimeError)
+    assert not gemini_api._inflight
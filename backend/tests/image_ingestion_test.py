@@ -0,0 +1,111 @@
+# Uploads are streamed to disk under a size cap and get WebP thumbnail/display variants.
+import io
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+import utils.image_handler as image_handler
+from main import app
+
+
+def _jpeg(width, height):
+    buf = io.BytesIO()
+    Image.new('RGB', (width, height), (20, 120, 40)).save(buf, 'JPEG')
+    return buf.getvalue()
+
+
+def test_upload_gets_webp_variants(client, add_item, local_storage):
+    add_item(image=_jpeg(3000, 2000))
+
+    item = client.get('/ewaste/reusable').json()[0]
+    assert item['thumbnail_path'].endswith('.thumbnail.webp')
+    assert item['display_path'].endswith('.display.webp')
+    with Image.open(local_storage.local_path(item['thumbnail_path'][len('/uploads/'):])) as thumb:
+        assert thumb.format == 'WEBP' and max(thumb.size) == 400
+    with Image.open(local_storage.local_path(item['display_path'][len('/uploads/'):])) as display:
+        assert max(display.size) == 1280
+
+
+def test_oversized_upload_is_rejected(add_item, local_storage, monkeypatch):
+    monkeypatch.setattr(image_handler, 'MAX_UPLOAD_BYTES', 1024)
+    add_item(image=b'x' * 4096, status=413)
+    assert not any(files for _, _, files in os.walk(local_storage.root))
+
+
+def test_duplicate_uploads_share_one_file_until_last_delete(client, add_item, local_storage):
+    content = _jpeg(640, 480)
+    first = add_item(image=content).json()
+    second = add_item(image=content).json()
+    assert first['image_path'] == second['image_path']
+    key = first['image_path'][len('/uploads/'):]
+    digest = key.rsplit('/', 1)[-1].split('.')[0]
+    assert key == f"{digest[:2]}/{digest[2:4]}/{digest}.jpg"
+
+    served = client.get(first['image_path'])
+    assert served.status_code == 200 and served.content == content
+
+    client.delete(f"/ewaste/{first['id']}")
+    assert local_storage.exists(key)
+    client.delete(f"/ewaste/{second['id']}")
+    assert not local_storage.exists(key)
+    assert client.get(first['image_path']).status_code == 404
+
+
+def test_failed_blob_delete_keeps_the_item_and_its_reference(client, add_item, local_storage, monkeypatch):
+    item = add_item(image=_jpeg(640, 480)).json()
+    key = item['image_path'][len('/uploads/'):]
+
+    def broken(key):
+        raise OSError('disk gone')
+
+    with monkeypatch.context() as m, pytest.raises(OSError):
+        m.setattr(local_storage, 'delete_with_variants', broken)
+        client.delete(f"/ewaste/{item['id']}")
+
+    # Blob delete and refcount drop commit together, so the item is still there and still owns the file
+    assert client.get(f"/ewaste/{item['id']}/analysis").status_code == 200
+    assert client.delete(f"/ewaste/{item['id']}").status_code == 200
+    assert not local_storage.exists(key)
+
+
+def test_upload_racing_the_last_delete_keeps_its_file(client, add_item, local_storage, monkeypatch):
+    import routers.ewaste as ewaste
+
+    content = _jpeg(640, 480)
+    first = add_item(image=content).json()
+    save_image = ewaste.save_image
+
+    def save_then_delete(file):
+        # The same bytes are already stored, so this upload keeps that copy; then the
+        # last item using it is deleted before the new item takes its reference
+        stored = save_image(file)
+        assert TestClient(app).delete(f"/ewaste/{first['id']}").status_code == 200
+        return stored
+
+    monkeypatch.setattr(ewaste, 'save_image', save_then_delete)
+    second = add_item(image=content).json()
+
+    assert second['image_path'] == first['image_path']
+    served = client.get(second['image_path'])
+    assert served.status_code == 200 and served.content == content
+
+
+def test_failed_insert_discards_its_upload(client, add_item, local_storage, monkeypatch):
+    import routers.ewaste as ewaste
+
+    kept = add_item(image=_jpeg(640, 480)).json()
+
+    def broken(db, item):
+        raise RuntimeError('index unavailable')
+
+    monkeypatch.setattr(ewaste, 'index_item', broken)
+    with pytest.raises(RuntimeError):
+        add_item(image=_jpeg(320, 240))
+    with pytest.raises(RuntimeError):
+        add_item(image=_jpeg(640, 480))
+
+    # The new photo is gone; the one an existing item uses stays
+    stored = [os.path.join(d, f) for d, _, files in os.walk(local_storage.root) for f in files]
+    assert [path for path in stored if not path.endswith('.webp')] == [local_storage.local_path(kept['image_path'][len('/uploads/'):])]
@@ -0,0 +1,73 @@
+# Load-test harness: seeded data is consistent and reproducible, every scripted request succeeds, regressions are flagged.
+import asyncio
+
+import httpx
+from sqlalchemy import func, select
+from sqlalchemy.pool import StaticPool
+
+import utils.auth_utils as auth_utils
+from benchmarks import load_test, synthetic
+from database import make_engine
+from main import app
+from migrations import run_migrations
+from models.ewaste_model import EwasteItem
+from models.stored_file_model import StoredFile
+from repositories.analytics_repository import analytics_summary
+from repositories.search_repository import search_items
+
+
+def test_seed_is_consistent(test_db, local_storage):
+    ctx = synthetic.seed(test_db.engine, 30, 400, images=3, log=None)
+    assert ctx['last_item_id'] - ctx['first_item_id'] == 399
+    with test_db.Session() as db:
+        items = db.execute(select(EwasteItem)).scalars().all()
+        assert all((i.tag == 'reuse') == i.is_working and (i.price is not None) == i.is_working for i in items)
+        # Counters, search index and stored-file refcounts agree with the rows
+        assert analytics_summary(db)['total'] == 400
+        assert search_items(db, 'laptop', None, None, None, None, None, 1, 0, 5)['total'] == \
+            sum('Laptop' in i.product_name for i in items)
+        with_image = sum(i.image_path is not None for i in items)
+        assert db.scalar(select(func.sum(StoredFile.refcount))) == with_image
+        assert all(local_storage.exists(key) for key in ctx['image_keys'])
+
+
+def test_seed_is_reproducible():
+    def seeded_items():
+        engine = make_engine('sqlite://', poolclass=StaticPool)
+        run_migrations(engine)
+        synthetic.seed(engine, 10, 300, images=0, log=None)
+        with engine.connect() as conn:
+            return conn.execute(select(EwasteItem.product_name, EwasteItem.price, EwasteItem.user_id)).all()
+
+    assert seeded_items() == seeded_items()
+
+
+def test_every_scripted_request_succeeds(test_db, local_storage, monkeypatch):
+    monkeypatch.setattr(auth_utils, 'BCRYPT_ROUNDS', 4)
+    ctx = synthetic.seed(test_db.engine, 20, 200, images=2, log=None)
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://load', timeout=30) as client:
+            return await load_test.drive(client, ctx, requests=3, concurrency=2)
+
+    results = asyncio.run(run())
+    assert set(results) == {e.name for e in load_test.ENDPOINTS} | {'mixed reads'}
+    assert {name: r['errors'] for name, r in results.items() if r['errors']} == {}
+
+
+def _report(p95, rps, errors=0, rss=100.0):
+    return {'meta': {'concurrency': 10},
+            'modes': {'asgi': {'peak_rss_mb': rss, 'endpoints': {'GET /': {'p95': p95, 'rps': rps, 'errors': errors}}}}}
+
+
+def test_compare_flags_regressions_past_the_threshold():
+    base = _report(p95=40.0, rps=250.0)
+    assert load_test.compare(base, _report(p95=45.0, rps=230.0), 0.25, 2.0) == []
+    # Past the threshold, but a sub-millisecond endpoint only counts once the slowdown is real
+    assert load_test.compare(_report(p95=0.5, rps=20_000), _report(p95=0.9, rps=12_000), 0.25, 2.0) == []
+
+    regressions = load_test.compare(base, _report(p95=80.0, rps=120.0, errors=2, rss=160.0), 0.25, 2.0)
+    assert len(regressions) == 4
+    assert any('p95 80.00 ms' in r for r in regressions)
+    assert any('peak RSS' in r for r in regressions)
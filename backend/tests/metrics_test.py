@@ -0,0 +1,80 @@
+# /metrics: per-route latency, SQL per request, Gemini outcomes and upload bytes; opt-in slow-request log.
+import asyncio
+import logging
+import os
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+import utils.analysis_worker as analysis_worker
+from main import app
+from models.user_model import User
+from utils import metrics
+
+
+def _sample(body, line_start):
+    """Value of the first exposition line starting with line_start."""
+    for line in body.splitlines():
+        if line.startswith(line_start):
+            return float(line.rsplit(' ', 1)[1])
+    return 0.0
+
+
+def test_metrics_cover_requests_sql_uploads_and_analysis(test_db, local_storage):
+    with test_db.Session() as db:
+        db.add(User(name='Seller', email='seller@example.com', password='x'))
+        db.commit()
+    client = TestClient(app)
+    before = client.get('/metrics').text
+
+    form = {'user_id': '1', 'category': 'consumer', 'is_working': 'false'}
+    item_id = client.post('/ewaste/add', data=form, files={'image': ('a.jpg', os.urandom(1000), 'image/jpeg')}).json()['id']
+    client.get(f'/ewaste/{item_id}/analysis')
+    client.get('/no/such/path')
+    asyncio.run(analysis_worker.AnalysisWorkerPool(session_factory=test_db.Session, workers=1).run_once())
+
+    resp = client.get('/metrics')
+    assert resp.headers['content-type'].startswith('text/plain; version=0.0.4')
+    body = resp.text
+
+    def delta(line_start):
+        return _sample(body, line_start) - _sample(before, line_start)
+
+    # Labelled by route template, not by the concrete path
+    assert delta('http_requests_total{method="GET",route="/ewaste/{item_id}/analysis",status="200"}') == 1
+    assert delta('http_requests_total{method="GET",route="unmatched",status="404"}') == 1
+    assert delta('http_request_duration_seconds_count{method="POST",route="/ewaste/add"}') == 1
+    assert delta('http_request_db_statements_bucket{route="/ewaste/{item_id}/analysis",le="1"}') == 1
+    assert delta('db_statements_total') > 0
+    assert delta('upload_files_saved_total') == 1 and delta('upload_bytes_written_total') == 1000
+    # Fresh bytes, so the shared analysis cache cannot answer instead
+    assert delta('gemini_calls_total{outcome="stub"}') == 1
+
+
+def test_slow_requests_are_logged_with_their_sql(test_db, caplog):
+    slow_app = FastAPI()
+
+    @slow_app.get('/report')
+    def report():
+        with test_db.engine.connect() as conn:
+            conn.execute(text('SELECT 42'))
+        return {}
+
+    slow_app.add_middleware(metrics.MetricsMiddleware, slow_request_ms=0.001)
+    with caplog.at_level(logging.WARNING, logger='ewaste.slow_requests'):
+        assert TestClient(slow_app).get('/report?x=1').status_code == 200
+    [record] = caplog.records
+    assert 'GET /report?x=1 -> 200' in record.getMessage()
+    assert '1 SQL statements' in record.getMessage() and 'SELECT 42' in record.getMessage()
+
+
+def test_histogram_exposition():
+    hist = metrics.Histogram('t_seconds', 'test', ('route',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3):
+        hist.observe(value, route='/x')
+    lines = hist.render()
+    assert 't_seconds_bucket{route="/x",le="0.1"} 2' in lines
+    assert 't_seconds_bucket{route="/x",le="1"} 3' in lines
+    assert 't_seconds_bucket{route="/x",le="+Inf"} 4' in lines
+    assert 't_seconds_count{route="/x"} 4' in lines
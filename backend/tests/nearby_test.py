@@ -0,0 +1,111 @@
+# /ewaste/nearby: k nearest located items within a radius via the R*Tree, kept in sync on writes.
+import random
+
+import pytest
+from sqlalchemy import event, insert
+
+from models.ewaste_model import EwasteItem
+from models.user_model import User
+from repositories.geo_repository import bounding_box, haversine_km, index_locations, nearby_items
+
+# Around Bengaluru: (name, latitude, longitude, working)
+PLACES = [
+    ('Indiranagar TV', 12.9719, 77.6412, False),
+    ('Koramangala Fridge', 12.9352, 77.6245, False),
+    ('Whitefield Laptop', 12.9698, 77.7500, False),
+    ('MG Road Phone', 12.9756, 77.6050, True),
+    ('Mysuru Printer', 12.2958, 76.6394, False),
+]
+CENTER = (12.9716, 77.5946)  # Bengaluru city centre
+
+
+@pytest.fixture
+def client(client, add_item):
+    for name, lat, lon, working in PLACES:
+        add_item(product_name=name, is_working=working, latitude=lat, longitude=lon)
+    add_item(product_name='Nowhere', is_working=False)
+    return client
+
+
+def _nearby(client, **params):
+    resp = client.get('/ewaste/nearby', params={'lat': CENTER[0], 'lon': CENTER[1], **params})
+    assert resp.status_code == 200, resp.text
+    return resp.json()
+
+
+def test_nearest_recyclable_items_within_radius(client):
+    body = _nearby(client, radius_km=25)
+    # The working phone is for reuse, and Mysuru is ~130 km away
+    assert [r['product_name'] for r in body] == ['Indiranagar TV', 'Koramangala Fridge', 'Whitefield Laptop']
+    assert body[0]['distance_km'] == pytest.approx(haversine_km(*CENTER, 12.9719, 77.6412), abs=1e-3)
+    assert body[0]['latitude'] == 12.9719 and body[0]['tag'] == 'recycle'
+
+    assert [r['product_name'] for r in _nearby(client, radius_km=25, k=2)] == ['Indiranagar TV', 'Koramangala Fridge']
+    assert len(_nearby(client, radius_km=200)) == 4
+    assert [r['product_name'] for r in _nearby(client, radius_km=5.1, tag='')] == ['MG Road Phone', 'Indiranagar TV']
+
+
+def test_index_follows_bulk_inserts_and_deletes(client):
+    resp = client.post('/ewaste/bulk', json=[
+        {'user_id': 1, 'category': 'utility', 'product_name': 'Cubbon Park Heater', 'is_working': False,
+         'latitude': 12.9763, 'longitude': 77.5929},
+        {'user_id': 1, 'category': 'utility', 'is_working': False, 'latitude': 12.9},
+    ])
+    results = resp.json()['results']
+    assert results[1]['errors'] == ['latitude, longitude: send both or neither']
+    assert _nearby(client, radius_km=25)[0]['id'] == results[0]['id']
+
+    nearest = _nearby(client, radius_km=25)
+    assert client.delete(f"/ewaste/{nearest[0]['id']}").status_code == 200
+    assert _nearby(client, radius_km=25)[0]['id'] == nearest[1]['id']
+
+
+def test_rejects_partial_or_invalid_locations(client, add_item):
+    add_item(product_name=None, is_working=False, latitude=12.9, status=400)
+    add_item(product_name=None, is_working=False, latitude=95, longitude=10, status=422)
+    assert client.get('/ewaste/nearby', params={'lat': 12.9, 'lon': 77.6, 'radius_km': 0}).status_code == 422
+
+
+def test_bounding_box_wraps_the_antimeridian_and_poles():
+    min_lat, max_lat, ranges = bounding_box(0.0, 179.9, 50)
+    assert min_lat < 0 < max_lat and len(ranges) == 2
+    assert ranges[0][1] == 180.0 and ranges[1][0] == -180.0 and ranges[1][1] < -179.0
+    assert bounding_box(89.9, 0.0, 50)[2] == [(-180.0, 180.0)]
+
+
+def test_matches_brute_force_without_scanning_the_item_table(test_db):
+    rng = random.Random(4)
+    rows = [{'user_id': 1, 'category': 'consumer', 'is_working': False, 'tag': rng.choice(['recycle', 'reuse']),
+             'latitude': rng.uniform(12.5, 13.5), 'longitude': rng.uniform(77.0, 78.0)} for _ in range(3000)]
+    with test_db.Session() as db:
+        db.add(User(name='Seller', email='seller@example.com', password='x'))
+        ids = sorted(db.execute(insert(EwasteItem).returning(EwasteItem.id), rows).scalars())
+        index_locations(db, [{'id': i, **row} for i, row in zip(ids, rows)])
+        db.commit()
+
+        expected = sorted(
+            (haversine_km(*CENTER, row['latitude'], row['longitude']), i)
+            for i, row in zip(ids, rows) if row['tag'] == 'recycle'
+        )
+        for radius, k in ((1, 5), (15, 10), (60, 50), (200, 100)):
+            got = [r['id'] for r in nearby_items(db, *CENTER, radius, k, 'recycle')]
+            assert got == [i for d, i in expected if d <= radius][:k]
+
+        executed = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            executed.append((statement, parameters))
+
+        event.listen(test_db.engine, 'before_cursor_execute', record)
+        try:
+            nearby_items(db, *CENTER, 10, 10, 'recycle')
+        finally:
+            event.remove(test_db.engine, 'before_cursor_execute', record)
+        plans = [
+            detail
+            for statement, parameters in executed
+            for *_, detail in db.connection().exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters)
+        ]
+    # The R*Tree box query (index 2) drives the join; items are reached by primary key
+    assert any('VIRTUAL TABLE INDEX 2:' in d for d in plans)
+    assert not [d for d in plans if d.startswith('SCAN ewaste_items') or 'USING COVERING INDEX' in d]
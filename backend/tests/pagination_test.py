@@ -0,0 +1,50 @@
+# Keyset pagination and NDJSON streaming on the list endpoints.
+import json
+
+from fastapi.testclient import TestClient
+
+from main import app
+from models.ewaste_model import EwasteItem
+from models.user_model import User
+
+
+def _seed(test_db, n_items):
+    db = test_db.Session()
+    user = User(name='Pager', email='pager@example.com', password='x', phone='555')
+    db.add(user)
+    db.flush()
+    db.add_all([EwasteItem(user_id=user.id, category='consumer', product_name=f'Device {i}',
+                           is_working=True, tag='reuse', price=10 + i) for i in range(n_items)])
+    db.commit()
+    user_id = user.id
+    db.close()
+    return user_id
+
+
+def test_keyset_pages_cover_every_row(test_db):
+    user_id = _seed(test_db, 7)
+    client = TestClient(app)
+    for path in ['/ewaste/all', f'/ewaste/user/{user_id}', '/ewaste/filter?tag=reuse', '/ewaste/reusable']:
+        seen, cursor = [], None
+        while True:
+            params = {'limit': 3}
+            if cursor:
+                params['after_id'] = cursor
+            resp = client.get(path, params=params)
+            assert resp.status_code == 200, resp.text
+            seen += [row['id'] for row in resp.json()]
+            cursor = resp.headers.get('X-Next-After-Id')
+            if not cursor:
+                break
+        assert seen == sorted(seen) and len(seen) == 7, path
+
+
+def test_ndjson_stream(test_db):
+    _seed(test_db, 5)
+    client = TestClient(app)
+    resp = client.get('/ewaste/reusable', params={'stream': 'true', 'after_id': 2})
+    assert resp.status_code == 200
+    assert resp.headers['content-type'].startswith('application/x-ndjson')
+    rows = [json.loads(line) for line in resp.text.splitlines()]
+    assert [row['id'] for row in rows] == [3, 4, 5]
+    assert rows[0]['user_phone'] == '555' and rows[0]['price'] == 12
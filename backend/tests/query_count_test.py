@@ -0,0 +1,51 @@
+# Regression benchmark: SQL statements per request must not grow with row count.
+from fastapi.testclient import TestClient
+
+from main import app
+from models.ewaste_model import EwasteItem
+from models.user_model import User
+from repositories.analytics_repository import rebuild_counters
+from utils.response_cache import response_cache
+
+ENDPOINTS = ['/ewaste/all', '/ewaste/reusable', '/ewaste/analytics', '/ewaste/analytics?include_items=true']
+
+
+def _seed(test_db, n_items):
+    db = test_db.Session()
+    try:
+        start = db.query(User).count()
+        users = [User(name=f"user{start + i}", email=f"user{start + i}@example.com", password="x", phone="123")
+                 for i in range(max(1, n_items // 10))]
+        db.add_all(users)
+        db.flush()
+        db.add_all([
+            EwasteItem(user_id=users[i % len(users)].id, category="consumer" if i % 2 else "utility",
+                       product_name=f"Device {i}", is_working=bool(i % 3),
+                       tag="reuse" if i % 3 else "recycle", price=100 + i if i % 3 else None)
+            for i in range(n_items)
+        ])
+        db.commit()
+        rebuild_counters(db)
+        # Written behind the app's back, so bump the response cache version as the write paths do
+        response_cache.invalidate()
+    finally:
+        db.close()
+
+
+def _statements_for(test_db, client, path):
+    test_db.statements.clear()
+    resp = client.get(path)
+    assert resp.status_code == 200, resp.text
+    return len(test_db.statements)
+
+
+def test_statement_count_is_constant(test_db):
+    client = TestClient(app)
+    _seed(test_db, 10)
+    small = {path: _statements_for(test_db, client, path) for path in ENDPOINTS}
+    _seed(test_db, 500)
+    large = {path: _statements_for(test_db, client, path) for path in ENDPOINTS}
+
+    for path in ENDPOINTS:
+        print(f"{path}: {small[path]} statements @ 10 rows, {large[path]} @ 510 rows")
+        assert large[path] == small[path], f"{path} issues more SQL as rows grow"
@@ -0,0 +1,100 @@
+# Upload admission: per-client token buckets (429), a global concurrency limit and the analysis backlog (503).
+import asyncio
+import io
+import os
+
+import httpx
+from PIL import Image
+
+import utils.rate_limit as rate_limit
+from main import app
+from utils.rate_limit import ConcurrencyLimiter, LocalBackend, analysis_backlog, upload_limiter
+
+
+def _jpeg():
+    buf = io.BytesIO()
+    Image.new('RGB', (64, 48), (20, 120, 40)).save(buf, 'JPEG')
+    return buf.getvalue()
+
+
+def test_each_client_gets_its_own_bucket(client, auth_client, add_item, monkeypatch):
+    monkeypatch.setattr(upload_limiter, 'burst', 2)
+    assert [add_item(status=None).status_code for _ in range(3)] == [200, 200, 429]
+    refused = add_item(status=429)
+    assert refused.headers['retry-after'] == '1'
+
+    # A signed-in user is limited on their own, not with everyone behind the same IP
+    add_item(via=auth_client)
+    # A forged token falls back to the IP's bucket, which is empty
+    add_item(headers={'Authorization': 'Bearer not-a-token'}, status=429)
+    assert client.get('/ewaste/all').status_code == 200
+    assert 'admission_rejections_total{route="/ewaste/add",reason="rate_limited"}' in client.get('/metrics').text
+
+
+def test_bucket_refills_at_the_configured_rate():
+    async def scenario():
+        backend = LocalBackend()
+        assert await backend.take('ip:a', rate=1, burst=2, cost=2) == 0
+        wait = await backend.take('ip:a', rate=1, burst=2, cost=1)
+        assert 0.9 < wait <= 1
+        assert await backend.take('ip:b', rate=1, burst=2, cost=1) == 0
+
+    asyncio.run(scenario())
+
+
+def test_concurrency_limiter_queues_briefly_then_sheds():
+    async def scenario():
+        slots = ConcurrencyLimiter(limit=1, max_wait=0.05)
+        assert await slots.acquire()
+        assert not await slots.acquire()  # nothing freed within max_wait
+        waiting = asyncio.create_task(slots.acquire())
+        await asyncio.sleep(0)
+        slots.release()  # handed straight to the waiter
+        assert await waiting and slots.active == 1
+        slots.release()
+        return slots.active
+
+    assert asyncio.run(scenario()) == 0
+
+
+def test_full_analysis_backlog_refuses_uploads_that_need_analysis(add_item, monkeypatch):
+    monkeypatch.setattr(analysis_backlog, 'max_jobs', 1)
+    # No lifespan here, so no workers: queued jobs stay queued
+    add_item(is_working=False, image=_jpeg())
+    refused = add_item(is_working=False, image=_jpeg(), status=503)
+    assert refused.headers['retry-after'] == '30'
+    # Items that need no analysis still go through
+    add_item(image=_jpeg())
+
+
+def test_oversized_body_is_refused_before_it_is_read(client, local_storage, monkeypatch):
+    monkeypatch.setitem(rate_limit.BODY_LIMITS, '/ewaste/add', 256 * 1024)
+    chunk = b'x' * (64 * 1024)
+
+    async def scenario():
+        sent = []
+
+        async def body():
+            # A photo of 64 MB, unless the server stops reading
+            yield (f'--{boundary}\r\nContent-Disposition: form-data; name="image"; filename="big.jpg"\r\n'
+                   'Content-Type: image/jpeg\r\n\r\n').encode()
+            for _ in range(1024):
+                sent.append(len(chunk))
+                yield chunk
+
+        boundary = 'b' * 16
+        headers = {'Content-Type': f'multipart/form-data; boundary={boundary}'}
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://test') as http:
+            declared = await http.post('/ewaste/add', content=body(),
+                                       headers={**headers, 'Content-Length': str(64 * 1024 * 1024)})
+            declared_sent = sum(sent)
+            sent.clear()
+            chunked = await http.post('/ewaste/add', content=body(), headers=headers)
+        return declared, declared_sent, chunked, sum(sent)
+
+    declared, declared_sent, chunked, chunked_sent = asyncio.run(scenario())
+    # Refused on its Content-Length with nothing read, or once past the limit when it has none
+    assert declared.status_code == 413 and declared_sent == 0
+    assert chunked.status_code == 413 and chunked_sent <= 256 * 1024 + len(chunk)
+    assert not any(files for _, _, files in os.walk(local_storage.root))
+    assert 'admission_rejections_total{route="/ewaste/add",reason="too_large"}' in client.get('/metrics').text
@@ -0,0 +1,152 @@
+# /analytics and /reusable answer repeats from the response cache and 304s from the version counter alone.
+import asyncio
+import time
+
+import httpx
+from starlette.datastructures import QueryParams
+
+from main import app
+from utils.response_cache import RedisBackend, ResponseCache, response_cache
+
+
+def test_repeats_and_revalidations_skip_the_database(client, add_item, test_db):
+    add_item()
+    first = client.get('/ewaste/analytics')
+    assert first.json()['total'] == 1
+    etag = first.headers['etag']
+
+    test_db.statements.clear()
+    again = client.get('/ewaste/analytics')
+    assert again.content == first.content and again.headers['etag'] == etag
+    not_modified = client.get('/ewaste/analytics', headers={'If-None-Match': f'W/{etag}'})
+    assert not_modified.status_code == 304 and not_modified.content == b''
+    assert test_db.statements == []
+
+    # Different query parameters are different entries
+    assert client.get('/ewaste/analytics?include_items=true').headers['etag'] != etag
+
+
+def test_writes_invalidate(client, add_item):
+    item_id = add_item().json()['id']
+    etag = client.get('/ewaste/reusable').headers['etag']
+
+    add_item(product_name='Tablet')
+    resp = client.get('/ewaste/reusable', headers={'If-None-Match': etag})
+    assert resp.status_code == 200 and len(resp.json()) == 2
+    etag = resp.headers['etag']
+
+    client.delete(f'/ewaste/{item_id}')
+    resp = client.get('/ewaste/reusable', headers={'If-None-Match': etag})
+    assert [r['product_name'] for r in resp.json()] == ['Tablet']
+
+    client.post('/ewaste/bulk', json=[{'user_id': 1, 'category': 'utility', 'is_working': True, 'price': 5}])
+    assert client.get('/ewaste/analytics').json()['total'] == 2
+
+
+def test_cached_pages_keep_their_cursor(client, add_item):
+    ids = [add_item(product_name=f'Device {i}').json()['id'] for i in range(3)]
+    first = client.get('/ewaste/reusable?limit=2')
+    cached = client.get('/ewaste/reusable?limit=2')
+    assert cached.headers['x-next-after-id'] == first.headers['x-next-after-id'] == str(ids[1])
+    assert cached.json()[0]['user_phone'] == '555'
+
+
+class FakeRedis:
+    """The asyncio client, over a dict shared with BlockingFakeRedis."""
+
+    def __init__(self, data):
+        self.data = data
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, px=None):
+        self.data[key] = value
+
+    async def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, b'0')) + 1).encode()
+        return int(self.data[key])
+
+
+class BlockingFakeRedis:
+    """The sync client, used for bumps from worker threads."""
+
+    def __init__(self, data):
+        self.data = data
+
+    def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, b'0')) + 1).encode()
+        return int(self.data[key])
+
+
+def _redis_backend(client, sync_client):
+    backend = RedisBackend.__new__(RedisBackend)
+    backend.client, backend.sync_client = client, sync_client
+    return backend
+
+
+def test_shared_backend_is_seen_by_every_process():
+    data = {}
+    shared = _redis_backend(FakeRedis(data), BlockingFakeRedis(data))
+    a = ResponseCache(shared, version_seconds=0)
+    b = ResponseCache(shared, version_seconds=0)
+
+    async def scenario():
+        params = QueryParams('include_items=false')
+        key = a.key('analytics', params, await a.version())
+        await a.put(key, b'{"total":1}', {'x-next-after-id': '7'})
+        assert await b.get(key) == {'body': b'{"total":1}', 'headers': {'x-next-after-id': '7'}}
+        assert b.stats['shared_hits'] == 1
+
+        await a.invalidate_async()
+        moved = b.key('analytics', params, await b.version())
+        assert moved != key
+        # Worker threads bump through the blocking client
+        a.invalidate()
+        assert b.key('analytics', params, await b.version()) != moved
+
+    asyncio.run(scenario())
+
+
+class SlowFakeRedis(FakeRedis):
+    async def incr(self, key):
+        await asyncio.sleep(0.3)
+        return await super().incr(key)
+
+
+class SlowBlockingFakeRedis(BlockingFakeRedis):
+    def incr(self, key):
+        time.sleep(0.3)
+        return super().incr(key)
+
+
+def test_slow_bumps_do_not_stall_the_event_loop(client, monkeypatch):
+    data = {}
+    monkeypatch.setattr(response_cache, '_backend', _redis_backend(SlowFakeRedis(data), SlowBlockingFakeRedis(data)))
+    form = {'user_id': '1', 'category': 'consumer', 'is_working': 'true', 'price': '5'}
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://test') as http:
+            stop = asyncio.Event()
+            gaps = []
+
+            async def ticker():
+                loop = asyncio.get_running_loop()
+                while not stop.is_set():
+                    before = loop.time()
+                    await asyncio.sleep(0.01)
+                    gaps.append(loop.time() - before)
+
+            tick = asyncio.create_task(ticker())
+            added = await http.post('/ewaste/add', data=form)
+            bulk = await http.post('/ewaste/bulk', json=[{**form, 'user_id': 1, 'is_working': True}])
+            deleted = await http.delete(f"/ewaste/{added.json()['id']}")
+            stop.set()
+            await tick
+        return added, bulk, deleted, gaps
+
+    added, bulk, deleted, gaps = asyncio.run(scenario())
+    assert [added.status_code, bulk.status_code, deleted.status_code] == [200, 200, 200]
+    assert data['ewaste:response-cache:version'] == b'3'
+    # Each write waited 0.3 s on its bump; the loop kept serving other tasks meanwhile
+    assert max(gaps) < 0.2
@@ -0,0 +1,88 @@
+# /ewaste/search: ranked prefix search over names and analysed components, with facets, kept in sync on writes.
+import asyncio
+
+import pytest
+from sqlalchemy import event
+
+import utils.analysis_worker as analysis_worker
+from repositories.search_repository import search_items
+
+
+@pytest.fixture
+def client(client, add_item, test_db):
+    for name, price in (('Dell Laptop', 300), ('Laptop Charger', 20), ('Fridge', 800)):
+        add_item(product_name=name, price=price)
+    add_item(category='utility', product_name='Old Laptop', is_working=False, image=b'broken laptop')
+    # The stub analysis lists copper and plastic
+    pool = analysis_worker.AnalysisWorkerPool(session_factory=test_db.Session, workers=1)
+    assert asyncio.run(pool.run_once()) is True
+    return client
+
+
+def _names(body):
+    return [r['product_name'] for r in body['results']]
+
+
+def test_prefix_search_with_facets(client):
+    body = client.get('/ewaste/search', params={'q': 'lap'}).json()
+    assert body['total'] == 3
+    assert sorted(_names(body)) == ['Dell Laptop', 'Laptop Charger', 'Old Laptop']
+    assert body['facets']['tag'] == {'reuse': 2, 'recycle': 1}
+    assert body['facets']['category'] == {'consumer': 2, 'utility': 1}
+    assert body['facets']['component'] == {'copper': 1, 'plastic': 1}
+
+    assert _names(client.get('/ewaste/search', params={'q': 'COPP'}).json()) == ['Old Laptop']
+    assert _names(client.get('/ewaste/search', params={'q': 'laptop charg'}).json()) == ['Laptop Charger']
+
+
+def test_filters_leave_their_own_facet_open(client):
+    body = client.get('/ewaste/search', params={'q': 'laptop', 'tag': 'reuse', 'min_price': 100}).json()
+    assert _names(body) == ['Dell Laptop']
+    # tag counts ignore the tag filter (but keep the price range)
+    assert body['facets']['tag'] == {'reuse': 1}
+    body = client.get('/ewaste/search', params={'q': 'laptop', 'tag': 'reuse'}).json()
+    assert body['facets']['tag'] == {'reuse': 2, 'recycle': 1}
+
+    body = client.get('/ewaste/search', params={'q': 'laptop', 'component': 'Copper'}).json()
+    assert _names(body) == ['Old Laptop']
+    assert body['facets']['tag'] == {'recycle': 1}
+
+
+def test_index_follows_bulk_inserts_and_deletes(client):
+    resp = client.post('/ewaste/bulk', json=[{'user_id': 1, 'category': 'consumer', 'product_name': 'Gaming Laptop',
+                                              'is_working': True, 'price': 900}])
+    new_id = resp.json()['results'][0]['id']
+    assert client.get('/ewaste/search', params={'q': 'gaming'}).json()['results'][0]['id'] == new_id
+
+    old = client.get('/ewaste/search', params={'q': 'copper'}).json()['results'][0]['id']
+    assert client.delete(f'/ewaste/{old}').status_code == 200
+    body = client.get('/ewaste/search', params={'q': 'laptop'}).json()
+    assert 'Old Laptop' not in _names(body) and body['facets']['component'] == {}
+
+
+def test_query_syntax_is_not_passed_through(client):
+    body = client.get('/ewaste/search', params={'q': '"*) OR NEAR('}).json()
+    assert body['total'] == 0
+    assert client.get('/ewaste/search', params={'q': 'laptop"'}).json()['total'] == 3
+
+
+def test_search_does_not_scan_the_item_table(client, test_db):
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().startswith('SELECT'):
+            executed.append((statement, parameters))
+
+    with test_db.Session() as db:
+        event.listen(test_db.engine, 'before_cursor_execute', record)
+        try:
+            search_items(db, 'laptop', min_price=10, component='copper')
+        finally:
+            event.remove(test_db.engine, 'before_cursor_execute', record)
+        plans = [
+            detail
+            for statement, parameters in executed
+            for *_, detail in db.connection().exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters)
+        ]
+    assert any('VIRTUAL TABLE INDEX' in d for d in plans)
+    assert not [d for d in plans if d.startswith('SCAN ewaste_items') or d.startswith('SCAN ewaste_item_components')]
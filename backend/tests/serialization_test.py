@@ -0,0 +1,44 @@
+# List endpoints encode projected rows directly; the output must match what response_model validation produced.
+import pytest
+from pydantic import TypeAdapter
+
+from schemas.ewaste_schema import EwasteOut, EwasteWithUserOut
+
+ENDPOINTS = {
+    '/ewaste/all': EwasteWithUserOut,
+    '/ewaste/reusable': EwasteWithUserOut,
+    '/ewaste/filter': EwasteOut,
+    '/ewaste/user/1': EwasteOut,
+}
+
+
+@pytest.fixture
+def client(client, add_item):
+    add_item(price=120)
+    add_item(category='utility', product_name=None, is_working=False)
+    return client
+
+
+def test_all_items_include_price_and_phone(client):
+    rows = client.get('/ewaste/all').json()
+    assert (rows[0]['price'], rows[0]['user_phone']) == (120, '555')
+    assert rows[1]['price'] is None
+
+
+@pytest.mark.parametrize('path', ENDPOINTS)
+def test_rows_match_the_response_model(client, path):
+    rows = client.get(path).json()
+    assert rows
+    model = TypeAdapter(list[ENDPOINTS[path]])
+    assert model.dump_python(model.validate_python(rows), mode='json') == rows
+    assert set(rows[0]) == set(ENDPOINTS[path].model_fields)
+
+
+def test_streams_are_chunked_ndjson(client, add_item, monkeypatch):
+    import utils.streaming
+
+    monkeypatch.setattr(utils.streaming, 'NDJSON_CHUNK_BYTES', 1)
+    for _ in range(3):
+        add_item(product_name=None, is_working=False)
+    lines = client.get('/ewaste/filter?stream=true').text.splitlines()
+    assert len(lines) == 5 and all(line.startswith('{"id":') for line in lines)
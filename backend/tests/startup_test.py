@@ -0,0 +1,62 @@
+# Cold start: importing main builds no app, loads no deferred libraries and touches no database; the lifespan migrates.
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks.startup import DEFERRED, by_package, parse_importtime
+from config import Settings
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCRIPT = """
+import asyncio, json, os, sys
+import main
+report = {"loaded": [m for m in %r if m in sys.modules], "db_before": os.path.exists(%r),
+          "built_at_import": "app" in vars(main) or "routers.ewaste" in sys.modules}
+
+async def start():
+    async with main.app.router.lifespan_context(main.app):
+        pass
+
+asyncio.run(start())
+from sqlalchemy import inspect
+from database import engine
+report["tables"] = sorted(inspect(engine).get_table_names())
+print(json.dumps(report))
+"""
+
+
+def test_import_defers_backends_and_lifespan_migrates(tmp_path):
+    db_path = str(tmp_path / 'cold.db')
+    env = {**os.environ, 'DATABASE_URL': f'sqlite:///{db_path}', 'UPLOAD_DIR': str(tmp_path / 'uploads')}
+    proc = subprocess.run([sys.executable, '-c', SCRIPT % (DEFERRED, db_path)], cwd=BACKEND_DIR, env=env,
+                          capture_output=True, text=True, timeout=120)
+    assert proc.returncode == 0, proc.stderr
+    report = json.loads(proc.stdout.splitlines()[-1])
+    assert report['loaded'] == []
+    assert report['db_before'] is False
+    assert report['built_at_import'] is False
+    assert {'users', 'ewaste_items', 'schema_migrations'} <= set(report['tables'])
+
+
+def test_settings_read_the_environment(monkeypatch):
+    monkeypatch.setenv('BCRYPT_ROUNDS', '7')
+    monkeypatch.setenv('UPLOADS_PATHSEND', '1')
+    settings = Settings(_env_file=None)
+    assert settings.bcrypt_rounds == 7 and settings.uploads_pathsend is True
+    assert settings.nearby_max_radius_km == 500
+
+
+def test_importtime_parsing_counts_each_package_once():
+    stderr = '\n'.join([
+        'import time: self [us] | cumulative | imported package',
+        'import time:        50 |         50 |       httpx._api',
+        'import time:       100 |        150 |     httpx',
+        'import time:        20 |        170 |   utils.gemini_api',
+        'import time:         5 |          5 |   utils.metrics',
+        'import time:        10 |        185 | main',
+    ])
+    rows = parse_importtime(stderr)
+    assert rows[-1] == ('main', 10, 185, 0) and rows[0][3] == 3
+    assert by_package(rows) == {'main': 185, 'utils': 175, 'httpx': 150}
@@ -0,0 +1,85 @@
+# Stored uploads are served with strong ETags, immutable caching, 304s and byte ranges.
+import hashlib
+import io
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from utils.storage import variant_key
+
+
+BODY = bytes(range(256)) * 40
+
+
+@pytest.fixture
+def client(local_storage):
+    return TestClient(app)
+
+
+@pytest.fixture
+def key(local_storage):
+    return local_storage.save_stream(io.BytesIO(BODY), '.jpg', max_bytes=1 << 20).key
+
+
+def test_content_addressed_upload_is_cached_forever(client, key):
+    resp = client.get(f'/uploads/{key}')
+    assert resp.status_code == 200
+    assert resp.content == BODY
+    assert resp.headers['etag'] == f'"{hashlib.sha256(BODY).hexdigest()}"'
+    assert 'immutable' in resp.headers['cache-control']
+    assert resp.headers['accept-ranges'] == 'bytes'
+
+
+def test_if_none_match_gets_304(client, key):
+    etag = client.get(f'/uploads/{key}').headers['etag']
+    for header in (etag, f'W/{etag}', f'"other", {etag}', '*'):
+        resp = client.get(f'/uploads/{key}', headers={'If-None-Match': header})
+        assert resp.status_code == 304
+        assert resp.content == b''
+        assert resp.headers['etag'] == etag
+    assert client.get(f'/uploads/{key}', headers={'If-None-Match': '"other"'}).status_code == 200
+
+
+def test_variant_etag_is_not_the_original_digest(client, key, local_storage):
+    thumb = variant_key(key, 'thumbnail')
+    local_storage.write(thumb, b'webp bytes')
+    resp = client.get(f'/uploads/{thumb}')
+    assert resp.status_code == 200
+    assert resp.headers['content-type'] == 'image/webp'
+    assert resp.headers['etag'] != f'"{hashlib.sha256(BODY).hexdigest()}"'
+
+
+@pytest.mark.parametrize('header,start,end', [
+    ('bytes=0-99', 0, 99),
+    ('bytes=10000-', 10000, len(BODY) - 1),
+    ('bytes=-24', len(BODY) - 24, len(BODY) - 1),
+    ('bytes=100-999999', 100, len(BODY) - 1),
+])
+def test_range_requests(client, key, header, start, end):
+    resp = client.get(f'/uploads/{key}', headers={'Range': header})
+    assert resp.status_code == 206
+    assert resp.content == BODY[start:end + 1]
+    assert resp.headers['content-range'] == f'bytes {start}-{end}/{len(BODY)}'
+    assert resp.headers['content-length'] == str(end - start + 1)
+
+
+def test_unsatisfiable_and_ignored_ranges(client, key):
+    resp = client.get(f'/uploads/{key}', headers={'Range': f'bytes={len(BODY)}-'})
+    assert resp.status_code == 416
+    assert resp.headers['content-range'] == f'bytes */{len(BODY)}'
+
+    # Multiple ranges and a stale If-Range fall back to the whole file
+    assert client.get(f'/uploads/{key}', headers={'Range': 'bytes=0-1,5-6'}).status_code == 200
+    resp = client.get(f'/uploads/{key}', headers={'Range': 'bytes=0-1', 'If-Range': '"stale"'})
+    assert resp.status_code == 200
+    assert resp.content == BODY
+
+
+def test_missing_or_invalid_key_is_404(client, local_storage):
+    assert client.get('/uploads/ab/cd/missing.jpg').status_code == 404
+    assert client.get('/uploads/..%2F..%2Fetc/passwd').status_code == 404
+    # Upload spool files live under the root but are not servable
+    with open(f'{local_storage._tmp}/partial', 'wb') as f:
+        f.write(b'half an upload')
+    assert client.get('/uploads/.tmp/partial').status_code == 404
@@ -0,0 +1,171 @@
+"""Content-addressed cache for image analysis results.
+
+Keys are "<model version>:<sha256 of the image bytes>", so re-uploading the
+same photo (under any filename) reuses the earlier result, and changing the
+model or endpoint naturally misses. Two tiers:
+
+- an in-process LRU (ANALYSIS_CACHE_MEMORY_ENTRIES entries)
+- the `analysis_cache` table, shared by every process on the database,
+  capped at ANALYSIS_CACHE_MAX_ROWS by least-recent use
+
+Both tiers honour ANALYSIS_CACHE_TTL_SECONDS. The persistent tier is best
+effort: a database error there is logged and treated as a miss. It opens its
+sessions from the session_factory the caller passes to get/put (the analysis
+worker's), so it uses the same database as the rest of the caller's work.
+"""
+
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, select, update
+
+from config import settings
+from models.analysis_cache_model import AnalysisCacheEntry
+
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_CACHE_MEMORY_ENTRIES = settings.analysis_cache_memory_entries
+ANALYSIS_CACHE_MAX_ROWS = settings.analysis_cache_max_rows
+ANALYSIS_CACHE_TTL_SECONDS = settings.analysis_cache_ttl_seconds
+# Size-based eviction of the table runs once every this many stores
+PRUNE_EVERY = 100
+
+
+def cache_key(image_digest: str, version: str) -> str:
+    return f"{version}:{image_digest}"
+
+
+class AnalysisCache:
+    def __init__(
+        self,
+        memory_entries: int = ANALYSIS_CACHE_MEMORY_ENTRIES,
+        max_rows: int = ANALYSIS_CACHE_MAX_ROWS,
+        ttl_seconds: int = ANALYSIS_CACHE_TTL_SECONDS,
+    ):
+        self.memory_entries = memory_entries
+        self.max_rows = max_rows
+        self.ttl_seconds = ttl_seconds
+        self._memory: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._stores_since_prune = 0
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    def _count(self, name: str, n: int = 1):
+        with self._lock:
+            self.stats[name] += n
+
+    def get(self, key: str, session_factory) -> dict | None:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._memory.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return copy.deepcopy(entry[1])
+                del self._memory[key]
+
+        result = self._get_persistent(key, session_factory)
+        if result is None:
+            self._count("misses")
+            return None
+        self._count("disk_hits")
+        self._remember(key, result, now + self.ttl_seconds)
+        return copy.deepcopy(result)
+
+    def put(self, key: str, result: dict, session_factory):
+        expires = time.time() + self.ttl_seconds
+        self._remember(key, copy.deepcopy(result), expires)
+        self._put_persistent(key, result, session_factory)
+        self._count("stores")
+
+    def clear_memory(self):
+        with self._lock:
+            self._memory.clear()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            lookups = self.stats["memory_hits"] + self.stats["disk_hits"] + self.stats["misses"]
+            hits = lookups - self.stats["misses"]
+            return {
+                **self.stats,
+                "memory_entries": len(self._memory),
+                "hit_ratio": round(hits / lookups, 4) if lookups else None,
+            }
+
+    def _remember(self, key, result, expires):
+        with self._lock:
+            self._memory[key] = (expires, result)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def _get_persistent(self, key, session_factory):
+        now = datetime.utcnow()
+        try:
+            with session_factory() as db:
+                result = db.scalar(
+                    select(AnalysisCacheEntry.result).where(
+                        AnalysisCacheEntry.key == key, AnalysisCacheEntry.expires_at > now
+                    )
+                )
+                if result is not None:
+                    db.execute(
+                        update(AnalysisCacheEntry)
+                        .where(AnalysisCacheEntry.key == key)
+                        .values(last_used_at=now)
+                    )
+                    db.commit()
+                return result
+        except Exception:
+            logger.exception("analysis cache read failed")
+            return None
+
+    def _put_persistent(self, key, result, session_factory):
+        now = datetime.utcnow()
+        try:
+            with session_factory() as db:
+                db.merge(AnalysisCacheEntry(
+                    key=key,
+                    result=result,
+                    created_at=now,
+                    expires_at=now + timedelta(seconds=self.ttl_seconds),
+                    last_used_at=now,
+                ))
+                db.commit()
+                with self._lock:
+                    self._stores_since_prune += 1
+                    due = self._stores_since_prune >= PRUNE_EVERY
+                    if due:
+                        self._stores_since_prune = 0
+                if due:
+                    self._count("evictions", self.prune(db))
+        except Exception:
+            logger.exception("analysis cache write failed")
+
+    def prune(self, db) -> int:
+        """Drop expired rows, then the least recently used beyond max_rows."""
+        removed = db.execute(
+            delete(AnalysisCacheEntry).where(AnalysisCacheEntry.expires_at <= datetime.utcnow())
+        ).rowcount
+        cutoff = db.scalar(
+            select(AnalysisCacheEntry.last_used_at)
+            .order_by(AnalysisCacheEntry.last_used_at.desc())
+            .offset(self.max_rows)
+            .limit(1)
+        )
+        if cutoff is not None:
+            removed += db.execute(
+                delete(AnalysisCacheEntry).where(AnalysisCacheEntry.last_used_at <= cutoff)
+            ).rowcount
+        db.commit()
+        return removed
+
+
+analysis_cache = AnalysisCache()
@@ -0,0 +1,234 @@
+"""Background image analysis.
+
+`add_ewaste` no longer calls the Gemini API inline. It stores the item with
+analysis_status="pending" and queues a row in `analysis_jobs` in the same
+transaction. `AnalysisWorkerPool` runs a configurable number of asyncio workers
+(started from the app lifespan) that claim due jobs, run the analysis through
+the shared async upstream client, and write `gemini_analysis` back to the item.
+
+Claiming a job sets status="running" and pushes next_run_at out by a lease, so
+a job held by a worker that died is picked up again once the lease expires.
+Failed attempts are retried with exponential backoff; after the last attempt the
+item gets the stub analysis with the error attached and analysis_status="failed".
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.orm import Session
+
+from config import settings
+from database import SessionLocal
+from models.analysis_job_model import AnalysisJob
+from models.ewaste_model import EwasteItem
+from repositories.ewaste_repository import changed_items
+from repositories.search_repository import reindex_items
+from utils.gemini_api import analyze_image_async, fallback_analysis
+from utils.events import event_bus
+from utils.response_cache import response_cache
+
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_WORKERS = settings.analysis_workers
+ANALYSIS_MAX_ATTEMPTS = settings.analysis_max_attempts
+ANALYSIS_RETRY_BASE_SECONDS = settings.analysis_retry_base_seconds
+ANALYSIS_RETRY_MAX_SECONDS = settings.analysis_retry_max_seconds
+ANALYSIS_LEASE_SECONDS = settings.analysis_lease_seconds
+# Idle workers (and long-poll waiters) re-check the database this often, which
+# also picks up jobs queued by other processes
+ANALYSIS_POLL_SECONDS = settings.analysis_poll_seconds
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+
+
+def enqueue_analysis(db: Session, item: EwasteItem):
+    """Mark the item pending and queue its analysis in the caller's transaction."""
+    if item.id is None:
+        db.flush()
+    item.analysis_status = PENDING
+    db.add(AnalysisJob(item_id=item.id, next_run_at=datetime.utcnow()))
+
+
+def enqueue_analysis_batch(db: Session, item_ids: list[int]):
+    """Queue analysis for items already stored as pending, with one multi-row insert."""
+    if item_ids:
+        now = datetime.utcnow()
+        db.execute(insert(AnalysisJob), [{"item_id": item_id, "next_run_at": now} for item_id in item_ids])
+
+
+def pending_analysis_jobs(db: Session) -> int:
+    """Jobs still queued or running, across every process."""
+    return db.scalar(
+        select(func.count()).select_from(AnalysisJob).where(AnalysisJob.status.in_(("queued", "running")))
+    )
+
+
+def retry_delay(attempts: int) -> float:
+    return min(ANALYSIS_RETRY_BASE_SECONDS * 2 ** (attempts - 1), ANALYSIS_RETRY_MAX_SECONDS)
+
+
+class AnalysisWorkerPool:
+    def __init__(self, session_factory=SessionLocal, workers: int = ANALYSIS_WORKERS):
+        self.session_factory = session_factory
+        self.workers = workers
+        self._tasks: list[asyncio.Task] = []
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._wakeup: asyncio.Event | None = None
+        self._waiters: dict[int, asyncio.Event] = {}
+        self._waiting: dict[int, int] = {}  # item id -> wait_for calls in progress
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._loop = None
+
+    def wake(self):
+        """Nudge idle workers after a commit that queued jobs. Safe from any thread."""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def wait_for(self, item_id: int, timeout: float):
+        """Sleep until this process finishes the item's job, or `timeout` passes."""
+        event = self._waiters.setdefault(item_id, asyncio.Event())
+        self._waiting[item_id] = self._waiting.get(item_id, 0) + 1
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            # The job may time out, run in another process or be abandoned: the last waiter cleans up
+            self._waiting[item_id] -= 1
+            if not self._waiting[item_id]:
+                del self._waiting[item_id]
+                self._waiters.pop(item_id, None)
+
+    async def _work(self):
+        while True:
+            try:
+                worked = await self.run_once()
+            except Exception:
+                logger.exception("analysis worker iteration failed")
+                worked = False
+            if not worked:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), ANALYSIS_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+    async def run_once(self) -> bool:
+        """Claim and process one due job. Returns False when nothing was due."""
+        claimed = await asyncio.to_thread(self._claim)
+        if claimed is None:
+            return False
+        job_id, item_id, image_path, attempts = claimed
+        if image_path is None:
+            # Item deleted (or never had an image) since the job was queued
+            await asyncio.to_thread(self._finish, job_id, item_id, None, DONE)
+        else:
+            try:
+                analysis = await analyze_image_async(image_path, self.session_factory, fallback=False)
+            except Exception as e:
+                logger.warning("analysis of item %s failed (attempt %s): %s", item_id, attempts, e)
+                await asyncio.to_thread(self._retry_or_fail, job_id, item_id, image_path, attempts, e)
+            else:
+                await asyncio.to_thread(self._finish, job_id, item_id, analysis, DONE)
+        event = self._waiters.pop(item_id, None)
+        if event is not None:
+            event.set()
+        return True
+
+    def _claim(self):
+        now = datetime.utcnow()
+        due = (
+            AnalysisJob.status.in_(("queued", "running")),
+            AnalysisJob.next_run_at <= now,
+        )
+        with self.session_factory() as db:
+            candidates = db.scalars(
+                select(AnalysisJob.id).where(*due).order_by(AnalysisJob.next_run_at).limit(self.workers + 1)
+            ).all()
+            for job_id in candidates:
+                # Conditional update so two workers cannot both take the same job
+                result = db.execute(
+                    update(AnalysisJob)
+                    .where(AnalysisJob.id == job_id, *due)
+                    .values(
+                        status="running",
+                        attempts=AnalysisJob.attempts + 1,
+                        next_run_at=now + timedelta(seconds=ANALYSIS_LEASE_SECONDS),
+                        updated_at=now,
+                    )
+                )
+                if result.rowcount == 1:
+                    db.commit()
+                    row = db.execute(
+                        select(AnalysisJob.item_id, EwasteItem.image_path, AnalysisJob.attempts)
+                        .outerjoin(EwasteItem, EwasteItem.id == AnalysisJob.item_id)
+                        .where(AnalysisJob.id == job_id)
+                    ).one()
+                    return job_id, row.item_id, row.image_path, row.attempts
+            db.commit()
+        return None
+
+    def _finish(self, job_id, item_id, analysis, status, error=None):
+        now = datetime.utcnow()
+        with self.session_factory() as db:
+            if analysis is not None:
+                db.execute(
+                    update(EwasteItem)
+                    .where(EwasteItem.id == item_id)
+                    .values(gemini_analysis=analysis, analysis_status=status)
+                )
+                # The analysis names the components that search and its facets use
+                reindex_items(db, [item_id])
+            db.execute(
+                update(AnalysisJob)
+                .where(AnalysisJob.id == job_id)
+                .values(status=status, last_error=str(error) if error else None, updated_at=now)
+            )
+            db.commit()
+            changed = []
+            if analysis is not None:
+                # With no stream to send the row to, skip its query, as _publish_change does
+                if event_bus.has_audience():
+                    changed = changed_items(db, [item_id])
+                else:
+                    event_bus.skip()
+        if analysis is not None:
+            response_cache.invalidate()
+        if changed:
+            event_bus.publish("item.updated", {"items": changed})
+
+    def _retry_or_fail(self, job_id, item_id, image_path, attempts, error):
+        if attempts >= ANALYSIS_MAX_ATTEMPTS:
+            self._finish(job_id, item_id, fallback_analysis(image_path, error), FAILED, error)
+            return
+        now = datetime.utcnow()
+        with self.session_factory() as db:
+            db.execute(
+                update(AnalysisJob)
+                .where(AnalysisJob.id == job_id)
+                .values(
+                    status="queued",
+                    next_run_at=now + timedelta(seconds=retry_delay(attempts)),
+                    last_error=str(error),
+                    updated_at=now,
+                )
+            )
+            db.commit()
+
+
+worker_pool = AnalysisWorkerPool()
@@ -1,34 +1,55 @@
-import os
-from jose import jwt
+import time
+import uuid
 from datetime import datetime, timedelta
-import bcrypt
-from dotenv import load_dotenv
 
+from config import settings
 
-load_dotenv()
-SECRET_KEY = os.getenv("SECRET_KEY", "supersecretkey_change_me")
+# jose and bcrypt are imported where they are used, so importing the app
+# (and every process that only serves other routes) does not pay for them.
+
+SECRET_KEY = settings.secret_key
 ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "60"))
+ACCESS_TOKEN_EXPIRE_MINUTES = settings.access_token_expire_minutes
+# bcrypt cost factor; each +1 doubles the work. Existing hashes are upgraded on login.
+BCRYPT_ROUNDS = settings.bcrypt_rounds
+
 
+def hash_password(password: str, rounds: int | None = None) -> str:
+    import bcrypt
 
-def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds or BCRYPT_ROUNDS)).decode()
 
 
 def verify_password(password: str, hashed: str) -> bool:
+    import bcrypt
+
     return bcrypt.checkpw(password.encode(), hashed.encode())
 
 
+def needs_rehash(hashed: str) -> bool:
+    """True when a stored hash was made with a different cost than BCRYPT_ROUNDS."""
+    # "$2b$12$<salt+hash>"
+    try:
+        return int(hashed.split("$")[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+
 def create_access_token(data: dict):
+    from jose import jwt
+
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    # jti lets a single token be revoked (utils.token_cache.revocations)
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 
 def decode_access_token(token: str) -> dict:
     """Decode a JWT and return the payload. Raises jose.JWTError on failure."""
+    from jose import jwt
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         return payload
@@ -38,15 +59,62 @@ def decode_access_token(token: str) -> dict:
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy.orm import Session
+
+from database import AsyncDB, get_async_db, get_db
+from models.user_model import User
+from utils.token_cache import USER_PROFILE_TTL_SECONDS, revocations, token_cache, token_digest, user_profiles
 
 security = HTTPBearer()
 
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
+def verify_token(token: str, db: Session) -> dict:
+    """Payload of a valid, unrevoked token. Verified payloads are cached until their exp.
+
+    db is only queried when the revocation list is due for a reload.
+    """
+    digest = token_digest(token)
+    payload = token_cache.get(digest)
+    if payload is None:
+        payload = decode_access_token(token)
+        token_cache.put(digest, payload, payload.get("exp", 0))
+    if revocations.is_revoked(db, payload.get("jti")):
+        from jose import JWTError
+
+        raise JWTError("token has been revoked")
+    return payload
+
+
+def user_profile(user) -> dict:
+    return {"id": user.id, "name": user.name, "email": user.email,
+            "address": user.address, "phone": user.phone, "role": user.role}
+
+
+def remember_profile(user) -> dict:
+    profile = user_profile(user)
+    user_profiles.put(user.id, profile, time.time() + USER_PROFILE_TTL_SECONDS)
+    return profile
+
+
+def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)
+) -> dict:
     """FastAPI dependency that returns the token payload after verifying the bearer token."""
     token = credentials.credentials
     try:
-        payload = decode_access_token(token)
+        payload = verify_token(token, db)
     except Exception:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid authentication token")
-    return payload
\ No newline at end of file
+    return payload
+
+
+async def get_current_profile(payload: dict = Depends(get_current_user), db: AsyncDB = Depends(get_async_db)) -> dict:
+    """The caller's profile (id, name, email, role, ...), cached so role checks skip the database."""
+    user_id = payload.get("user_id")
+    profile = user_profiles.get(user_id)
+    if profile is None:
+        user = await db.run(Session.get, User, user_id)
+        if user is None:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid authentication token")
+        profile = remember_profile(user)
+    return profile
\ No newline at end of file
@@ -0,0 +1,271 @@
+"""In-process change feed behind GET /ewaste/events (Server-Sent Events).
+
+Dashboards used to poll /ewaste/reusable and /ewaste/analytics, and every poll
+after a write re-read the table. Instead, the code paths that change items
+publish what changed to `event_bus`:
+
+- item.created: {"items": [rows]}, from /ewaste/add and /ewaste/bulk
+- item.updated: {"items": [rows]}, when an analysis finishes or image
+  variants are stored
+- item.deleted: {"ids": [ids]}, from DELETE /ewaste/{id}
+- counters: the /ewaste/analytics summary, after every create or delete
+
+Rows have the /ewaste/reusable shape (owner name and phone included) for
+every tag, so the marketplace keeps the ones tagged "reuse". Each event is
+encoded to its SSE message once, when it is published, and every stream
+sends those same bytes: a write costs one encode however many dashboards are
+open, and an idle stream costs a heartbeat comment every
+EVENTS_HEARTBEAT_SECONDS.
+
+Event ids are "<epoch>.<sequence>", with a new epoch for every process. The
+bus keeps the last EVENTS_BUFFER_SIZE events (at most EVENTS_BUFFER_BYTES of
+them), so a client that reconnects with Last-Event-ID, which EventSource
+sends by itself, gets what it missed. When that is not possible (the id is
+older than the buffer, or from another process or before a restart) or the
+client fell EVENTS_SUBSCRIBER_QUEUE events behind, it gets a `reset` event
+instead and should reload the lists. A new client opens the stream first and
+then loads the lists; the `ready` event marks where the stream starts, and
+applying a diff twice is harmless.
+
+Streams end after EVENTS_STREAM_SECONDS and the client reconnects and
+resumes, so no connection outlives a deploy by much.
+
+Building an event's payload costs queries, so writers ask `has_audience()`
+first: true while a stream is open and for EVENTS_RESUME_SECONDS after the
+last one closed, so a reconnecting client can still resume. Otherwise they
+call `skip()`, which empties the buffer and moves the sequence on, so any
+id from before the gap gets a `reset`.
+
+The bus lives in one process: with several worker processes, a stream only
+sees the writes that its own process handled.
+"""
+
+import asyncio
+import itertools
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass
+
+from fastapi.responses import StreamingResponse
+
+from config import settings
+from utils.metrics import event_resets, event_subscribers, events_published
+from utils.serialization import dumps
+
+
+EVENTS_BUFFER_SIZE = settings.events_buffer_size
+EVENTS_BUFFER_BYTES = settings.events_buffer_bytes
+EVENTS_SUBSCRIBER_QUEUE = settings.events_subscriber_queue
+EVENTS_HEARTBEAT_SECONDS = settings.events_heartbeat_seconds
+EVENTS_STREAM_SECONDS = settings.events_stream_seconds
+EVENTS_RESUME_SECONDS = settings.events_resume_seconds
+# How long EventSource waits before reconnecting after a stream ends
+EVENTS_RETRY_MS = 2000
+
+EVENT_TYPES = {"item.created", "item.updated", "item.deleted", "counters"}
+SSE_MEDIA_TYPE = "text/event-stream"
+HEARTBEAT = b": ping\n\n"
+
+
+@dataclass(frozen=True)
+class Event:
+    id: str
+    type: str
+    message: bytes  # the encoded SSE message
+
+
+def _message(event_id: str, event_type: str, data: bytes) -> bytes:
+    # Compact JSON has no newlines, so the payload fits on one data line
+    return b"id: " + event_id.encode() + b"\nevent: " + event_type.encode() + b"\ndata: " + data + b"\n\n"
+
+
+class Subscription:
+    """One stream's queue, filled by the bus on the event loop."""
+
+    def __init__(self, bus: "EventBus", types: set[str] | None, max_queued: int):
+        self.bus = bus
+        self.types = types
+        self.max_queued = max_queued
+        self.queue: asyncio.Queue[Event] = asyncio.Queue()
+
+    def deliver(self, event: Event):
+        if self.types is not None and event.type not in self.types:
+            return
+        if self.queue.qsize() >= self.max_queued:
+            # Too far behind to catch up: drop the backlog and have the client reload
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(self.bus._control("reset", "behind"))
+            return
+        self.queue.put_nowait(event)
+
+
+class EventBus:
+    def __init__(
+        self,
+        buffer_size: int = EVENTS_BUFFER_SIZE,
+        buffer_bytes: int = EVENTS_BUFFER_BYTES,
+        max_queued: int = EVENTS_SUBSCRIBER_QUEUE,
+        resume_seconds: float = EVENTS_RESUME_SECONDS,
+    ):
+        self.epoch = uuid.uuid4().hex[:8]
+        self.buffer_size = buffer_size
+        self.buffer_bytes = buffer_bytes
+        self.max_queued = max_queued
+        self.resume_seconds = resume_seconds
+        self._sequence = 0
+        self._buffer: deque[tuple[int, Event]] = deque()
+        self._buffered_bytes = 0
+        self._subscribers: set[Subscription] = set()
+        self._idle_since: float | None = None  # monotonic time the last stream closed; None: never opened
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def last_id(self) -> str:
+        return f"{self.epoch}.{self._sequence}"
+
+    def publish(self, event_type: str, data):
+        """Send an event to every stream and the resume buffer. Safe from any thread."""
+        payload = dumps(data)
+        loop = self._loop
+        if loop is not None and not loop.is_closed() and _running_loop() is not loop:
+            # Streams' queues belong to the loop; numbering there also keeps ids in delivery order
+            loop.call_soon_threadsafe(self._publish, event_type, payload)
+        else:
+            self._publish(event_type, payload)
+
+    def _publish(self, event_type: str, payload: bytes):
+        with self._lock:
+            self._sequence += 1
+            event = Event(self.last_id, event_type, _message(self.last_id, event_type, payload))
+            self._buffer.append((self._sequence, event))
+            self._buffered_bytes += len(event.message)
+            while len(self._buffer) > self.buffer_size or (
+                self._buffered_bytes > self.buffer_bytes and len(self._buffer) > 1
+            ):
+                self._buffered_bytes -= len(self._buffer.popleft()[1].message)
+            subscribers = list(self._subscribers)
+        events_published.inc(type=event_type)
+        for subscription in subscribers:
+            subscription.deliver(event)
+
+    def _control(self, event_type: str, reason: str | None = None) -> Event:
+        """A ready/reset event: not buffered, and carrying the current id so a reconnect resumes from here."""
+        if event_type == "reset":
+            event_resets.inc(reason=reason)
+        data = dumps({"reason": reason} if reason else {})
+        return Event(self.last_id, event_type, _message(self.last_id, event_type, data))
+
+    def _missed(self, last_event_id: str) -> list[Event] | None:
+        """Buffered events after last_event_id, or None when they cannot all be replayed."""
+        epoch, _, sequence = last_event_id.partition(".")
+        if epoch != self.epoch or not sequence.isdigit() or int(sequence) > self._sequence:
+            return None
+        sequence = int(sequence)
+        oldest = self._buffer[0][0] if self._buffer else self._sequence + 1
+        if sequence < oldest - 1:
+            return None
+        return [event for _, event in itertools.islice(self._buffer, max(sequence - oldest + 1, 0), None)]
+
+    def subscribe(self, last_event_id: str | None = None, types: set[str] | None = None) -> Subscription:
+        """Open a stream on the running loop, queueing what it missed since last_event_id (or ready/reset)."""
+        self._loop = asyncio.get_running_loop()
+        subscription = Subscription(self, types, self.max_queued)
+        with self._lock:
+            if last_event_id is None:
+                subscription.queue.put_nowait(self._control("ready"))
+            else:
+                missed = self._missed(last_event_id)
+                if missed is None:
+                    subscription.queue.put_nowait(self._control("reset", "stale_id"))
+                else:
+                    for event in missed:
+                        subscription.deliver(event)
+            self._subscribers.add(subscription)
+        event_subscribers.inc()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            if subscription not in self._subscribers:
+                return
+            self._subscribers.discard(subscription)
+            if not self._subscribers:
+                self._idle_since = time.monotonic()
+        event_subscribers.dec()
+
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def has_audience(self) -> bool:
+        """Whether a stream is open or closed recently enough that its client may resume."""
+        if self._subscribers:
+            return True
+        idle_since = self._idle_since
+        return idle_since is not None and time.monotonic() - idle_since < self.resume_seconds
+
+    def skip(self):
+        """Account for a change that was not published: older ids can no longer be replayed in full."""
+        with self._lock:
+            self._sequence += 1
+            self._buffer.clear()
+            self._buffered_bytes = 0
+
+    def clear(self):
+        """Forget buffered events and start a new epoch (tests)."""
+        with self._lock:
+            self.epoch = uuid.uuid4().hex[:8]
+            self._sequence = 0
+            self._buffer.clear()
+            self._buffered_bytes = 0
+            self._idle_since = None
+
+
+def _running_loop() -> asyncio.AbstractEventLoop | None:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def event_stream_response(
+    bus: EventBus,
+    last_event_id: str | None,
+    types: set[str] | None,
+    heartbeat_seconds: float = EVENTS_HEARTBEAT_SECONDS,
+    stream_seconds: float = EVENTS_STREAM_SECONDS,
+) -> StreamingResponse:
+    """Stream the bus as Server-Sent Events for stream_seconds, then end so the client reconnects."""
+
+    async def messages():
+        # Subscribed when the body starts, so a request that never gets that far leaves nothing behind
+        subscription = bus.subscribe(last_event_id, types)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + stream_seconds
+        try:
+            yield b"retry: %d\n\n" % EVENTS_RETRY_MS
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), min(heartbeat_seconds, remaining))
+                except asyncio.TimeoutError:
+                    yield HEARTBEAT
+                    continue
+                # Send whatever else is already queued in the same write
+                chunk = [event.message]
+                while not subscription.queue.empty():
+                    chunk.append(subscription.queue.get_nowait().message)
+                yield b"".join(chunk)
+        finally:
+            bus.unsubscribe(subscription)
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(messages(), media_type=SSE_MEDIA_TYPE, headers=headers)
+
+
+event_bus = EventBus()
@@ -1,24 +1,74 @@
 """Gemini Vision helper.
 
-This module implements analyze_image(image_path) which will call an external
-Gemini Vision-like API to analyze an image and return a structured dict of
-recyclable / reusable components.
+This module implements analyze_image_async(image_path, session_factory) which
+will call an external Gemini Vision-like API to analyze an image and return a
+structured dict of recyclable / reusable components.
 
 Behavior:
 - If GEMINI_API_KEY is set in the environment, perform a real HTTP request to
   the configured endpoint (defaults to a placeholder URL) using httpx.
 - If no API key is provided, fall back to a deterministic local stubbed response.
+- If the API call fails, fall back to the stub with the error attached, unless
+  the caller passes fallback=False (the background worker does, so it can retry).
+- Results are cached by a SHA-256 of the image bytes plus the model version
+  (utils.analysis_cache), so duplicate uploads never reach the API twice.
+  Fallback results carrying an error are not cached.
+
+Upstream calls share one long-lived httpx.AsyncClient (opened on the first
+upstream call and closed by the app lifespan, HTTP/2 when the `h2` package is
+installed). In-flight upstream calls are capped at GEMINI_MAX_CONCURRENCY, and
+concurrent requests for the same image coalesce into a single upstream call.
+
+Every analysis is counted in utils.metrics by outcome (ok, error, stub,
+cached), and upstream calls are timed.
 """
 
+import asyncio
+import hashlib
 import os
-from typing import Dict, Any
-import json
+import time
+from typing import TYPE_CHECKING, Dict, Any
 
-import httpx
+from config import settings
+from utils.analysis_cache import analysis_cache, cache_key
+from utils.metrics import record_gemini_call
+from utils.storage import content_hash, get_storage, key_from_path
 
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+GEMINI_API_KEY = settings.gemini_api_key
 # Example endpoint; replace with real Gemini Vision endpoint when available
-GEMINI_VISION_URL = os.getenv("GEMINI_VISION_URL", "https://api.gemini.example/v1/vision/analyze")
+GEMINI_VISION_URL = settings.gemini_vision_url
+# Bump when the upstream model changes so cached results are not reused
+GEMINI_MODEL_VERSION = settings.gemini_model_version
+GEMINI_TIMEOUT_SECONDS = settings.gemini_timeout_seconds
+GEMINI_MAX_CONCURRENCY = settings.gemini_max_concurrency
+STUB_VERSION = "stub-v1"
+
+# httpx is imported on the first upstream call: without GEMINI_API_KEY it is never needed
+if TYPE_CHECKING:
+    import httpx
+
+_client: "httpx.AsyncClient | None" = None
+_semaphore: asyncio.Semaphore | None = None
+# cache key -> future of the upstream call already running for that image
+_inflight: dict[str, asyncio.Future] = {}
+
+
+def analysis_version() -> str:
+    """Identifies what produced a result; part of the cache key."""
+    if not GEMINI_API_KEY:
+        return STUB_VERSION
+    return f"{GEMINI_MODEL_VERSION}@{GEMINI_VISION_URL}"
+
+
+def _stored_key(image_path: str) -> str | None:
+    """Storage key for an item's image_path, or None when there is no stored file."""
+    if not image_path:
+        return None
+    key = key_from_path(image_path)
+    try:
+        return key if get_storage().exists(key) else None
+    except ValueError:
+        return None
 
 
 def _stub_response(image_path: str) -> Dict[str, Any]:
@@ -37,42 +87,141 @@ def _stub_response(image_path: str) -> Dict[str, Any]:
     }
 
 
-def analyze_image(image_path: str) -> Dict[str, Any]:
-    """Analyze the given image and return component analysis.
+def fallback_analysis(image_path: str, error: Exception) -> Dict[str, Any]:
+    """Stub result recording why the real analysis could not be used."""
+    stub = _stub_response(image_path)
+    stub["error"] = str(error)
+    return stub
 
-    image_path is the relative path stored in DB (e.g. "uploads/20251011_...jpg").
-    This function will open the file and POST it to the Gemini-like API.
-    Returns a dict with keys: recyclable_components (list), raw (original response).
-    """
-    if not GEMINI_API_KEY:
-        return _stub_response(image_path)
 
-    # Build absolute path to file
-    backend_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    abs_path = os.path.join(backend_root, image_path) if image_path else None
+def _normalize(data: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "source": "gemini",
+        "recyclable_components": data.get("recyclable_components") or data.get("components") or [],
+        "raw": data,
+    }
 
-    headers = {"Authorization": f"Bearer {GEMINI_API_KEY}"}
 
+def _headers() -> Dict[str, str]:
+    return {"Authorization": f"Bearer {GEMINI_API_KEY}"}
+
+
+def _http2_available() -> bool:
     try:
-        with httpx.Client(timeout=30.0) as client:
-            if abs_path and os.path.exists(abs_path):
-                files = {"file": (os.path.basename(abs_path), open(abs_path, "rb"), "application/octet-stream")}
-                resp = client.post(GEMINI_VISION_URL, headers=headers, files=files)
-            else:
-                # If the file is missing, ask the API to analyze by url or return stub
-                resp = client.post(GEMINI_VISION_URL, headers=headers, json={"note": "no_file_provided"})
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
 
+async def open_client():
+    """The shared upstream client, created on first use."""
+    global _client, _semaphore
+    if _client is None:
+        import httpx
+
+        _client = httpx.AsyncClient(
+            http2=_http2_available(),
+            timeout=GEMINI_TIMEOUT_SECONDS,
+            limits=httpx.Limits(
+                max_connections=GEMINI_MAX_CONCURRENCY,
+                max_keepalive_connections=GEMINI_MAX_CONCURRENCY,
+            ),
+        )
+        _semaphore = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+    return _client
+
+
+async def close_client():
+    global _client, _semaphore
+    if _client is not None:
+        await _client.aclose()
+    _client = None
+    _semaphore = None
+
+
+async def _call_upstream(filename: str, content: bytes | None) -> Dict[str, Any]:
+    client = await open_client()
+    async with _semaphore:
+        # Timed from when a slot is free, so the histogram shows upstream latency, not queueing
+        started = time.perf_counter()
+        try:
+            if content is not None:
+                files = {"file": (filename, content, "application/octet-stream")}
+                resp = await client.post(GEMINI_VISION_URL, headers=_headers(), files=files)
+            else:
+                resp = await client.post(GEMINI_VISION_URL, headers=_headers(), json={"note": "no_file_provided"})
             resp.raise_for_status()
-            data = resp.json()
-            # Normalize expected structure
-            result = {
-                "source": "gemini",
-                "recyclable_components": data.get("recyclable_components") or data.get("components") or [],
-                "raw": data,
-            }
-            return result
+            result = _normalize(resp.json())
+        except Exception:
+            record_gemini_call("error", time.perf_counter() - started)
+            raise
+    record_gemini_call("ok", time.perf_counter() - started)
+    return result
+
+
+async def _coalesced(key: str, filename: str, content: bytes) -> Dict[str, Any]:
+    """Run one upstream call per key; concurrent callers await the same result."""
+    future = _inflight.get(key)
+    if future is not None:
+        return await asyncio.shield(future)
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        result = await _call_upstream(filename, content)
+        future.set_result(result)
+        return result
+    except asyncio.CancelledError:
+        # The leader's caller went away. Fail the waiters as an upstream error would (they
+        # retry or fall back) instead of leaving them awaiting a future nobody will resolve
+        future.set_exception(RuntimeError("coalesced upstream call was cancelled"))
+        future.exception()
+        raise
     except Exception as e:
-        # If API fails, fall back to stub and attach error info
-        stub = _stub_response(image_path)
-        stub["error"] = str(e)
-        return stub
\ No newline at end of file
+        future.set_exception(e)
+        # Mark retrieved so a failure nobody else awaited is not logged as unhandled
+        future.exception()
+        raise
+    finally:
+        _inflight.pop(key, None)
+
+
+async def analyze_image_async(image_path: str, session_factory, fallback: bool = True) -> Dict[str, Any]:
+    """Analyze the given image and return component analysis.
+
+    image_path is the path stored in DB (e.g. "/uploads/ab/cd/<sha256>.jpg").
+    The file is read from storage and POSTed to the Gemini-like API over the
+    shared client. Returns a dict with keys: recyclable_components (list), raw
+    (original response). With fallback=False, API errors are raised instead of
+    returning the stub. The persistent cache tier opens its sessions from
+    session_factory.
+    """
+    stored_key = await asyncio.to_thread(_stored_key, image_path)
+    content = None
+    key = None
+    if stored_key:
+        content = await asyncio.to_thread(get_storage().read_bytes, stored_key)
+        digest = content_hash(stored_key) or hashlib.sha256(content).hexdigest()
+        key = cache_key(digest, analysis_version())
+        cached = await asyncio.to_thread(analysis_cache.get, key, session_factory)
+        if cached is not None:
+            record_gemini_call("cached")
+            return cached
+
+    try:
+        if not GEMINI_API_KEY:
+            record_gemini_call("stub")
+            result = _stub_response(image_path)
+        elif key is not None:
+            result = await _coalesced(key, os.path.basename(stored_key), content)
+        else:
+            result = await _call_upstream(None, None)
+    except Exception as e:
+        if not fallback:
+            raise
+        return fallback_analysis(image_path, e)
+
+    if key:
+        await asyncio.to_thread(analysis_cache.put, key, result, session_factory)
+    return result
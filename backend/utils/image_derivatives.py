@@ -0,0 +1,87 @@
+"""Downscaled WebP variants of uploaded photos.
+
+After an upload is stored, a background task writes two variants under keys
+derived from the original's (utils.storage.variant_key) and records their URL
+paths on the item:
+
+- thumbnail_path: fits in THUMBNAIL_SIZE px, for list/grid views
+- display_path: fits in DISPLAY_SIZE px, for detail views
+
+Variants of an image that is already stored (a duplicate upload) are reused.
+Pillow is optional. Without it, or for files Pillow cannot read, no variants
+are made and clients keep using image_path.
+"""
+
+import io
+import logging
+
+from sqlalchemy import update
+
+from config import settings
+from models.ewaste_model import EwasteItem
+from repositories.ewaste_repository import changed_items
+from utils.events import event_bus
+from utils.response_cache import response_cache
+from utils.storage import get_storage, key_from_path, url_for, variant_key
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - optional dependency
+    Image = None
+
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZE = settings.thumbnail_size
+DISPLAY_SIZE = settings.display_size
+WEBP_QUALITY = settings.webp_quality
+
+
+def build_derivatives(image_path: str) -> dict:
+    """Write the WebP variants for a stored image; returns the new URL paths by column."""
+    if Image is None or not image_path:
+        return {}
+    storage = get_storage()
+    key = key_from_path(image_path)
+    # Largest first so the thumbnail is resized from the display copy
+    targets = [
+        ("display_path", "display", DISPLAY_SIZE),
+        ("thumbnail_path", "thumbnail", THUMBNAIL_SIZE),
+    ]
+    paths = {column: url_for(variant_key(key, name)) for column, name, _ in targets}
+    if all(storage.exists(variant_key(key, name)) for _, name, _ in targets):
+        return paths
+    try:
+        with storage.open(key) as f, Image.open(f) as im:
+            # Let the JPEG decoder downscale while decoding instead of inflating 12 MP first
+            im.draft("RGB", (DISPLAY_SIZE, DISPLAY_SIZE))
+            im = ImageOps.exif_transpose(im)
+            im = im.convert("RGBA" if im.mode in ("RGBA", "LA", "P") else "RGB")
+            for _, name, size in targets:
+                im.thumbnail((size, size))
+                buf = io.BytesIO()
+                im.save(buf, "WEBP", quality=WEBP_QUALITY, method=4)
+                storage.write(variant_key(key, name), buf.getvalue(), "image/webp")
+        return paths
+    except Exception as e:
+        logger.warning("could not build image variants for %s: %s", image_path, e)
+        return {}
+
+
+def generate_item_derivatives(session_factory, item_id: int, image_path: str):
+    """Background task: build the variants and store their paths on the item."""
+    paths = build_derivatives(image_path)
+    if not paths:
+        return
+    with session_factory() as db:
+        db.execute(update(EwasteItem).where(EwasteItem.id == item_id).values(**paths))
+        db.commit()
+        changed = []
+        # With no stream to send the row to, skip its query, as _publish_change does
+        if event_bus.has_audience():
+            changed = changed_items(db, [item_id])
+        else:
+            event_bus.skip()
+    response_cache.invalidate()
+    if changed:
+        event_bus.publish("item.updated", {"items": changed})
@@ -1,20 +1,46 @@
-import os
-from fastapi import UploadFile
-from datetime import datetime
-
-
-UPLOAD_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "uploads")
-
-
-def save_image(file: UploadFile) -> str:
-    os.makedirs(UPLOAD_DIR, exist_ok=True)
-    timestamp = datetime.utcnow().strftime("%Y%m%d%H%M%S%f")
-    # Replace spaces and normalize filename
-    safe_name = file.filename.replace(" ", "_").replace("\\", "/")
-    filename = f"{timestamp}_{safe_name}"
-    # Use os.path.join for local file system operations
-    path = os.path.join(UPLOAD_DIR, filename)
-    with open(path, "wb") as buffer:
-        buffer.write(file.file.read())
-    # Use forward slashes for URL paths
-    return f"/uploads/{filename.replace('\\', '/')}"
\ No newline at end of file
+from fastapi import HTTPException, UploadFile
+
+from config import settings
+from utils.metrics import record_upload
+from utils.storage import StoredObject, UploadTooLarge, get_storage, safe_extension
+
+
+# Uploads larger than this are rejected with 413; phones send 12 MB photos
+MAX_UPLOAD_BYTES = settings.max_upload_bytes
+
+
+def _too_large() -> HTTPException:
+    limit_mb = MAX_UPLOAD_BYTES / (1024 * 1024)
+    return HTTPException(status_code=413, detail=f"Image is larger than the {limit_mb:g} MB limit")
+
+
+def save_image(file: UploadFile) -> StoredObject:
+    """Stream an upload into storage in chunks, never holding the whole file in memory.
+
+    The file is stored under its content hash, so re-uploads of the same photo
+    share one copy. Blocking I/O: callers run it on the threadpool. Raises 413
+    once MAX_UPLOAD_BYTES is passed.
+    """
+    if file.size is not None and file.size > MAX_UPLOAD_BYTES:
+        raise _too_large()
+    try:
+        stored = get_storage().save_stream(file.file, safe_extension(file.filename), MAX_UPLOAD_BYTES)
+    except UploadTooLarge:
+        raise _too_large()
+    record_upload(stored.size)
+    return stored
+
+
+def restore_image(file: UploadFile, stored: StoredObject):
+    """Store an upload again if its file was deleted after save_image returned.
+
+    save_image keeps the existing copy when the same content is already stored,
+    and deleting the last item that used it can remove that copy before the new
+    item takes its reference. Call after register_upload, before committing: a
+    delete that could still remove the file has finished by then, and later
+    ones see the new reference. Blocking I/O, like save_image.
+    """
+    storage = get_storage()
+    if not storage.exists(stored.key):
+        file.file.seek(0)
+        storage.save_stream(file.file, safe_extension(file.filename), MAX_UPLOAD_BYTES)
@@ -0,0 +1,269 @@
+"""Request, SQL, Gemini and upload metrics, exposed in the Prometheus text format at /metrics.
+
+- MetricsMiddleware (pure ASGI) times every request and labels it with the
+  route template (e.g. "/ewaste/{item_id}/analysis"), so paths with ids do
+  not create new series.
+- SQLAlchemy engine events count statements and time spent in the database,
+  in total and for the request that ran them. The per-request stats live in
+  a context variable, which follows a request into threadpool calls,
+  AsyncSession greenlets and streaming generators.
+- gemini_api and image_handler record upstream call latency and outcome, and
+  the bytes stored by save_image.
+- utils.events counts published events, change-feed subscribers and resets.
+- utils.rate_limit counts uploads turned away and tracks uploads in flight.
+
+With SLOW_REQUEST_MS set, requests slower than that are logged at WARNING on
+the "ewaste.slow_requests" logger, with their SQL statements and the time
+each one took. Statements are only collected while the log is on.
+"""
+
+import bisect
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from config import settings
+
+
+slow_logger = logging.getLogger("ewaste.slow_requests")
+
+SLOW_REQUEST_MS = settings.slow_request_ms  # 0 disables the slow-request log
+SLOW_REQUEST_MAX_STATEMENTS = settings.slow_request_max_statements
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(names, values) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name, self.help, self.labelnames = name, help, labelnames
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels[n] for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(labels[n] for n in self.labelnames), 0)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_text(self.labelnames, key)} {value:g}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name: str, help: str):
+        self.name, self.help = name, help
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1):
+        self.inc(-amount)
+
+    def value(self) -> float:
+        return self._value
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {self._value:g}"]
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, labelnames
+        self.buckets = tuple(buckets)
+        self._series: dict[tuple, list] = {}  # key -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels[n] for n in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def count(self, **labels) -> int:
+        series = self._series.get(tuple(labels[n] for n in self.labelnames))
+        return series[-1] if series else 0
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        names = self.labelnames + ("le",)
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, n in zip(self.buckets, series):
+                    cumulative += n
+                    lines.append(f"{self.name}_bucket{_label_text(names, key + (f'{bound:g}',))} {cumulative}")
+                lines.append(f"{self.name}_bucket{_label_text(names, key + ('+Inf',))} {series[-1]}")
+                lines.append(f"{self.name}_sum{_label_text(self.labelnames, key)} {series[-2]:g}")
+                lines.append(f"{self.name}_count{_label_text(self.labelnames, key)} {series[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+http_requests = REGISTRY.register(Counter(
+    "http_requests_total", "HTTP requests by route template and status.", ("method", "route", "status")))
+http_latency = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "Time from request start to the end of the response body.", ("method", "route")))
+http_statements = REGISTRY.register(Histogram(
+    "http_request_db_statements", "SQL statements run while serving a request.", ("route",), COUNT_BUCKETS))
+http_db_time = REGISTRY.register(Histogram(
+    "http_request_db_seconds", "Time spent executing SQL while serving a request.", ("route",)))
+db_statements = REGISTRY.register(Counter(
+    "db_statements_total", "SQL statements executed, including background work."))
+db_time = REGISTRY.register(Counter(
+    "db_seconds_total", "Seconds spent executing SQL, including background work."))
+gemini_calls = REGISTRY.register(Counter(
+    "gemini_calls_total", "Image analyses by outcome: ok, error, stub or cached.", ("outcome",)))
+gemini_latency = REGISTRY.register(Histogram(
+    "gemini_call_duration_seconds", "Latency of calls to the analysis API.", ("outcome",)))
+upload_files = REGISTRY.register(Counter(
+    "upload_files_saved_total", "Images stored by save_image."))
+upload_bytes = REGISTRY.register(Counter(
+    "upload_bytes_written_total", "Bytes of images stored by save_image."))
+events_published = REGISTRY.register(Counter(
+    "events_published_total", "Change-feed events published, by type.", ("type",)))
+event_subscribers = REGISTRY.register(Gauge(
+    "event_subscribers", "Open /ewaste/events streams."))
+event_resets = REGISTRY.register(Counter(
+    "event_stream_resets_total", "Streams told to reload: stale Last-Event-ID or a full queue.", ("reason",)))
+admission_rejections = REGISTRY.register(Counter(
+    "admission_rejections_total", "Uploads turned away: too_large (413), rate_limited (429), busy or analysis_backlog (503).",
+    ("route", "reason")))
+uploads_in_flight = REGISTRY.register(Gauge(
+    "uploads_in_flight", "Upload requests being handled, including their background work."))
+
+
+def record_gemini_call(outcome: str, seconds: float | None = None):
+    gemini_calls.inc(outcome=outcome)
+    if seconds is not None:
+        gemini_latency.observe(seconds, outcome=outcome)
+
+
+def record_upload(size: int):
+    upload_files.inc()
+    upload_bytes.inc(size)
+
+
+@dataclass
+class RequestStats:
+    collect_statements: bool = False
+    statement_count: int = 0
+    db_seconds: float = 0.0
+    statements: list = field(default_factory=list)  # (seconds, sql) when collect_statements
+
+
+_current: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("query_start")
+    if not starts:
+        return  # listener attached mid-statement
+    elapsed = time.perf_counter() - starts.pop()
+    db_statements.inc()
+    db_time.inc(elapsed)
+    stats = _current.get()
+    if stats is not None:
+        stats.statement_count += 1
+        stats.db_seconds += elapsed
+        if stats.collect_statements and len(stats.statements) < SLOW_REQUEST_MAX_STATEMENTS:
+            stats.statements.append((elapsed, statement))
+
+
+class MetricsMiddleware:
+    def __init__(self, app, slow_request_ms: float = SLOW_REQUEST_MS):
+        self.app = app
+        self.slow_request_ms = slow_request_ms
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        stats = RequestStats(collect_statements=self.slow_request_ms > 0)
+        token = _current.set(stats)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            _current.reset(token)
+            route = scope.get("route")
+            # Unmatched paths share one series instead of one per URL
+            template = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            http_requests.inc(method=method, route=template, status=status)
+            http_latency.observe(elapsed, method=method, route=template)
+            http_statements.observe(stats.statement_count, route=template)
+            http_db_time.observe(stats.db_seconds, route=template)
+            if self.slow_request_ms > 0 and elapsed * 1000 >= self.slow_request_ms:
+                self._log_slow(scope, status, elapsed, stats)
+
+    def _log_slow(self, scope, status, elapsed, stats):
+        path = scope["path"] + (f"?{scope['query_string'].decode()}" if scope.get("query_string") else "")
+        lines = [f"  {seconds * 1000:8.2f} ms  {' '.join(sql.split())}" for seconds, sql in stats.statements]
+        if stats.statement_count > len(stats.statements):
+            lines.append(f"  ... {stats.statement_count - len(stats.statements)} more")
+        slow_logger.warning(
+            "slow request %s %s -> %s in %.1f ms, %d SQL statements in %.1f ms\n%s",
+            scope["method"], path, status, elapsed * 1000, stats.statement_count, stats.db_seconds * 1000,
+            "\n".join(lines),
+        )
@@ -0,0 +1,65 @@
+"""bcrypt off the request path.
+
+bcrypt is slow on purpose (around 250 ms per hash at cost 12). Run inline, a
+login burst ties up the threads every sync endpoint shares. Here hashing and
+verification run on a bounded pool of PASSWORD_HASH_WORKERS, and the async
+auth endpoints await the result:
+
+- "process" (default): a ProcessPoolExecutor, so hashing never competes
+  with the API process for the GIL or its threadpool
+- "thread": a dedicated ThreadPoolExecutor. bcrypt releases the GIL, so this
+  also runs in parallel, without the cost of extra processes.
+
+The pool is created on first use, or by the app lifespan (`start`), and
+closed with `shutdown`.
+"""
+
+import asyncio
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from config import settings
+import utils.auth_utils as auth_utils
+
+
+PASSWORD_HASH_EXECUTOR = settings.password_hash_executor
+PASSWORD_HASH_WORKERS = settings.password_hash_workers
+
+_executor: Executor | None = None
+
+
+def start(kind: str | None = None, workers: int | None = None) -> Executor:
+    global _executor
+    if _executor is None:
+        kind = kind or PASSWORD_HASH_EXECUTOR
+        workers = workers or PASSWORD_HASH_WORKERS
+        if kind == "process":
+            # Forking a process that already runs threads is unsafe; forkserver/spawn start clean
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+            _executor = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+        elif kind == "thread":
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        else:
+            raise RuntimeError(f"unknown PASSWORD_HASH_EXECUTOR {kind!r}")
+    return _executor
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+    _executor = None
+
+
+async def _run(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(start(), fn, *args)
+
+
+async def hash_password_async(password: str) -> str:
+    # Pass the cost explicitly: pool processes do not see runtime changes to BCRYPT_ROUNDS
+    return await _run(auth_utils.hash_password, password, auth_utils.BCRYPT_ROUNDS)
+
+
+async def verify_password_async(password: str, hashed: str) -> bool:
+    return await _run(auth_utils.verify_password, password, hashed)
@@ -0,0 +1,367 @@
+"""Admission control for the upload endpoints (POST /ewaste/add and /ewaste/bulk).
+
+An upload can store a full-size image, build its variants and queue an
+upstream analysis, so one client sending them fast enough would use up the
+disk, the Gemini quota and the analysis workers for everyone. These checks
+turn that load away before the server saturates:
+
+- Body size (413): a request body over its route's limit (BODY_LIMITS) is
+  refused on its Content-Length, or, when it is sent without one, as soon
+  as more than the limit has arrived. Starlette would otherwise spool the
+  whole multipart body to disk before the endpoint could check the photo.
+- Per-client rate (429): a token bucket per user (the user_id of a valid
+  bearer token) or, for requests without one, per client IP. It holds
+  UPLOAD_BURST tokens and refills at UPLOAD_RATE_PER_MINUTE. A request takes
+  one token, and a bulk upload one more for each image after the first;
+  Retry-After is when the bucket will have them.
+- Concurrency (503): each process handles at most UPLOAD_MAX_CONCURRENCY
+  uploads at once, background work (image variants) included. A request
+  waits up to UPLOAD_QUEUE_SECONDS for a slot, first come first served, so
+  the uploads that get in keep a bounded latency and the rest fail fast.
+- Analysis backlog (503): while ANALYSIS_MAX_BACKLOG analysis jobs are queued
+  or running, uploads that would queue another are refused until the workers
+  catch up.
+
+The 429s and 503s come with a Retry-After. The first three checks run in
+AdmissionMiddleware, before the request body is read, so a refused upload
+costs no disk or database work (a request refused for concurrency has still
+used its token). Only broken devices with a photo are analysed, which is in
+the form, so the endpoints check the backlog.
+
+Buckets live in a backend picked by RATE_LIMIT_BACKEND:
+
+- "local": in this process, at most RATE_LIMIT_ENTRIES buckets, least
+  recently used dropped first. A bucket that is not stored is full.
+- "redis": in Redis (RATE_LIMIT_REDIS_URL, needs the redis package), taken
+  with one script call on the asyncio client, so every worker process shares
+  each client's budget without blocking the event loop. If Redis fails,
+  requests are let through.
+
+Behind a reverse proxy, run uvicorn with --proxy-headers and
+--forwarded-allow-ips so the client IP is the caller's and not the proxy's.
+"""
+
+import asyncio
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+
+from fastapi import HTTPException
+
+from config import settings
+from database import AsyncDB
+from utils.analysis_worker import pending_analysis_jobs
+from utils.auth_utils import decode_access_token
+from utils.metrics import admission_rejections, uploads_in_flight
+from utils.serialization import FastJSONResponse
+from utils.token_cache import token_cache, token_digest
+
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_BACKEND = settings.rate_limit_backend
+RATE_LIMIT_REDIS_URL = settings.rate_limit_redis_url
+RATE_LIMIT_ENTRIES = settings.rate_limit_entries
+UPLOAD_RATE_PER_MINUTE = settings.upload_rate_per_minute
+UPLOAD_BURST = settings.upload_burst
+UPLOAD_MAX_CONCURRENCY = settings.upload_max_concurrency
+UPLOAD_QUEUE_SECONDS = settings.upload_queue_seconds
+ANALYSIS_MAX_BACKLOG = settings.analysis_max_backlog
+# Retry-After of the 503s
+BUSY_RETRY_AFTER_SECONDS = 1
+BACKLOG_RETRY_AFTER_SECONDS = 30
+# The backlog is counted at most this often; admitted uploads are added in between
+BACKLOG_REFRESH_SECONDS = 1.0
+
+UPLOAD_ROUTES = {("POST", "/ewaste/add"), ("POST", "/ewaste/bulk")}
+# Largest request body per upload route: the photos plus room for the form fields
+FORM_OVERHEAD_BYTES = 64 * 1024
+# Room for one item of a bulk body, without its photo
+BULK_ITEM_BYTES = 4 * 1024
+BODY_LIMITS = {
+    "/ewaste/add": settings.max_upload_bytes + FORM_OVERHEAD_BYTES,
+    # A multipart batch with a photo per item; bulk_add_ewaste holds the items themselves to BULK_ITEM_BYTES each
+    "/ewaste/bulk": settings.bulk_max_items * (settings.max_upload_bytes + BULK_ITEM_BYTES) + FORM_OVERHEAD_BYTES,
+}
+TOO_LARGE_DETAIL = "Request body is too large"
+
+
+def retry_after(seconds: float) -> str:
+    """A Retry-After value: whole seconds, at least 1."""
+    return str(max(1, math.ceil(seconds)))
+
+
+def _token_user(token: str):
+    # Signature and expiry only: a revoked token still names its user, and
+    # checking revocations could mean a query on the event loop
+    payload = token_cache.get(token_digest(token))
+    if payload is None:
+        try:
+            payload = decode_access_token(token)
+        except Exception:
+            return None
+    return payload.get("user_id")
+
+
+def client_key(scope) -> str:
+    """'user:<id>' for a request with a valid bearer token, else 'ip:<client address>'."""
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer" and token.strip():
+                user_id = _token_user(token.strip())
+                if user_id is not None:
+                    return f"user:{user_id}"
+            break
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+
+class LocalBackend:
+    """Token buckets in this process: key -> (tokens, monotonic time they were counted)."""
+
+    def __init__(self, max_entries: int = RATE_LIMIT_ENTRIES):
+        self.max_entries = max_entries
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def take(self, key: str, rate: float, burst: int, cost: int) -> float:
+        """Take `cost` tokens: 0 if the bucket had them, else seconds until it will (and nothing is taken)."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, counted_at = self._buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - counted_at) * rate)
+            wait = 0.0
+            if tokens >= cost:
+                tokens -= cost
+            else:
+                wait = (cost - tokens) / rate
+            if tokens < burst:
+                self._buckets[key] = (tokens, now)
+                while len(self._buckets) > self.max_entries:
+                    self._buckets.popitem(last=False)
+            return wait
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class RedisBackend:
+    PREFIX = "ewaste:rate-limit:"
+    # Same arithmetic as LocalBackend.take, on the server's clock. The bucket
+    # expires once it would be full again. Returns the wait as a string, since
+    # Lua numbers come back as integers.
+    SCRIPT = """
+local rate, burst, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'at')
+local tokens = tonumber(state[1]) or burst
+local counted_at = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - counted_at) * rate)
+local wait = 0
+if tokens >= cost then tokens = tokens - cost else wait = (cost - tokens) / rate end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'at', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((burst - tokens) / rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+    def __init__(self, url: str):
+        try:
+            import redis.asyncio
+        except ImportError as e:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis requires the redis package") from e
+        self.url = url
+        self.client = redis.asyncio.Redis.from_url(url, socket_timeout=0.5)
+        self._take = self.client.register_script(self.SCRIPT)
+
+    async def take(self, key: str, rate: float, burst: int, cost: int) -> float:
+        return float(await self._take(keys=[self.PREFIX + key], args=[rate, burst, cost]))
+
+    def clear(self):
+        # Tests and maintenance only, off the request path: a short-lived blocking client is fine
+        import redis
+
+        with redis.Redis.from_url(self.url, socket_timeout=0.5) as client:
+            for key in client.scan_iter(self.PREFIX + "*"):
+                client.delete(key)
+
+
+class RateLimiter:
+    def __init__(self, backend=None, rate_per_minute: float = UPLOAD_RATE_PER_MINUTE, burst: int = UPLOAD_BURST):
+        self._backend = backend
+        self.rate_per_minute = rate_per_minute
+        self.burst = burst
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            if RATE_LIMIT_BACKEND == "redis":
+                self._backend = RedisBackend(RATE_LIMIT_REDIS_URL)
+            elif RATE_LIMIT_BACKEND == "local":
+                self._backend = LocalBackend()
+            else:
+                raise RuntimeError(f"unknown RATE_LIMIT_BACKEND {RATE_LIMIT_BACKEND!r}")
+        return self._backend
+
+    async def take(self, key: str, cost: int = 1) -> float:
+        """0 when the client may go ahead, else the seconds until it may."""
+        if self.rate_per_minute <= 0 or cost <= 0:
+            return 0.0
+        # More than a full bucket could never be granted; a full bucket is the most one request needs
+        cost = min(cost, self.burst)
+        backend = self.backend
+        try:
+            return await backend.take(key, self.rate_per_minute / 60, self.burst, cost)
+        except Exception:
+            logger.warning("rate limit backend failed; letting the request through", exc_info=True)
+            return 0.0
+
+    async def charge(self, scope, cost: int, route: str):
+        """Take `cost` more tokens for a request already admitted, raising a 429 if they are not there."""
+        wait = await self.take(client_key(scope), cost)
+        if wait > 0:
+            admission_rejections.inc(route=route, reason="rate_limited")
+            raise HTTPException(status_code=429, detail="Too many uploads; retry later",
+                                headers={"Retry-After": retry_after(wait)})
+
+    def clear(self):
+        self.backend.clear()
+
+
+class ConcurrencyLimiter:
+    """At most `limit` holders at once (0: no limit). Others wait up to max_wait seconds, in arrival order."""
+
+    def __init__(self, limit: int = UPLOAD_MAX_CONCURRENCY, max_wait: float = UPLOAD_QUEUE_SECONDS):
+        self.limit = limit
+        self.max_wait = max_wait
+        self.active = 0
+        self._waiters: deque[asyncio.Future] = deque()
+
+    async def acquire(self) -> bool:
+        """True once a slot is held (release it), False if none came free within max_wait."""
+        if self.limit <= 0 or (self.active < self.limit and not self._waiters):
+            self.active += 1
+            return True
+        if self.max_wait <= 0:
+            return False
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # release() hands its slot over by resolving the future, so `active` does not change
+            await asyncio.wait_for(waiter, self.max_wait)
+        except asyncio.TimeoutError:
+            return False
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()  # given a slot just as the request went away
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        return True
+
+    def release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+
+class AnalysisBacklog:
+    """Admission by the number of queued and running analysis jobs (0: no limit)."""
+
+    def __init__(self, max_jobs: int = ANALYSIS_MAX_BACKLOG):
+        self.max_jobs = max_jobs
+        self._count: tuple[float, int] | None = None  # (counted at, jobs)
+
+    async def admit(self, db: AsyncDB, jobs: int, route: str):
+        """Raise a 503 when the backlog is full; otherwise count `jobs` more until the next refresh."""
+        if self.max_jobs <= 0 or jobs <= 0:
+            return
+        now = time.monotonic()
+        if self._count is None or now - self._count[0] >= BACKLOG_REFRESH_SECONDS:
+            self._count = (now, await db.run(pending_analysis_jobs))
+        counted_at, count = self._count
+        if count >= self.max_jobs:
+            admission_rejections.inc(route=route, reason="analysis_backlog")
+            raise HTTPException(status_code=503, detail="Image analysis is backed up; retry later",
+                                headers={"Retry-After": retry_after(BACKLOG_RETRY_AFTER_SECONDS)})
+        self._count = (counted_at, count + jobs)
+
+    def clear(self):
+        self._count = None
+
+
+def _refuse(status: int, detail: str, wait: float) -> FastJSONResponse:
+    return FastJSONResponse({"detail": detail}, status_code=status, headers={"Retry-After": retry_after(wait)})
+
+
+def _content_length(scope) -> int | None:
+    for name, value in scope["headers"]:
+        if name == b"content-length":
+            try:
+                return int(value)
+            except ValueError:
+                return None
+    return None
+
+
+def _capped_receive(receive, limit: int):
+    """receive() that raises 413 once more than limit body bytes have come in."""
+    received = 0
+
+    async def capped():
+        nonlocal received
+        message = await receive()
+        if message["type"] == "http.request":
+            received += len(message.get("body", b""))
+            if received > limit:
+                raise HTTPException(status_code=413, detail=TOO_LARGE_DETAIL)
+        return message
+
+    return capped
+
+
+class AdmissionMiddleware:
+    """Body size, rate and concurrency limits for UPLOAD_ROUTES, checked before the body is read (pure ASGI)."""
+
+    def __init__(self, app, limiter: RateLimiter | None = None, slots: ConcurrencyLimiter | None = None):
+        self.app = app
+        self.limiter = limiter or upload_limiter
+        self.slots = slots or upload_slots
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or (scope["method"], scope["path"]) not in UPLOAD_ROUTES:
+            return await self.app(scope, receive, send)
+        route = scope["path"]
+        limit = BODY_LIMITS.get(route)
+        if limit is not None:
+            length = _content_length(scope)
+            if length is not None and length > limit:
+                admission_rejections.inc(route=route, reason="too_large")
+                return await FastJSONResponse({"detail": TOO_LARGE_DETAIL}, status_code=413)(scope, receive, send)
+            receive = _capped_receive(receive, limit)
+        wait = await self.limiter.take(client_key(scope))
+        if wait > 0:
+            admission_rejections.inc(route=route, reason="rate_limited")
+            return await _refuse(429, "Too many uploads; retry later", wait)(scope, receive, send)
+        if not await self.slots.acquire():
+            admission_rejections.inc(route=route, reason="busy")
+            return await _refuse(503, "Server busy; retry later", BUSY_RETRY_AFTER_SECONDS)(scope, receive, send)
+        uploads_in_flight.inc()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            uploads_in_flight.dec()
+            self.slots.release()
+
+
+upload_limiter = RateLimiter()
+upload_slots = ConcurrencyLimiter()
+analysis_backlog = AnalysisBacklog()
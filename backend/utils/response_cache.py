@@ -0,0 +1,207 @@
+"""Response cache for the public read endpoints (/ewaste/analytics, /ewaste/reusable).
+
+Serialized response bodies are cached under "<endpoint>?<sorted query>@<version>".
+`version` is a counter that every write affecting those responses bumps (add,
+bulk, delete, finished analysis, new image variants), so nothing is ever
+invalidated by key: a bump just moves readers to keys that are not cached yet,
+and the old entries age out of the LRU or hit RESPONSE_CACHE_TTL_SECONDS.
+
+The ETag is a hash of the key. It is known before the body is, so a request
+whose If-None-Match matches gets a 304 without a cache lookup or a query.
+
+Two tiers:
+
+- an in-process LRU (RESPONSE_CACHE_ENTRIES entries)
+- a shared backend, picked by RESPONSE_CACHE_BACKEND, that also holds the
+  version counter:
+  - "local": a stand-in for a single process. It keeps the counter in memory
+    and stores no entries, leaving them to the LRU.
+  - "redis": entries and counter in Redis (RESPONSE_CACHE_REDIS_URL, needs
+    the redis package), so every worker process shares them and sees bumps.
+    The counter is re-read at most every RESPONSE_CACHE_VERSION_SECONDS.
+    Bumps made by this process apply immediately.
+
+The read path (version, get, put) is async, so on Redis it goes through the
+asyncio client and a slow server does not stall the event loop. Handlers bump
+with `await invalidate_async()` for the same reason; invalidate() is the
+blocking form for worker threads and background tasks, which have no loop.
+"""
+
+import hashlib
+import json
+import threading
+import time
+import uuid
+
+from config import settings
+from utils.token_cache import ExpiringLRU
+
+
+RESPONSE_CACHE_BACKEND = settings.response_cache_backend
+RESPONSE_CACHE_REDIS_URL = settings.response_cache_redis_url
+RESPONSE_CACHE_ENTRIES = settings.response_cache_entries
+RESPONSE_CACHE_TTL_SECONDS = settings.response_cache_ttl_seconds
+RESPONSE_CACHE_VERSION_SECONDS = settings.response_cache_version_seconds
+
+
+def etag_matches(header: str | None, etag: str) -> bool:
+    """If-None-Match check: `*` or any listed tag, compared weakly as the header requires."""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return etag in candidates
+
+
+class LocalBackend:
+    """In-process stand-in for a shared backend: only the version counter, no entries."""
+
+    def __init__(self):
+        # A fresh prefix per process, so two processes never hand out the same ETag
+        self._epoch = uuid.uuid4().hex[:8]
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def _current(self) -> str:
+        return f"{self._epoch}.{self._counter}"
+
+    async def version(self) -> str:
+        return self._current()
+
+    def bump(self) -> str:
+        with self._lock:
+            self._counter += 1
+            return self._current()
+
+    async def bump_async(self) -> str:
+        return self.bump()
+
+    async def get(self, key: str) -> dict | None:
+        return None
+
+    async def set(self, key: str, entry: dict, ttl: float):
+        pass
+
+    def clear(self):
+        self.bump()
+
+
+class RedisBackend:
+    VERSION_KEY = "ewaste:response-cache:version"
+    PREFIX = "ewaste:response-cache:entry:"
+
+    def __init__(self, url: str):
+        try:
+            import redis
+            import redis.asyncio
+        except ImportError as e:
+            raise RuntimeError("RESPONSE_CACHE_BACKEND=redis requires the redis package") from e
+        self.client = redis.asyncio.Redis.from_url(url, socket_timeout=0.5)
+        # For bumps from worker threads, which have no event loop
+        self.sync_client = redis.Redis.from_url(url, socket_timeout=0.5)
+
+    async def version(self) -> str:
+        return (await self.client.get(self.VERSION_KEY) or b"0").decode()
+
+    def bump(self) -> str:
+        return str(self.sync_client.incr(self.VERSION_KEY))
+
+    async def bump_async(self) -> str:
+        return str(await self.client.incr(self.VERSION_KEY))
+
+    async def get(self, key: str) -> dict | None:
+        raw = await self.client.get(self.PREFIX + key)
+        if raw is None:
+            return None
+        headers, _, body = raw.partition(b"\n")
+        return {"headers": json.loads(headers), "body": body}
+
+    async def set(self, key: str, entry: dict, ttl: float):
+        raw = json.dumps(entry["headers"]).encode() + b"\n" + entry["body"]
+        await self.client.set(self.PREFIX + key, raw, px=int(ttl * 1000))
+
+    def clear(self):
+        self.bump()
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        backend=None,
+        memory_entries: int = RESPONSE_CACHE_ENTRIES,
+        ttl_seconds: float = RESPONSE_CACHE_TTL_SECONDS,
+        version_seconds: float = RESPONSE_CACHE_VERSION_SECONDS,
+    ):
+        self._backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.version_seconds = version_seconds
+        self._memory = ExpiringLRU(memory_entries)
+        self._version: tuple[float, str] | None = None  # (read at, version)
+        self.stats = {"hits": 0, "shared_hits": 0, "misses": 0, "not_modified": 0, "invalidations": 0}
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            if RESPONSE_CACHE_BACKEND == "redis":
+                self._backend = RedisBackend(RESPONSE_CACHE_REDIS_URL)
+            elif RESPONSE_CACHE_BACKEND == "local":
+                self._backend = LocalBackend()
+            else:
+                raise RuntimeError(f"unknown RESPONSE_CACHE_BACKEND {RESPONSE_CACHE_BACKEND!r}")
+        return self._backend
+
+    async def version(self) -> str:
+        cached = self._version
+        now = time.monotonic()
+        if cached is not None and now - cached[0] < self.version_seconds:
+            return cached[1]
+        version = await self.backend.version()
+        self._version = (now, version)
+        return version
+
+    def invalidate(self):
+        """Bump the version after a committed write that changes cached responses. Blocking."""
+        self._version = (time.monotonic(), self.backend.bump())
+        self.stats["invalidations"] += 1
+
+    async def invalidate_async(self):
+        """invalidate() for handlers: the bump does not hold up the event loop."""
+        self._version = (time.monotonic(), await self.backend.bump_async())
+        self.stats["invalidations"] += 1
+
+    def key(self, endpoint: str, params, version: str) -> str:
+        query = "&".join(f"{k}={v}" for k, v in sorted(params.multi_items()))
+        return f"{endpoint}?{query}@{version}"
+
+    def etag(self, key: str) -> str:
+        return f'"{hashlib.sha256(key.encode()).hexdigest()[:32]}"'
+
+    async def get(self, key: str) -> dict | None:
+        entry = self._memory.get(key)
+        if entry is not None:
+            self.stats["hits"] += 1
+            return entry
+        entry = await self.backend.get(key)
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+        self.stats["shared_hits"] += 1
+        self._memory.put(key, entry, time.time() + self.ttl_seconds)
+        return entry
+
+    async def put(self, key: str, body: bytes, headers: dict | None = None):
+        entry = {"body": body, "headers": headers or {}}
+        self._memory.put(key, entry, time.time() + self.ttl_seconds)
+        await self.backend.set(key, entry, self.ttl_seconds)
+
+    def clear(self):
+        self._memory.clear()
+        self.backend.clear()
+        self._version = None
+
+    def snapshot(self) -> dict:
+        return dict(self.stats)
+
+
+response_cache = ResponseCache()
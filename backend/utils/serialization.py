@@ -0,0 +1,38 @@
+"""JSON encoding for the list endpoints.
+
+Rows come out of the repositories as plain dicts built straight from the
+projected result tuples (see `rows_as_dicts`), and the queries select exactly
+the fields of the response schema. So endpoints return them in a
+FastJSONResponse, which encodes once with orjson (the stdlib json when it is not
+installed). This skips FastAPI's per-row response_model validation and
+jsonable_encoder pass. The `response_model` on the route still documents the shape.
+"""
+
+import json
+
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+def dumps(content) -> bytes:
+    """Compact UTF-8 JSON. Non-JSON values (e.g. datetimes) are written as strings."""
+    if orjson is not None:
+        return orjson.dumps(content, default=str, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=str).encode()
+
+
+def rows_as_dicts(result) -> list[dict]:
+    """A Result's rows as dicts, zipped from the row tuples (about twice as fast as .mappings())."""
+    keys = list(result.keys())
+    return [dict(zip(keys, row)) for row in result]
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
@@ -0,0 +1,316 @@
+"""Upload storage.
+
+Uploads are stored under content-hash keys ("ab/cd/<sha256>.<ext>"), so the
+same photo uploaded twice is stored once, and the key doubles as the image's
+digest for the analysis cache. Items keep "/uploads/<key>" in image_path;
+`key_from_path` and `url_for` convert between the two. WebP variants live
+under keys derived from the original's (`variant_key`) and are deleted with it.
+
+How many items use a key is tracked in `stored_files` (see
+repositories.upload_repository); `delete_item` removes the blob once the last
+reference goes.
+
+Backends, picked by STORAGE_BACKEND:
+- "local" (default): files under UPLOAD_DIR, default backend/uploads
+- "s3": an S3-compatible bucket (AWS, MinIO, LocalStack, ...) through boto3,
+  configured with S3_BUCKET, S3_PREFIX and S3_ENDPOINT_URL
+"""
+
+import hashlib
+import io
+import os
+import re
+import tempfile
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+
+from config import settings
+
+
+UPLOAD_URL_PREFIX = "/uploads/"
+DEFAULT_UPLOAD_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "uploads")
+CHUNK_SIZE = 1024 * 1024
+VARIANTS = ("display", "thumbnail")
+
+_DIGEST_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+@dataclass
+class StoredObject:
+    key: str
+    size: int
+    sha256: str
+
+
+def content_key(digest: str, extension: str) -> str:
+    # Two levels of 256-way sharding keeps directories small on local disk
+    return f"{digest[:2]}/{digest[2:4]}/{digest}{extension}"
+
+
+def variant_key(key: str, variant: str) -> str:
+    stem, _ = os.path.splitext(key)
+    return f"{stem}.{variant}.webp"
+
+
+def key_from_path(image_path: str) -> str:
+    if image_path.startswith(UPLOAD_URL_PREFIX):
+        return image_path[len(UPLOAD_URL_PREFIX):]
+    return image_path.lstrip("/")
+
+
+def url_for(key: str) -> str:
+    return f"{UPLOAD_URL_PREFIX}{key}"
+
+
+def content_hash(key: str) -> str | None:
+    """The SHA-256 of the bytes stored under a content-addressed key.
+
+    None for legacy names and for variants ("<sha256>.thumbnail.webp"), whose
+    bytes are not the ones the name was derived from.
+    """
+    stem, _ = os.path.splitext(os.path.basename(key))
+    return stem if _DIGEST_RE.match(stem) else None
+
+
+def safe_extension(filename: str | None) -> str:
+    ext = os.path.splitext(filename or "")[1].lower()
+    return ext if re.fullmatch(r"\.[a-z0-9]{1,8}", ext) else ""
+
+
+class Storage(ABC):
+    @abstractmethod
+    def save_stream(self, fileobj, extension: str, max_bytes: int) -> StoredObject:
+        """Store a file-like object under its content key, reading it in chunks."""
+
+    @abstractmethod
+    def write(self, key: str, data: bytes, content_type: str | None = None):
+        ...
+
+    @abstractmethod
+    def open(self, key: str):
+        """Readable binary file object for the key (use as a context manager)."""
+
+    @abstractmethod
+    def iter_chunks(self, key: str, start: int = 0, end: int | None = None):
+        """Yield the bytes of [start, end] (inclusive; end None = to EOF)."""
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    def size(self, key: str) -> int:
+        ...
+
+    @abstractmethod
+    def version(self, key: str) -> str:
+        """Opaque token that changes whenever the stored bytes could have changed."""
+
+    @abstractmethod
+    def delete(self, key: str):
+        ...
+
+    def local_path(self, key: str) -> str | None:
+        """A filesystem path for the key when the backend has one."""
+        return None
+
+    def read_bytes(self, key: str) -> bytes:
+        with self.open(key) as f:
+            return f.read()
+
+    def digest(self, key: str) -> str:
+        known = content_hash(key)
+        if known:
+            return known
+        sha = hashlib.sha256()
+        with self.open(key) as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                sha.update(chunk)
+        return sha.hexdigest()
+
+    def delete_with_variants(self, key: str):
+        for variant in VARIANTS:
+            self.delete(variant_key(key, variant))
+        self.delete(key)
+
+    @staticmethod
+    def _spool(fileobj, target, max_bytes: int):
+        """Copy fileobj into target in chunks; returns (size, sha256 hex)."""
+        sha = hashlib.sha256()
+        size = 0
+        while chunk := fileobj.read(CHUNK_SIZE):
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge(size)
+            sha.update(chunk)
+            target.write(chunk)
+        return size, sha.hexdigest()
+
+
+class LocalStorage(Storage):
+    def __init__(self, root: str = DEFAULT_UPLOAD_DIR):
+        self.root = os.path.abspath(root)
+        self._tmp = os.path.join(self.root, ".tmp")
+        os.makedirs(self._tmp, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        path = os.path.normpath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep) or path.startswith(self._tmp + os.sep):
+            # Half-written spool files under .tmp are not part of the key space
+            raise ValueError(f"invalid storage key: {key!r}")
+        return path
+
+    def _move_into_place(self, tmp_path: str, key: str):
+        final = self._path(key)
+        if os.path.exists(final):
+            # Same content already stored: keep the existing copy
+            os.remove(tmp_path)
+            return
+        os.makedirs(os.path.dirname(final), exist_ok=True)
+        os.replace(tmp_path, final)
+
+    def save_stream(self, fileobj, extension: str, max_bytes: int) -> StoredObject:
+        tmp = tempfile.NamedTemporaryFile(dir=self._tmp, delete=False)
+        try:
+            with tmp:
+                size, digest = self._spool(fileobj, tmp, max_bytes)
+            key = content_key(digest, extension)
+            self._move_into_place(tmp.name, key)
+        except BaseException:
+            if os.path.exists(tmp.name):
+                os.remove(tmp.name)
+            raise
+        return StoredObject(key=key, size=size, sha256=digest)
+
+    def write(self, key: str, data: bytes, content_type: str | None = None):
+        with tempfile.NamedTemporaryFile(dir=self._tmp, delete=False) as tmp:
+            tmp.write(data)
+        os.makedirs(os.path.dirname(self._path(key)), exist_ok=True)
+        os.replace(tmp.name, self._path(key))
+
+    def open(self, key: str):
+        return open(self._path(key), "rb")
+
+    def iter_chunks(self, key: str, start: int = 0, end: int | None = None):
+        with self.open(key) as f:
+            f.seek(start)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                chunk = f.read(CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    def exists(self, key: str) -> bool:
+        return os.path.isfile(self._path(key))
+
+    def size(self, key: str) -> int:
+        return os.path.getsize(self._path(key))
+
+    def version(self, key: str) -> str:
+        st = os.stat(self._path(key))
+        return f"{st.st_size:x}-{st.st_mtime_ns:x}"
+
+    def delete(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def local_path(self, key: str) -> str | None:
+        return self._path(key)
+
+
+class S3Storage(Storage):
+    # Uploads up to this size are spooled in memory before being sent; larger go to a temp file
+    SPOOL_BYTES = 8 * 1024 * 1024
+
+    def __init__(self, bucket: str, prefix: str = "", endpoint_url: str | None = None, client=None):
+        if client is None:
+            try:
+                import boto3
+            except ImportError as e:
+                raise RuntimeError("STORAGE_BACKEND=s3 requires the boto3 package") from e
+            client = boto3.client("s3", endpoint_url=endpoint_url)
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+
+    def _key(self, key: str) -> str:
+        if ".." in key.split("/"):
+            raise ValueError(f"invalid storage key: {key!r}")
+        return self.prefix + key
+
+    def save_stream(self, fileobj, extension: str, max_bytes: int) -> StoredObject:
+        with tempfile.SpooledTemporaryFile(max_size=self.SPOOL_BYTES) as spool:
+            size, digest = self._spool(fileobj, spool, max_bytes)
+            key = content_key(digest, extension)
+            if not self.exists(key):
+                spool.seek(0)
+                self.client.upload_fileobj(spool, self.bucket, self._key(key))
+        return StoredObject(key=key, size=size, sha256=digest)
+
+    def write(self, key: str, data: bytes, content_type: str | None = None):
+        extra = {"ContentType": content_type} if content_type else {}
+        self.client.put_object(Bucket=self.bucket, Key=self._key(key), Body=data, **extra)
+
+    def open(self, key: str):
+        # Pillow and the multipart upload need a seekable file; uploads are size-capped
+        body = self.client.get_object(Bucket=self.bucket, Key=self._key(key))["Body"]
+        try:
+            return io.BytesIO(body.read())
+        finally:
+            body.close()
+
+    def iter_chunks(self, key: str, start: int = 0, end: int | None = None):
+        byte_range = f"bytes={start}-{'' if end is None else end}"
+        body = self.client.get_object(Bucket=self.bucket, Key=self._key(key), Range=byte_range)["Body"]
+        try:
+            yield from body.iter_chunks(CHUNK_SIZE)
+        finally:
+            body.close()
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+        except self.client.exceptions.ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+        return True
+
+    def size(self, key: str) -> int:
+        return self.client.head_object(Bucket=self.bucket, Key=self._key(key))["ContentLength"]
+
+    def version(self, key: str) -> str:
+        return self.client.head_object(Bucket=self.bucket, Key=self._key(key))["ETag"].strip('"')
+
+    def delete(self, key: str):
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+
+_storage: Storage | None = None
+
+
+def get_storage() -> Storage:
+    """The configured backend, created on first use."""
+    global _storage
+    if _storage is None:
+        backend = settings.storage_backend
+        if backend == "s3":
+            _storage = S3Storage(
+                bucket=settings.s3_bucket,
+                prefix=settings.s3_prefix,
+                endpoint_url=settings.s3_endpoint_url,
+            )
+        elif backend == "local":
+            _storage = LocalStorage(settings.upload_dir or DEFAULT_UPLOAD_DIR)
+        else:
+            raise RuntimeError(f"unknown STORAGE_BACKEND {backend!r}")
+    return _storage
@@ -0,0 +1,36 @@
+from typing import AsyncIterable, Iterable
+
+from fastapi.responses import StreamingResponse
+
+from utils.serialization import dumps
+
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+# Lines are sent in chunks of about this size rather than one ASGI message per row
+NDJSON_CHUNK_BYTES = 64 * 1024
+
+
+def ndjson_response(rows: Iterable[dict] | AsyncIterable[dict]) -> StreamingResponse:
+    """Stream rows (a sync or async iterable) as newline-delimited JSON, one object per line."""
+    if hasattr(rows, "__aiter__"):
+        async def chunks():
+            buffer = bytearray()
+            async for row in rows:
+                buffer += dumps(row) + b"\n"
+                if len(buffer) >= NDJSON_CHUNK_BYTES:
+                    yield bytes(buffer)
+                    buffer.clear()
+            if buffer:
+                yield bytes(buffer)
+    else:
+        def chunks():
+            buffer = bytearray()
+            for row in rows:
+                buffer += dumps(row) + b"\n"
+                if len(buffer) >= NDJSON_CHUNK_BYTES:
+                    yield bytes(buffer)
+                    buffer.clear()
+            if buffer:
+                yield bytes(buffer)
+
+    return StreamingResponse(chunks(), media_type=NDJSON_MEDIA_TYPE)
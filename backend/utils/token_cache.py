@@ -0,0 +1,147 @@
+"""Caches behind get_current_user.
+
+- token_cache: verified JWT payloads keyed by a SHA-256 of the token. Each
+  entry is dropped at the token's own `exp`, so a hit skips signature
+  verification and claim parsing and can never outlive the token.
+- revocations: jti claims of logged-out tokens, kept in memory and in the
+  `revoked_tokens` table. The in-memory copy is reloaded from the table every
+  REVOCATION_REFRESH_SECONDS, so revocations made by other processes apply
+  within that window. Cached payloads are checked against it on every request.
+- user_profiles: public profile (including role) by user id, for
+  USER_PROFILE_TTL_SECONDS, so role checks need no query.
+
+A cache with 0 entries is disabled.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from config import settings
+from models.revoked_token_model import RevokedToken
+
+
+logger = logging.getLogger(__name__)
+
+TOKEN_CACHE_ENTRIES = settings.token_cache_entries
+REVOCATION_REFRESH_SECONDS = settings.revocation_refresh_seconds
+USER_PROFILE_CACHE_ENTRIES = settings.user_profile_cache_entries
+USER_PROFILE_TTL_SECONDS = settings.user_profile_ttl_seconds
+
+
+def token_digest(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class ExpiringLRU:
+    """Thread-safe LRU whose entries each carry an absolute expiry (epoch seconds)."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def get(self, key) -> dict | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.time():
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return dict(entry[1])
+            if entry is not None:
+                del self._entries[key]
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, key, value: dict, expires_at: float):
+        if self.max_entries <= 0 or expires_at <= time.time():
+            return
+        with self._lock:
+            self._entries[key] = (expires_at, dict(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RevocationList:
+    """Revoked jti claims. Reads and writes go through the caller's session, so they
+    use the same database (and dependency overrides) as the request."""
+
+    def __init__(self, refresh_seconds: float = REVOCATION_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self._revoked: dict[str, float] = {}
+        self._loaded_at: float | None = None
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def is_revoked(self, db: Session, jti: str | None) -> bool:
+        if not jti:
+            return False
+        self._maybe_refresh(db)
+        expires = self._revoked.get(jti)
+        return expires is not None and expires > time.time()
+
+    def revoke(self, db: Session, jti: str, expires_at: float):
+        """Record the revocation and commit; it applies in this process once committed."""
+        db.merge(RevokedToken(jti=jti, expires_at=datetime.utcfromtimestamp(expires_at)))
+        # Rows past their token's expiry protect nothing
+        db.execute(delete(RevokedToken).where(RevokedToken.expires_at <= datetime.utcnow()))
+        db.commit()
+        with self._lock:
+            self._revoked[jti] = expires_at
+
+    def refresh(self, db: Session):
+        now = datetime.utcnow()
+        try:
+            rows = db.execute(
+                select(RevokedToken.jti, RevokedToken.expires_at).where(RevokedToken.expires_at > now)
+            ).all()
+        except Exception:
+            # Keep serving with the set we have; the next check retries
+            logger.exception("revocation list refresh failed")
+            db.rollback()
+            return
+        revoked = {jti: (expires - datetime(1970, 1, 1)).total_seconds() for jti, expires in rows}
+        with self._lock:
+            # Keep local revocations not yet visible to this read
+            revoked.update({k: v for k, v in self._revoked.items() if v > time.time()})
+            self._revoked = revoked
+            self._loaded_at = time.monotonic()
+
+    def _maybe_refresh(self, db: Session):
+        with self._lock:
+            stale = self._loaded_at is None or time.monotonic() - self._loaded_at >= self.refresh_seconds
+            if not stale or self._refreshing:
+                return
+            self._refreshing = True
+        try:
+            self.refresh(db)
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def clear(self):
+        """Forget what was loaded, so the next check reads the table again (tests)."""
+        with self._lock:
+            self._revoked = {}
+            self._loaded_at = None
+
+
+token_cache = ExpiringLRU(TOKEN_CACHE_ENTRIES)
+user_profiles = ExpiringLRU(USER_PROFILE_CACHE_ENTRIES)
+revocations = RevocationList()
@@ -9,10 +9,10 @@ interface EwasteImageProps {
 export const EwasteImage: React.FC<EwasteImageProps> = ({ imagePath, productName }) => {
   if (!imagePath) return null;
 
-  // Extract just the filename from the path
-  const filename = imagePath.split(/[\/\\]/).pop();
-  // Construct the full URL
-  const imageUrl = `${API_BASE}/uploads/${filename}`;
+  // Stored paths are URL paths like /uploads/<name>; fall back to the bare filename for older rows
+  const imageUrl = imagePath.startsWith('/uploads/')
+    ? `${API_BASE}${imagePath}`
+    : `${API_BASE}/uploads/${imagePath.split(/[\/\\]/).pop()}`;
 
   return (
     <div className="w-full h-48 bg-gray-200">
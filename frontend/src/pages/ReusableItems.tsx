@@ -65,7 +65,7 @@ export default function ReusableItems() {
             <div key={item.id} className="bg-white rounded-xl shadow-md overflow-hidden hover:shadow-lg transition-shadow">
               <div className="aspect-w-16 aspect-h-12">
                 {item.image_path && (
-                  <EwasteImage imagePath={item.image_path} productName={item.product_name} />
+                  <EwasteImage imagePath={item.thumbnail_path || item.image_path} productName={item.product_name} />
                 )}
               </div>
               <div className="p-4 sm:p-6">